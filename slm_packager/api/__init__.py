@@ -1 +1,2 @@
 from .server import start_server
+from .router import start_router
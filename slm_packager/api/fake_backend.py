@@ -0,0 +1,81 @@
+"""
+Stand-in for `slm serve` that needs no model, for exercising the router.
+
+    python -m slm_packager.api.fake_backend --port 8001 --model tinyllama
+
+It answers /health, /info, /tokenize and /generate (plain and SSE),
+producing one word per `token_delay` seconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from ..config.models import GenerationParams
+
+
+class _GenerateRequest(BaseModel):
+    prompt: str
+    params: Optional[GenerationParams] = None
+
+
+class _TokenizeRequest(BaseModel):
+    texts: List[str]
+
+
+def create_fake_backend(model: str = "fake", token_delay: float = 0.01) -> FastAPI:
+    app = FastAPI(title=f"Fake SLM backend ({model})")
+    state = {"requests": 0}
+    # Identifies which instance answered when several run on one host
+    name = f"{model}@{os.getpid()}"
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/info")
+    async def info():
+        return {"model": {"name": model, "path": "fake", "format": "gguf"}, "backend": name,
+                "requests": state["requests"]}
+
+    @app.post("/tokenize")
+    async def tokenize(request: _TokenizeRequest):
+        counts = [len(t.split()) for t in request.texts]
+        return {"counts": counts, "total": sum(counts), "cached": 0}
+
+    @app.post("/generate")
+    async def generate(request: _GenerateRequest):
+        params = request.params or GenerationParams()
+        state["requests"] += 1
+        words = [f"w{i}" for i in range(params.max_tokens)]
+        if params.stream:
+            async def events():
+                for word in words:
+                    await asyncio.sleep(token_delay)
+                    yield f"data: {json.dumps({'text': word + ' '})}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        await asyncio.sleep(token_delay * len(words))
+        return {"text": " ".join(words)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--model", default="fake")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    uvicorn.run(create_fake_backend(args.model, args.token_delay), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
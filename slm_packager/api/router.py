@@ -0,0 +1,276 @@
+"""Load-aware front end across several `slm serve` instances"""
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from ..config.models import GenerationParams
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_MAX_TOKENS = GenerationParams().max_tokens
+
+
+@dataclass
+class Backend:
+    """One `slm serve` instance and the router's view of its load"""
+    url: str
+    healthy: bool = False
+    models: Set[str] = field(default_factory=set)
+    outstanding_tokens: int = 0
+    outstanding_requests: int = 0
+    failures: int = 0
+    served: int = 0
+    last_checked: float = 0.0
+
+    def acquire(self, cost: int):
+        self.outstanding_tokens += cost
+        self.outstanding_requests += 1
+
+    def release(self, cost: int):
+        self.outstanding_tokens -= cost
+        self.outstanding_requests -= 1
+        self.served += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models),
+            "outstanding_tokens": self.outstanding_tokens,
+            "outstanding_requests": self.outstanding_requests,
+            "served": self.served,
+        }
+
+
+class Router:
+    """
+    Routes /generate to the backend serving the requested model with the
+    fewest outstanding tokens.
+
+    A request's cost is its estimated prompt tokens (4 characters each)
+    plus max_tokens, held against the backend until the response, or the
+    SSE stream, is finished. With `affinity`, requests whose prompts
+    share the first `prefix_chars` characters go to the same backend
+    (rendezvous hashing) so its prefix cache stays warm, unless that
+    backend is more than `affinity_slack` tokens busier than the least
+    loaded one.
+
+    Backends are polled at /health every `health_interval` seconds and
+    their model names read from /info. A backend is drained (no new
+    requests; in-flight ones finish) after `failure_threshold` failed
+    checks or at once when a connection to it fails, and comes back
+    after its next good check.
+    """
+
+    def __init__(
+        self,
+        backends: List[str],
+        affinity: bool = False,
+        prefix_chars: int = 256,
+        affinity_slack: int = 2048,
+        health_interval: float = 5.0,
+        failure_threshold: int = 2,
+        timeout: float = 600.0,
+    ):
+        if not backends:
+            raise ValueError("❌ No backends given\n💡 Pass at least one: --backend localhost:8000")
+        self.backends = [Backend(url=_normalize(b)) for b in backends]
+        self.affinity = affinity
+        self.prefix_chars = prefix_chars
+        self.affinity_slack = affinity_slack
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100),
+        )
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+        if self.client:
+            await self.client.aclose()
+
+    async def check_health(self):
+        await asyncio.gather(*(self._check(b) for b in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    async def _check(self, backend: Backend):
+        try:
+            resp = await self.client.get(backend.url + "/health", timeout=2.0)
+            resp.raise_for_status()
+            info = (await self.client.get(backend.url + "/info", timeout=2.0)).json()
+            name = (info.get("model") or {}).get("name")
+            backend.models = {name} if name else set()
+        except (httpx.HTTPError, ValueError) as e:
+            backend.failures += 1
+            if backend.healthy and backend.failures >= self.failure_threshold:
+                logger.warning(f"Draining {backend.url}: {type(e).__name__}: {e}")
+                backend.healthy = False
+        else:
+            if not backend.healthy:
+                logger.info(f"Backend {backend.url} is healthy ({', '.join(backend.models) or 'no model'})")
+            backend.healthy = True
+            backend.failures = 0
+        backend.last_checked = time.time()
+
+    def _mark_down(self, backend: Backend, error: Exception):
+        logger.warning(f"Draining {backend.url}: {type(error).__name__}: {error}")
+        backend.healthy = False
+        backend.failures = max(backend.failures, self.failure_threshold)
+
+    def choose(self, model: Optional[str], prompt: str, exclude: Set[str] = frozenset()) -> Backend:
+        """Pick a backend for a request; raises HTTPException when none can serve it"""
+        serving = [b for b in self.backends if model is None or model in b.models]
+        if not serving:
+            known = sorted({m for b in self.backends for m in b.models})
+            raise HTTPException(
+                status_code=404,
+                detail=f"No backend serves model '{model}'. Available: {', '.join(known) or 'none'}",
+            )
+        candidates = [b for b in serving if b.healthy and b.url not in exclude]
+        if not candidates:
+            raise HTTPException(status_code=503, detail="No healthy backend available")
+
+        least = min(candidates, key=lambda b: (b.outstanding_tokens, b.outstanding_requests))
+        if self.affinity and prompt:
+            prefix = prompt[:self.prefix_chars].encode("utf-8")
+            preferred = max(candidates, key=lambda b: _rendezvous(prefix, b.url))
+            if preferred.outstanding_tokens - least.outstanding_tokens <= self.affinity_slack:
+                return preferred
+        return least
+
+    async def generate(self, body: Dict[str, Any]) -> Response:
+        prompt = body.get("prompt") or ""
+        params = body.get("params") or {}
+        cost = len(prompt) // 4 + int(params.get("max_tokens") or _DEFAULT_MAX_TOKENS)
+        tried: Set[str] = set()
+        while True:
+            backend = self.choose(body.get("model"), prompt, exclude=tried)
+            backend.acquire(cost)
+            try:
+                request = self.client.build_request("POST", backend.url + "/generate", json=body)
+                resp = await self.client.send(request, stream=True)
+            except httpx.TransportError as e:
+                # Nothing was sent to the client yet, so another backend can take it
+                backend.release(cost)
+                self._mark_down(backend, e)
+                tried.add(backend.url)
+                continue
+            except Exception:
+                backend.release(cost)
+                raise
+
+            if "text/event-stream" in resp.headers.get("content-type", ""):
+                return StreamingResponse(
+                    self._relay(resp, backend, cost),
+                    status_code=resp.status_code,
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                             "X-SLM-Backend": backend.url},
+                )
+            try:
+                content = await resp.aread()
+            finally:
+                await resp.aclose()
+                backend.release(cost)
+            return Response(
+                content,
+                status_code=resp.status_code,
+                media_type=resp.headers.get("content-type"),
+                headers={"X-SLM-Backend": backend.url},
+            )
+
+    async def _relay(self, resp: httpx.Response, backend: Backend, cost: int):
+        """Pass SSE bytes through as they arrive"""
+        try:
+            async for chunk in resp.aiter_raw():
+                yield chunk
+        except httpx.TransportError as e:
+            self._mark_down(backend, e)
+        finally:
+            await resp.aclose()
+            backend.release(cost)
+
+    async def forward(self, path: str, body: Dict[str, Any]) -> Response:
+        """Send a cheap request (e.g. /tokenize) to a healthy backend for the model"""
+        tried: Set[str] = set()
+        while True:
+            backend = self.choose(body.get("model"), "", exclude=tried)
+            try:
+                resp = await self.client.post(backend.url + path, json=body)
+            except httpx.TransportError as e:
+                self._mark_down(backend, e)
+                tried.add(backend.url)
+                continue
+            return Response(resp.content, status_code=resp.status_code,
+                            media_type=resp.headers.get("content-type"))
+
+
+def create_router_app(router: Router) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await router.start()
+        try:
+            yield
+        finally:
+            await router.close()
+
+    app = FastAPI(title="SLM Packager Router", version="0.1.0", lifespan=lifespan)
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        return await router.generate(await request.json())
+
+    @app.post("/tokenize")
+    async def tokenize(request: Request):
+        return await router.forward("/tokenize", await request.json())
+
+    @app.post("/detokenize")
+    async def detokenize(request: Request):
+        return await router.forward("/detokenize", await request.json())
+
+    @app.get("/backends")
+    async def backends():
+        return [b.status() for b in router.backends]
+
+    @app.get("/health")
+    async def health():
+        healthy = sum(b.healthy for b in router.backends)
+        return {"status": "ok" if healthy else "degraded", "healthy_backends": healthy,
+                "backends": len(router.backends)}
+
+    return app
+
+
+def start_router(backends: List[str], host: str = "0.0.0.0", port: int = 9000, **options):
+    uvicorn.run(create_router_app(Router(backends, **options)), host=host, port=port)
+
+
+def _normalize(backend: str) -> str:
+    backend = backend.rstrip("/")
+    return backend if "://" in backend else f"http://{backend}"
+
+
+def _rendezvous(prefix: bytes, url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(prefix + url.encode(), digest_size=8).digest(), "big")
@@ -0,0 +1,125 @@
+"""Priority admission of generations to the runtime's slots"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Literal, Optional
+
+Priority = Literal["interactive", "default", "batch"]
+
+# Relative share of generation slots each class gets while all are busy
+DEFAULT_WEIGHTS = {"interactive": 8.0, "default": 2.0, "batch": 1.0}
+
+_EPOCH = time.perf_counter()
+
+
+def estimate_cost(prompt: str, max_tokens: int) -> int:
+    """Rough tokens of work for a request: prompt (4 characters each) plus max_tokens"""
+    return len(prompt) // 4 + max_tokens
+
+
+class _Class:
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.queue = []
+        self.vtime = 0.0
+        self.admitted = 0
+        self.waits_ms = deque(maxlen=1024)
+
+
+class RequestScheduler:
+    """
+    Admits at most `capacity` generations at once; the rest wait in one
+    queue per priority class.
+
+    Classes share the slots by start-time fair queuing: each admission
+    advances its class's virtual time by cost / weight, and the class with
+    the lowest virtual time goes next, so a class with weight 8 gets eight
+    times the tokens of a class with weight 1 while both have work
+    queued. A class that was idle restarts at the current virtual time
+    instead of spending credit it saved up.
+
+    Within a class the cheapest request goes first, and every second of
+    waiting counts as `aging` tokens off its cost, so a long job waits
+    at most cost / aging seconds behind a stream of short ones.
+    """
+
+    def __init__(self, capacity: int, weights: Optional[Dict[str, float]] = None, aging: float = 100.0):
+        self.capacity = capacity
+        self.aging = aging
+        self.classes = {name: _Class(w) for name, w in (weights or DEFAULT_WEIGHTS).items()}
+        self.active = 0
+        self._clock = 0.0
+        self._order = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, cost: int):
+        """Wait for a generation slot in priority order"""
+        cls = self.classes.get(priority)
+        if cls is None:
+            raise ValueError(
+                f"❌ Unknown priority class: '{priority}'\n"
+                f"💡 Use one of: {', '.join(self.classes)}"
+            )
+        if not any(not entry[2].done() for entry in cls.queue):
+            cls.vtime = max(cls.vtime, self._clock)
+        enqueued = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        # Effective cost is cost - aging * waited; waiting lowers it at the same
+        # rate for everyone, so ordering by cost + aging * enqueue time is equivalent
+        key = cost + self.aging * (enqueued - _EPOCH)
+        heapq.heappush(cls.queue, (key, next(self._order), future, cost, enqueued))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the client went away
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _admit(self, cls: _Class, cost: int, enqueued: float):
+        self.active += 1
+        self._clock = cls.vtime
+        cls.vtime += cost / cls.weight
+        cls.admitted += 1
+        cls.waits_ms.append((time.perf_counter() - enqueued) * 1000)
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.active < self.capacity:
+            waiting = [cls for cls in self.classes.values() if cls.queue]
+            if not waiting:
+                return
+            cls = min(waiting, key=lambda c: c.vtime)
+            _, _, future, cost, enqueued = heapq.heappop(cls.queue)
+            if future.done():
+                # Cancelled while queued
+                continue
+            self._admit(cls, cost, enqueued)
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for name, cls in self.classes.items():
+            waits = sorted(cls.waits_ms)
+            classes[name] = {
+                "weight": cls.weight,
+                "queued": sum(not entry[2].done() for entry in cls.queue),
+                "admitted": cls.admitted,
+                "wait_ms_mean": sum(waits) / len(waits) if waits else 0.0,
+                "wait_ms_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_ms_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "wait_ms_max": waits[-1] if waits else 0.0,
+            }
+        return {"capacity": self.capacity, "active": self.active, "classes": classes}
+
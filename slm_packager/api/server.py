@@ -1,24 +1,52 @@
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
 import json
-import asyncio
+import time
+from contextlib import contextmanager
 
 from ..config.models import SLMConfig, GenerationParams
 from ..config.loader import ConfigLoader
 from ..runtime import get_runtime, BaseRuntime
+from ..evaluation.traces import RequestTraceRecorder
+from ..registry.store import mark_used
+from ..runtime import profiling
+from ..runtime.profiling import Profiler
+from .token_cache import TokenCountCache
+from .scheduler import RequestScheduler, Priority, estimate_cost
 
 app = FastAPI(title="SLM Packager API", version="0.1.0")
 
 # Global runtime instance
 runtime: Optional[BaseRuntime] = None
 config: Optional[SLMConfig] = None
+# Optional request trace recorder (enabled with `slm serve --trace`)
+recorder: Optional[RequestTraceRecorder] = None
+# Optional span profiler (enabled with `slm serve --profile`)
+profiler: Optional[Profiler] = None
+profile_path: Optional[str] = None
+# Token counts of recently seen texts, for /tokenize
+token_cache = TokenCountCache()
+# Admits queued generations to the runtime's slots by priority class and cost
+scheduler: Optional[RequestScheduler] = None
 
 class GenerateRequest(BaseModel):
     prompt: str
     params: Optional[GenerationParams] = None
+    # Interactive requests are admitted ahead of default and batch ones
+    priority: Priority = "default"
+
+class TokenizeRequest(BaseModel):
+    texts: List[str]
+    add_special_tokens: bool = True
+    # Counts alone are served from the cache; token ids always tokenize
+    return_tokens: bool = False
+
+class DetokenizeRequest(BaseModel):
+    tokens: List[List[int]]
 
 @app.on_event("startup")
 async def startup_event():
@@ -31,16 +59,23 @@ async def shutdown_event():
     global runtime
     if runtime:
         runtime.unload()
+    if recorder:
+        recorder.close()
+    if profiler:
+        profiler.write(profile_path)
 
 @app.post("/load")
 async def load_model(config_path: str = Body(..., embed=True)):
-    global runtime, config
+    global runtime, config, scheduler
     try:
         config = ConfigLoader.load(config_path)
         if runtime:
             runtime.unload()
         runtime = get_runtime(config)
         runtime.load()
+        scheduler = RequestScheduler(runtime.max_concurrency)
+        token_cache.clear()
+        mark_used(config.model.path)
         return {"status": "success", "message": f"Loaded model {config.model.name}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -52,24 +87,134 @@ async def generate(request: GenerateRequest):
         raise HTTPException(status_code=400, detail="Model not loaded. Call /load first.")
     
     params = request.params or config.params
+    cost = estimate_cost(request.prompt, params.max_tokens)
+    started_at = time.time()
+    start = time.perf_counter()
+    profiled = profiler is not None and profiler.sampled()
     
     try:
         if params.stream:
             return StreamingResponse(
-                _stream_generator(runtime, request.prompt, params),
+                _stream_generator(runtime, request.prompt, params, started_at, start, profiled,
+                                  request.priority, cost),
                 media_type="text/event-stream"
             )
         else:
-            output = runtime.generate(request.prompt, params)
+            with _profiled(profiled):
+                async with _scheduler().slot(request.priority, cost):
+                    output = await run_in_threadpool(runtime.generate, request.prompt, params)
+            _record_trace(request.prompt, params, output, started_at, start)
             return {"text": output}
     except Exception as e:
+        _record_trace(request.prompt, params, "", started_at, start, status="error")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def _stream_generator(rt, prompt, params):
-    for chunk in rt.generate(prompt, params):
-        yield f"data: {json.dumps({'text': chunk})}\n\n"
-        await asyncio.sleep(0) # Yield control
-    yield "data: [DONE]\n\n"
+async def _stream_generator(rt, prompt, params, started_at=None, start=None, profiled=False,
+                            priority="default", cost=0):
+    chunks = []
+    ttft_ms = None
+    status = "ok"
+    try:
+        with _profiled(profiled):
+            async with _scheduler().slot(priority, cost):
+                # Generation runs in worker threads so the event loop keeps serving
+                stream = await run_in_threadpool(rt.generate, prompt, params)
+                async for chunk in iterate_in_threadpool(iter(stream)):
+                    if ttft_ms is None and start is not None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                    chunks.append(chunk)
+                    with profiling.span("sse", cat="server"):
+                        event = f"data: {json.dumps({'text': chunk})}\n\n"
+                    yield event
+        yield "data: [DONE]\n\n"
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if start is not None:
+            _record_trace(prompt, params, "".join(chunks), started_at, start, ttft_ms, status)
+
+@contextmanager
+def _profiled(enabled: bool):
+    """Record this request's runtime spans under the server profiler"""
+    if not enabled:
+        yield
+        return
+    with profiler.activate(), profiler.span("request", cat="server"):
+        yield
+
+def _scheduler() -> RequestScheduler:
+    global scheduler
+    if scheduler is None:
+        # Runtime was set up without /load
+        scheduler = RequestScheduler(runtime.max_concurrency)
+    return scheduler
+
+def _record_trace(prompt, params, output, started_at, start, ttft_ms=None, status="ok"):
+    """Append the request to the trace if recording is enabled"""
+    if recorder is None:
+        return
+    latency_ms = (time.perf_counter() - start) * 1000
+    try:
+        recorder.record(
+            prompt=prompt,
+            params=params,
+            prompt_tokens=runtime.count_tokens(prompt),
+            output_tokens=runtime.count_tokens(output, add_special_tokens=False),
+            started_at=started_at,
+            latency_ms=latency_ms,
+            ttft_ms=ttft_ms,
+            status=status,
+        )
+    except Exception:
+        # Tracing must never break serving
+        pass
+
+@app.post("/tokenize")
+async def tokenize(request: TokenizeRequest):
+    """Token counts (and optionally ids) for a batch of texts"""
+    if not runtime or not runtime.is_loaded:
+        raise HTTPException(status_code=400, detail="Model not loaded. Call /load first.")
+    texts, add_special = request.texts, request.add_special_tokens
+    try:
+        # Tokenizers run outside the generation slots so counting never waits on decoding
+        if request.return_tokens:
+            tokens = await run_in_threadpool(runtime.tokenize_batch, texts, add_special)
+            counts = [len(t) for t in tokens]
+            token_cache.put_many({TokenCountCache.key(t, add_special): c for t, c in zip(texts, counts)})
+            return {"counts": counts, "total": sum(counts), "tokens": tokens}
+
+        keys = [TokenCountCache.key(t, add_special) for t in texts]
+        counts = token_cache.get_many(keys)
+        cached = sum(c is not None for c in counts)
+        # Tokenize each distinct uncached text once
+        missing = {keys[i]: texts[i] for i, c in enumerate(counts) if c is None}
+        if missing:
+            tokens = await run_in_threadpool(runtime.tokenize_batch, list(missing.values()), add_special)
+            fresh = {key: len(t) for key, t in zip(missing, tokens)}
+            token_cache.put_many(fresh)
+            counts = [fresh[k] if c is None else c for k, c in zip(keys, counts)]
+        return {"counts": counts, "total": sum(counts), "cached": cached}
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/detokenize")
+async def detokenize(request: DetokenizeRequest):
+    """Text for a batch of token id sequences"""
+    if not runtime or not runtime.is_loaded:
+        raise HTTPException(status_code=400, detail="Model not loaded. Call /load first.")
+    try:
+        texts = await run_in_threadpool(runtime.detokenize_batch, request.tokens)
+        return {"texts": texts}
+    except ValueError as e:
+        # Out-of-vocabulary ids
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/info")
 async def info():
@@ -78,9 +223,29 @@ async def info():
         return config.model_dump()
     return {"status": "no model loaded"}
 
+@app.get("/stats")
+async def stats():
+    """Load and per-context utilization of the serving runtime"""
+    if not runtime or not runtime.is_loaded:
+        return {"status": "no model loaded"}
+    return {**runtime.stats(), "token_cache": token_cache.stats(), "scheduler": _scheduler().stats()}
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
-def start_server(host: str = "0.0.0.0", port: int = 8000):
+def start_server(
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    trace_path: Optional[str] = None,
+    trace_prompts: str = "hash",
+    profile: Optional[str] = None,
+    profile_sample: float = 0.01,
+):
+    global recorder, profiler, profile_path
+    if trace_path:
+        recorder = RequestTraceRecorder(trace_path, prompt_mode=trace_prompts)
+    if profile:
+        profiler = Profiler(sample_rate=profile_sample)
+        profile_path = profile
     uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,57 @@
+"""LRU cache of prompt token counts for /tokenize"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class TokenCountCache:
+    """
+    Maps (text, add_special_tokens) to a token count.
+
+    Keys are 16-byte BLAKE2 digests, so long prompts cost a few dozen
+    bytes each no matter their length. Clear it when the model changes.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, add_special_tokens: bool) -> bytes:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16)
+        digest.update(b"\x01" if add_special_tokens else b"\x00")
+        return digest.digest()
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[int]]:
+        with self._lock:
+            found = []
+            for key in keys:
+                count = self._counts.get(key)
+                if count is None:
+                    self.misses += 1
+                else:
+                    self._counts.move_to_end(key)
+                    self.hits += 1
+                found.append(count)
+            return found
+
+    def put_many(self, items: Dict[bytes, int]):
+        with self._lock:
+            for key, count in items.items():
+                self._counts[key] = count
+                self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._counts), "hits": self.hits, "misses": self.misses}
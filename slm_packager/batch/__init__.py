@@ -0,0 +1 @@
+from .runner import BatchRunner, BatchSummary, completed_indices
@@ -0,0 +1,236 @@
+"""Offline batch inference over JSONL with resume"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Union
+
+from ..config.models import GenerationParams
+from ..runtime.base import BaseRuntime
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchRecord:
+    """One input line"""
+    index: int
+    id: Any
+    prompt: str
+    params: GenerationParams
+    prompt_tokens: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchSummary:
+    """Totals for one `slm batch` run"""
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    elapsed_sec: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.output_tokens / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        return (self.completed + self.failed) / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+class BatchRunner:
+    """
+    Runs every prompt of a JSONL file through one loaded runtime.
+
+    Input lines are objects with a "prompt" and optional "id" and
+    "params" (overrides of the config's generation params), or bare JSON
+    strings. The input is read lazily in windows of `window` records;
+    each window is sorted by prompt length so requests in flight together
+    (micro-batches of `concurrency`) have similar lengths and finish
+    close together.
+
+    Results are appended to the output as they finish, one JSON line per
+    input record keyed by its line `index`. The output doubles as the
+    checkpoint: on restart, records already present are skipped.
+    """
+
+    def __init__(
+        self,
+        runtime: BaseRuntime,
+        base_params: GenerationParams,
+        concurrency: Optional[int] = None,
+        window: int = 256,
+    ):
+        self.runtime = runtime
+        self.base_params = base_params.model_copy(update={"stream": False})
+        limit = runtime.max_concurrency
+        if concurrency is None:
+            concurrency = limit
+        elif concurrency > limit:
+            logger.warning(
+                f"Concurrency {concurrency} exceeds what this runtime serves at once ({limit}); using {limit}. "
+                "Raise llama_cpp.parallel_slots or pool_size for more"
+            )
+            concurrency = limit
+        self.concurrency = max(1, concurrency)
+        self.window = max(window, self.concurrency)
+
+    def run(
+        self,
+        input_path: Union[str, Path],
+        output_path: Union[str, Path],
+        resume: bool = True,
+        progress: Optional[Callable[[BatchSummary], None]] = None,
+    ) -> BatchSummary:
+        output_path = Path(output_path)
+        done = completed_indices(output_path) if resume else set()
+        summary = BatchSummary(skipped=len(done))
+        if done:
+            logger.info(f"Resuming: {len(done)} records already in {output_path}; failed ones are retried")
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with open(output_path, "a" if resume else "w", buffering=1) as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+
+            def write_finished(block: bool):
+                nonlocal in_flight
+                if not in_flight:
+                    return
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    if result["status"] == "ok":
+                        summary.completed += 1
+                        summary.prompt_tokens += result["prompt_tokens"]
+                        summary.output_tokens += result["output_tokens"]
+                    else:
+                        summary.failed += 1
+                summary.elapsed_sec = time.perf_counter() - start
+                if progress:
+                    progress(summary)
+
+            for window in _windows(self._records(input_path, done), self.window):
+                window.sort(key=lambda r: r.prompt_tokens)
+                for record in window:
+                    while len(in_flight) >= self.concurrency:
+                        write_finished(block=True)
+                    in_flight.add(pool.submit(self._run_one, record))
+            write_finished(block=False)
+            out.flush()
+            os.fsync(out.fileno())
+
+        summary.elapsed_sec = time.perf_counter() - start
+        return summary
+
+    def _records(self, input_path: Union[str, Path], done: Set[int]) -> Iterator[BatchRecord]:
+        with open(input_path, encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if index in done or not line.strip():
+                    continue
+                yield self._parse(index, line)
+
+    def _parse(self, index: int, line: str) -> BatchRecord:
+        try:
+            data = json.loads(line)
+            if isinstance(data, str):
+                data = {"prompt": data}
+            prompt = data["prompt"]
+            params = self.base_params
+            if data.get("params"):
+                params = GenerationParams(**{**self.base_params.model_dump(), **data["params"], "stream": False})
+            record = BatchRecord(index=index, id=data.get("id", index), prompt=prompt, params=params)
+            record.prompt_tokens = self.runtime.count_tokens(prompt)
+            return record
+        except Exception as e:
+            return BatchRecord(index=index, id=index, prompt="", params=self.base_params,
+                               error=f"Invalid input line: {type(e).__name__}: {e}")
+
+    def _run_one(self, record: BatchRecord) -> Dict[str, Any]:
+        result = {"index": record.index, "id": record.id, "prompt_tokens": record.prompt_tokens}
+        if record.error:
+            return {**result, "status": "error", "error": record.error}
+        start = time.perf_counter()
+        try:
+            output = self.runtime.generate(record.prompt, record.params)
+        except Exception as e:
+            return {**result, "status": "error", "error": f"{type(e).__name__}: {e}",
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+        latency_ms = (time.perf_counter() - start) * 1000
+        output_tokens = self.runtime.count_tokens(output, add_special_tokens=False)
+        return {
+            **result,
+            "status": "ok",
+            "output": output,
+            "output_tokens": output_tokens,
+            "latency_ms": round(latency_ms, 3),
+            "tokens_per_second": round(output_tokens / latency_ms * 1000, 2) if latency_ms > 0 else 0.0,
+        }
+
+
+def completed_indices(output_path: Union[str, Path]) -> Set[int]:
+    """
+    Input indices already written to an output file with status "ok".
+
+    Error rows are dropped from the file so those records run again and
+    each index ends up with one line. A partial last line left by a crash
+    is cut off so appending resumes on a clean line boundary.
+    """
+    output_path = Path(output_path)
+    if not output_path.exists():
+        return set()
+    done = set()
+    failed = False
+    with open(output_path, "rb+") as f:
+        clean_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            clean_end += len(line)
+            try:
+                record = json.loads(line)
+                if record.get("status") == "ok":
+                    done.add(record["index"])
+                else:
+                    failed = True
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+        f.truncate(clean_end)
+    if failed:
+        _drop_failed(output_path)
+    return done
+
+
+def _drop_failed(output_path: Path):
+    """Rewrite the output without its error rows"""
+    tmp = output_path.with_name(output_path.name + ".tmp")
+    with open(output_path, "rb") as src, open(tmp, "wb") as dst:
+        for line in src:
+            try:
+                if json.loads(line).get("status") != "ok":
+                    continue
+            except (ValueError, AttributeError):
+                pass
+            dst.write(line)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, output_path)
+
+
+def _windows(records: Iterator[BatchRecord], size: int) -> Iterator[List[BatchRecord]]:
+    window = []
+    for record in records:
+        window.append(record)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
@@ -0,0 +1,2 @@
+from .reader import Bundle, BundleFile, open_bundle, is_bundle, BUNDLE_SUFFIX
+from .writer import build_bundle, PackageResult
@@ -0,0 +1,195 @@
+"""Open .slmpkg bundles and map their files in place"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from ..config.models import SLMConfig
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_SUFFIX = ".slmpkg"
+FORMAT_VERSION = 1
+PAGE_SIZE = 4096
+MAGIC = b"SLMPKG\x00\x01"
+# magic, manifest offset, manifest length
+TRAILER = struct.Struct("<8sQQ")
+
+_HASH_BLOCK = 16 * 1024 * 1024
+
+# safetensors dtype -> torch attribute name
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8",
+    "BOOL": "bool", "F8_E4M3": "float8_e4m3fn", "F8_E5M2": "float8_e5m2",
+}
+
+
+@dataclass
+class BundleFile:
+    """One file stored in a bundle"""
+    name: str
+    offset: int
+    size: int
+    sha256: str
+    kind: str  # "weights" or "metadata"
+
+
+def is_bundle(path: Union[str, Path]) -> bool:
+    return Path(path).suffix == BUNDLE_SUFFIX
+
+
+class Bundle:
+    """
+    A .slmpkg file: every stored file starts on a page boundary,
+    uncompressed, followed by a JSON manifest and a fixed-size trailer
+    that points at it.
+
+    A GGUF model is stored at offset 0, so llama.cpp opens and maps the
+    bundle itself. Safetensors shards are mapped by `state_dict()`.
+    Only the small metadata files (config, tokenizer) are ever written
+    out, to a cache directory keyed by the manifest.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(f"❌ Bundle not found: '{self.path}'")
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if end < TRAILER.size:
+                raise ValueError(f"❌ Not an slm bundle (too small): '{self.path}'")
+            f.seek(end - TRAILER.size)
+            magic, offset, length = TRAILER.unpack(f.read(TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(
+                    f"❌ Not an slm bundle: '{self.path}'\n"
+                    "💡 Create one with: slm package config.yaml -o model.slmpkg"
+                )
+            f.seek(offset)
+            raw = f.read(length)
+        self.digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        self.manifest: Dict[str, Any] = json.loads(raw)
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(
+                f"❌ Unsupported bundle format {self.manifest.get('format')} in '{self.path}'\n"
+                f"💡 This version of slm reads format {FORMAT_VERSION}; rebuild the bundle with slm package"
+            )
+        self.files = {f["name"]: BundleFile(**f) for f in self.manifest["files"]}
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def primary(self) -> Optional[BundleFile]:
+        name = self.manifest.get("primary")
+        return self.files[name] if name else None
+
+    def config(self) -> SLMConfig:
+        """The packaged config, pointing at this bundle"""
+        config = SLMConfig(**self.manifest["config"])
+        config.model.path = str(self.path)
+        return config
+
+    def read(self, name: str) -> bytes:
+        entry = self.files[name]
+        with open(self.path, "rb") as f:
+            f.seek(entry.offset)
+            return f.read(entry.size)
+
+    def mapping(self) -> mmap.mmap:
+        """Private (copy-on-write) mapping of the whole bundle"""
+        if self._map is None:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        return self._map
+
+    def extract_metadata(self, cache_dir: Optional[Path] = None) -> Path:
+        """
+        Write the non-weight files (config.json, tokenizer files, ...) to a
+        directory that Transformers can load from, once per bundle.
+        """
+        root = cache_dir or Path.home() / ".slm" / "cache" / "bundles"
+        target = root / self.digest
+        done = target / ".complete"
+        if done.exists():
+            return target
+        target.mkdir(parents=True, exist_ok=True)
+        for entry in self.files.values():
+            if entry.kind == "weights":
+                continue
+            data = self.read(entry.name)
+            if hashlib.sha256(data).hexdigest() != entry.sha256:
+                raise ValueError(
+                    f"❌ '{entry.name}' in bundle '{self.path}' is corrupt (checksum mismatch)\n"
+                    "💡 Copy the bundle again or rebuild it with slm package"
+                )
+            dest = target / entry.name
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, dest)
+        done.touch()
+        return target
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Torch tensors over the mapped safetensors shards; nothing is copied"""
+        import torch
+
+        buffer = self.mapping()
+        tensors = {}
+        for entry in self.files.values():
+            if not entry.name.endswith(".safetensors"):
+                continue
+            (header_len,) = struct.unpack_from("<Q", buffer, entry.offset)
+            header = json.loads(buffer[entry.offset + 8:entry.offset + 8 + header_len])
+            data_start = entry.offset + 8 + header_len
+            for name, info in header.items():
+                if name == "__metadata__":
+                    continue
+                dtype = getattr(torch, _SAFETENSORS_DTYPES[info["dtype"]])
+                begin, end = info["data_offsets"]
+                count = (end - begin) // dtype.itemsize
+                if count == 0:
+                    tensors[name] = torch.empty(info["shape"], dtype=dtype)
+                    continue
+                flat = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+                tensors[name] = flat.reshape(info["shape"])
+        return tensors
+
+    def verify(self, progress: Optional[Callable[[int], None]] = None) -> List[str]:
+        """Hash every stored file; returns the names that do not match"""
+        bad = []
+        with open(self.path, "rb") as f:
+            for entry in self.files.values():
+                f.seek(entry.offset)
+                digest = hashlib.sha256()
+                remaining = entry.size
+                while remaining:
+                    block = f.read(min(_HASH_BLOCK, remaining))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+                    if progress:
+                        progress(len(block))
+                if remaining or digest.hexdigest() != entry.sha256:
+                    bad.append(entry.name)
+        return bad
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Tensors still point into it; the mapping goes with them
+                pass
+            self._map = None
+
+
+def open_bundle(path: Union[str, Path]) -> Bundle:
+    return Bundle(path)
@@ -0,0 +1,150 @@
+"""Build .slmpkg bundles from a config"""
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+from .. import __version__
+from ..config.models import SLMConfig, RuntimeType
+from ..registry.downloader import SNAPSHOT_PATTERNS
+from .reader import FORMAT_VERSION, MAGIC, PAGE_SIZE, TRAILER, Bundle
+
+logger = logging.getLogger(__name__)
+
+_COPY_BLOCK = 16 * 1024 * 1024
+
+ProgressCallback = Callable[[str, int], None]
+
+
+@dataclass
+class PackageResult:
+    """A finished bundle"""
+    path: Path
+    files: int
+    size: int
+    elapsed_sec: float
+
+
+def build_bundle(
+    config: SLMConfig,
+    output: Union[str, Path],
+    progress: Optional[ProgressCallback] = None,
+) -> PackageResult:
+    """
+    Write the model's weights, tokenizer and `config` into one bundle.
+
+    Files are copied uncompressed at page-aligned offsets and hashed on the
+    way in. The bundle is written next to `output` and renamed into place.
+    """
+    start = time.perf_counter()
+    output = Path(output)
+    sources = _collect(config)
+    tmp = output.with_name(output.name + ".partial")
+    entries = []
+    with open(tmp, "wb") as out:
+        for name, source, kind in sources:
+            _pad(out)
+            offset = out.tell()
+            digest = hashlib.sha256()
+            with open(source, "rb") as f:
+                while True:
+                    block = f.read(_COPY_BLOCK)
+                    if not block:
+                        break
+                    out.write(block)
+                    digest.update(block)
+                    if progress:
+                        progress(name, len(block))
+            entries.append({"name": name, "offset": offset, "size": out.tell() - offset,
+                            "sha256": digest.hexdigest(), "kind": kind})
+
+        packaged = config.model_copy(deep=True)
+        packaged.model.path = sources[0][0]
+        manifest = {
+            "format": FORMAT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "slm_packager": __version__,
+            "source": config.model.path,
+            "primary": sources[0][0] if config.runtime.type == RuntimeType.LLAMA_CPP else None,
+            "page_size": PAGE_SIZE,
+            "config": packaged.model_dump(mode="json"),
+            "files": entries,
+        }
+        raw = json.dumps(manifest, indent=2).encode("utf-8")
+        _pad(out)
+        manifest_offset = out.tell()
+        out.write(raw)
+        out.write(TRAILER.pack(MAGIC, manifest_offset, len(raw)))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, output)
+
+    # Read back so a bad write fails here rather than on the deployment host
+    Bundle(output)
+    return PackageResult(
+        path=output,
+        files=len(entries),
+        size=output.stat().st_size,
+        elapsed_sec=time.perf_counter() - start,
+    )
+
+
+def _collect(config: SLMConfig) -> List[Tuple[str, Path, str]]:
+    """(name in bundle, source file, kind) with the weights first"""
+    runtime = config.runtime.type
+    if runtime == RuntimeType.LLAMA_CPP:
+        path = Path(config.model.path)
+        if not path.is_file() or path.suffix != ".gguf":
+            raise FileNotFoundError(
+                f"❌ GGUF model file not found: '{config.model.path}'\n"
+                "💡 model.path must point at the .gguf file to package"
+            )
+        # At offset 0, so llama.cpp can open the bundle as the GGUF file itself
+        return [(path.name, path, "weights")]
+
+    if runtime == RuntimeType.TRANSFORMERS:
+        root = _snapshot_dir(config.model.path)
+        files = sorted(
+            p for p in root.iterdir()
+            if p.is_file() and any(fnmatch(p.name, pattern) for pattern in SNAPSHOT_PATTERNS)
+        )
+        weights = [p for p in files if p.suffix == ".safetensors"]
+        if not weights:
+            raise ValueError(
+                f"❌ No .safetensors weights in '{root}'\n"
+                "💡 Bundles map weights in place, which pickled .bin checkpoints cannot do.\n"
+                "   Convert them first, e.g. model.save_pretrained(dir, safe_serialization=True)"
+            )
+        metadata = [p for p in files if p.suffix != ".safetensors"]
+        return [(p.name, p, "weights") for p in weights] + [(p.name, p, "metadata") for p in metadata]
+
+    raise ValueError(
+        f"❌ Packaging is not supported for the {runtime.value} runtime yet\n"
+        "💡 Package a GGUF (llama_cpp) or safetensors (transformers) model"
+    )
+
+
+def _snapshot_dir(model_path: str) -> Path:
+    """A local model directory, or the cached snapshot of a HuggingFace model ID"""
+    path = Path(model_path)
+    if path.is_dir():
+        return path
+    try:
+        from huggingface_hub import snapshot_download
+    except ImportError:
+        raise ImportError(
+            "❌ Packaging a HuggingFace model ID requires 'huggingface_hub'\n"
+            "💡 Install it with: pip install huggingface-hub, or point model.path at a local directory"
+        )
+    return Path(snapshot_download(model_path, allow_patterns=SNAPSHOT_PATTERNS))
+
+
+def _pad(out):
+    position = out.tell()
+    if position % PAGE_SIZE:
+        out.write(b"\0" * (PAGE_SIZE - position % PAGE_SIZE))
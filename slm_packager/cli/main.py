@@ -1,15 +1,26 @@
 import click
 import os
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
 from ..config.models import SLMConfig, ModelConfig, RuntimeConfig, RuntimeType, DeviceType
 from ..config.loader import ConfigLoader
 from ..runtime import get_runtime
-from ..api import start_server
+from ..api import start_server, start_router
 from ..quantization import Quantizer
-from ..evaluation import Benchmarker
+from ..export import OnnxExporter
+from ..batch import BatchRunner
+from ..bundle import build_bundle, open_bundle, BUNDLE_SUFFIX
+from ..evaluation import Benchmarker, TraceReplayer, load_trace, PerplexityEvaluator
+from ..evaluation.download_benchmark import benchmark_downloads
+from ..runtime.warmup import prefetch
+from ..runtime import profiling
+from ..runtime.profiling import Profiler
 from ..registry.downloader import ModelDownloader
-from ..registry import ModelRegistry
+from ..registry import ModelRegistry, parse_size
+from ..registry.store import ModelStore, mark_used
+from ..registry.selection import VariantSelector, HostProfile, BenchmarkStore, benchmark_key
 
 @click.group()
 def cli():
@@ -42,8 +53,10 @@ def init(name, path, format, runtime, output):
 @click.argument("config_path", type=click.Path(exists=True))
 @click.option("--prompt", "-p", help="Prompt to generate from")
 @click.option("--stream/--no-stream", default=True, help="Stream output")
-def run(config_path, prompt, stream):
+@click.option("--profile", "profile_path", type=click.Path(dir_okay=False), default=None, help="Write per-phase timings as Chrome trace JSON to this file")
+def run(config_path, prompt, stream, profile_path):
     """Run a model from a config file"""
+    profiler = Profiler() if profile_path else None
     try:
         # Load config
         config = ConfigLoader.load(config_path)
@@ -55,7 +68,10 @@ def run(config_path, prompt, stream):
         
         # Get and load runtime
         runtime = get_runtime(config)
-        runtime.load()
+        with profiler.activate() if profiler else nullcontext():
+            with profiling.span("load"):
+                runtime.load()
+        mark_used(config.model.path)
         
         # Get prompt if not provided
         if not prompt:
@@ -64,17 +80,25 @@ def run(config_path, prompt, stream):
         click.echo("-" * 20)
         
         # Generate
-        if stream:
-            for chunk in runtime.generate(prompt, config.params):
-                click.echo(chunk, nl=False)
-            click.echo()
-        else:
-            output = runtime.generate(prompt, config.params)
-            click.echo(output)
+        with profiler.activate() if profiler else nullcontext():
+            with profiling.span("generate_request"):
+                if stream:
+                    for chunk in runtime.generate(prompt, config.params):
+                        click.echo(chunk, nl=False)
+                    click.echo()
+                else:
+                    output = runtime.generate(prompt, config.params)
+                    click.echo(output)
         
         # Cleanup
         runtime.unload()
         
+        if profiler:
+            profiler.write(profile_path)
+            click.echo(f"\n⏱️  Profile written to {profile_path} (open in ui.perfetto.dev or chrome://tracing)")
+            for name, m in profiler.summary().items():
+                click.echo(f"   {name:<18} {m['count']:>6} × {m['mean_ms']:>9.3f} ms = {m['total_ms']:>10.1f} ms")
+        
     except FileNotFoundError as e:
         click.echo(f"\n{str(e)}", err=True)
         sys.exit(1)
@@ -104,7 +128,14 @@ def run(config_path, prompt, stream):
 
 @cli.command()
 @click.argument("config_path", type=click.Path(exists=True))
-def benchmark(config_path):
+@click.option("--startup", is_flag=True, help="ONNX: compare session creation time cold vs cached optimized graph")
+@click.option("--presets", default=None, help="llama.cpp: compare presets, e.g. low-memory,balanced,throughput")
+@click.option("--threads", "thread_settings", default=None, help="Compare thread counts, e.g. 1,2,4,auto")
+@click.option("--concurrency", default=None, help="Aggregate throughput at these concurrent streams, e.g. 1,4,8,16")
+@click.option("--pool-sizes", default=None, help="llama.cpp: compare context pool sizes, e.g. 1,2,4")
+@click.option("--adapters", default=None, help="Compare LoRA adapters against the base model, e.g. sql,chat (or 'all')")
+@click.option("--speculative", is_flag=True, help="Compare prompt-lookup speculative decoding on a copy-heavy prompt")
+def benchmark(config_path, startup, presets, thread_settings, concurrency, pool_sizes, adapters, speculative):
     """Benchmark a model"""
     try:
         config = ConfigLoader.load(config_path)
@@ -112,6 +143,90 @@ def benchmark(config_path):
         click.echo(f"Benchmarking {config.model.name}...")
         
         benchmarker = Benchmarker(config)
+        
+        if startup:
+            metrics = benchmarker.run_session_startup()
+            click.echo(f"\n📊 Session Startup:")
+            click.echo(f"   Cold (no cache): {metrics['cold_ms']:.1f} ms")
+            click.echo(f"   First start (optimize + save): {metrics['populate_ms']:.1f} ms")
+            click.echo(f"   Cached: {metrics['cached_ms']:.1f} ms ({metrics['speedup']:.1f}x faster)")
+            return
+        
+        if thread_settings:
+            settings = [t.strip() if t.strip() == "auto" else int(t) for t in thread_settings.split(",") if t.strip()]
+            results = benchmarker.compare_thread_settings(settings)
+            click.echo(f"\n📊 Thread Scaling:")
+            click.echo(f"   {'setting':<8} {'threads':>7} {'TTFT ms':>9} {'tok/s':>7}")
+            for name, m in results.items():
+                click.echo(f"   {name:<8} {m['threads']:>7} {m['ttft_ms']:>9.1f} {m['tokens_per_second']:>7.1f}")
+            return
+        
+        if concurrency:
+            levels = [int(c) for c in concurrency.split(",") if c.strip()]
+            results = benchmarker.compare_concurrency(levels)
+            baseline = results[str(levels[0])]["aggregate_tokens_per_second"]
+            click.echo(f"\n📊 Concurrent Streams:")
+            click.echo(f"   {'streams':>7} {'tokens':>7} {'wall s':>7} {'agg tok/s':>10} {'mean lat s':>10} {'scaling':>8}")
+            for m in results.values():
+                scaling = m["aggregate_tokens_per_second"] / baseline if baseline else 0.0
+                click.echo(
+                    f"   {m['streams']:>7} {m['tokens']:>7} {m['wall_sec']:>7.2f} "
+                    f"{m['aggregate_tokens_per_second']:>10.1f} {m['mean_latency_sec']:>10.2f} {scaling:>7.1f}x"
+                )
+            return
+        
+        if pool_sizes:
+            sizes = [int(n) for n in pool_sizes.split(",") if n.strip()]
+            results = benchmarker.compare_pool_sizes(sizes)
+            click.echo(f"\n📊 Context Pool ({max(sizes)} concurrent streams):")
+            click.echo(f"   {'contexts':>8} {'RSS MB':>8} {'+MB/ctx':>8} {'agg tok/s':>10} {'util':>6}")
+            for m in results.values():
+                click.echo(
+                    f"   {m['contexts']:>8} {m['rss_mb']:>8.0f} {m['rss_per_added_context_mb']:>8.1f} "
+                    f"{m['aggregate_tokens_per_second']:>10.1f} {m['mean_utilization']:>6.0%}"
+                )
+            return
+        
+        if speculative:
+            results = benchmarker.compare_speculative()
+            click.echo(f"\n📊 Prompt-Lookup Speculation (copy-heavy prompt):")
+            click.echo(f"   {'mode':<12} {'tokens':>7} {'tok/s':>7} {'tok/step':>9} {'speedup':>8}")
+            for name, m in results.items():
+                click.echo(
+                    f"   {name:<12} {m['tokens']:>7} {m['tokens_per_second']:>7.1f} "
+                    f"{m['tokens_per_step']:>9.2f} {m['speedup']:>7.2f}x"
+                )
+            return
+        
+        if adapters:
+            names = None if adapters == "all" else [a.strip() for a in adapters.split(",") if a.strip()]
+            results = benchmarker.compare_adapters(names)
+            base, total = results.pop("base"), results.pop("total")
+            click.echo(f"\n📊 LoRA Adapters (base: {base['rss_mb']:.0f} MB RSS, {base['tokens_per_second']:.1f} tok/s):")
+            click.echo(f"   {'adapter':<16} {'load s':>7} {'size MB':>8} {'+RSS MB':>8} {'tok/s':>7} {'vs base':>8}")
+            for name, m in results.items():
+                click.echo(
+                    f"   {name:<16} {m['load_sec']:>7.2f} {m['size_mb']:>8.1f} {m['rss_delta_mb']:>8.1f} "
+                    f"{m['tokens_per_second']:>7.1f} {m['relative_speed']:>8.0%}"
+                )
+            click.echo(
+                f"   Shared base + {len(results)} adapters: {total['shared_mb']:.0f} MB "
+                f"(vs ~{total['merged_estimate_mb']:.0f} MB for {len(results)} merged models)"
+            )
+            return
+        
+        if presets:
+            names = [p.strip() for p in presets.split(",") if p.strip()]
+            results = benchmarker.compare_llama_presets(names)
+            click.echo(f"\n📊 Preset Comparison:")
+            click.echo(f"   {'preset':<12} {'RSS MB':>8} {'peak MB':>8} {'KV MB':>8} {'TTFT ms':>9} {'tok/s':>7}")
+            for name, m in results.items():
+                click.echo(
+                    f"   {name:<12} {m['load_rss_mb']:>8.0f} {m['peak_rss_mb']:>8.0f} {m['kv_cache_mb']:>8.0f} "
+                    f"{m['ttft_ms']:>9.1f} {m['tokens_per_second']:>7.1f}"
+                )
+            return
+        
         metrics = benchmarker.run()
         
         click.echo(f"\n📊 Benchmark Results:")
@@ -121,6 +236,15 @@ def benchmark(config_path):
         click.echo(f"   Latency: {metrics['latency_ms']:.2f} ms")
         click.echo(f"   Estimated TPS: {metrics['tokens_per_second']:.2f}")
         
+        # Remember results for this host class; slm pull --auto uses them
+        host = HostProfile.detect()
+        if config.model.repo and config.model.variant:
+            key = benchmark_key(config.model.repo, config.model.variant)
+        else:
+            key = Path(config.model.path).name
+        BenchmarkStore().record(host.host_class, key, metrics)
+        click.echo(f"   Saved for host class {host.host_class}")
+        
     except FileNotFoundError as e:
         click.echo(f"\n{str(e)}", err=True)
         sys.exit(1)
@@ -132,34 +256,236 @@ def benchmark(config_path):
         click.echo(f"   - Ensuring the model loads correctly with 'slm run'", err=True)
         sys.exit(1)
 
+@cli.command()
+@click.argument("config_path", type=click.Path(exists=True))
+@click.option("--mode", type=click.Choice(["read", "advise"]), default="read", help="Read the weights through, or only ask the kernel to read ahead")
+@click.option("--measure", is_flag=True, help="Compare cold, prefetched and warmed time-to-first-token")
+@click.option("--warmup-tokens", default=8, type=int, help="Tokens generated by the warm-up run (with --measure)")
+def warm(config_path, mode, measure, warmup_tokens):
+    """Warm the page cache for a model before serving it"""
+    try:
+        config = ConfigLoader.load(config_path)
+        
+        if measure:
+            click.echo(f"Measuring cold vs warm start for {config.model.name}...")
+            results = Benchmarker(config).run_warm_start(warmup_tokens=warmup_tokens)
+            click.echo(f"\n📊 Warm Start Results:")
+            for scenario, metrics in results.items():
+                click.echo(
+                    f"   {scenario:<11} load {metrics['load_sec']:6.2f}s   "
+                    f"first token {metrics['ttft_ms']:8.1f} ms"
+                )
+            return
+        
+        click.echo(f"Warming {config.model.path}...")
+        result = prefetch(config.model.path, mode=mode)
+        verb = "Requested read-ahead for" if mode == "advise" else "Cached"
+        click.echo(
+            f"✅ {verb} {result.bytes / (1024**2):.0f}MB in {result.files} file(s) "
+            f"({result.elapsed_sec:.2f}s, {result.mb_per_second:.0f}MB/s)"
+        )
+        
+    except FileNotFoundError as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error warming model:", err=True)
+        click.echo(f"   {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("config_path", type=click.Path(exists=True))
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", type=click.Path(dir_okay=False))
+@click.option("--concurrency", "-c", default=None, type=int, help="Requests in flight (default: what the runtime serves at once)")
+@click.option("--window", default=256, type=int, help="Input records sorted by length together")
+@click.option("--no-resume", is_flag=True, help="Overwrite the output instead of skipping records already completed (failed ones are always retried)")
+def batch(config_path, input_path, output_path, concurrency, window, no_resume):
+    """Run every prompt in a JSONL file through one loaded model"""
+    try:
+        config = ConfigLoader.load(config_path)
+        click.echo(f"Loading model {config.model.name} with {config.runtime.type}...")
+        runtime = get_runtime(config)
+        runtime.load()
+        mark_used(config.model.path)
+        
+        runner = BatchRunner(runtime, config.params, concurrency=concurrency, window=window)
+        click.echo(f"📦 Batch: {input_path} → {output_path} (concurrency {runner.concurrency})")
+        
+        def show(summary):
+            click.echo(
+                f"\r   {summary.completed} done, {summary.failed} failed, "
+                f"{summary.tokens_per_second:.1f} tok/s",
+                nl=False,
+            )
+        
+        try:
+            summary = runner.run(input_path, output_path, resume=not no_resume, progress=show)
+        finally:
+            runtime.unload()
+        
+        click.echo(f"\n\n✅ Batch complete in {summary.elapsed_sec:.1f}s")
+        if summary.skipped:
+            click.echo(f"   Resumed: {summary.skipped} records were already done")
+        click.echo(f"   Completed: {summary.completed}   Failed: {summary.failed}")
+        click.echo(f"   Tokens: {summary.prompt_tokens} prompt, {summary.output_tokens} generated")
+        click.echo(f"   Throughput: {summary.tokens_per_second:.1f} tok/s, {summary.records_per_second:.2f} records/s")
+        if summary.failed:
+            click.echo(f"\n💡 Failed records have \"status\": \"error\" in {output_path}")
+    except KeyboardInterrupt:
+        click.echo(f"\n\n⚠️  Interrupted; rerun the same command to resume", err=True)
+        sys.exit(130)
+    except FileNotFoundError as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error during batch run:", err=True)
+        click.echo(f"   {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command("benchmark-download")
+@click.option("--size-mb", default=256, type=int, help="Size of the test file")
+@click.option("--connections", default="1,4,8", help="Connection counts to compare (comma-separated)")
+@click.option("--per-connection-mbps", default=None, type=float, help="Throttle each connection to simulate a CDN")
+def benchmark_download(size_mb, connections, per_connection_mbps):
+    """Benchmark parallel range downloads against a local HTTP server"""
+    try:
+        counts = [int(c) for c in connections.split(",") if c.strip()]
+        click.echo(f"Downloading a {size_mb}MB file from a local server...")
+        results = benchmark_downloads(size_mb=size_mb, connections=counts, per_connection_mbps=per_connection_mbps)
+        
+        click.echo(f"\n📊 Download Results:")
+        for result in results:
+            status = "✅" if result["verified"] else "❌"
+            click.echo(
+                f"   {status} {result['connections']:>2} connections: "
+                f"{result['mb_per_second']:>8.1f} MB/s ({result['elapsed_sec']:.2f}s)"
+            )
+    except Exception as e:
+        click.echo(f"\n❌ Error during download benchmark:", err=True)
+        click.echo(f"   {str(e)}", err=True)
+        sys.exit(1)
+
 @cli.command()
 @click.argument("model_name")
-@click.option("--type", default="q4_k_m", help="Quantization type (q4_k_m, int8)")
-def quantize(model_name, type):
+@click.option("--type", default=None, help="Quantization type(s), comma-separated for GGUF (default: q4_k_m for GGUF, int8 for ONNX)")
+@click.option("--jobs", "-j", default=None, type=int, help="Parallel quantization jobs (default: sized to cores and RAM)")
+@click.option("--output-dir", default=None, type=click.Path(file_okay=False), help="Directory for quantized files (default: next to input)")
+@click.option("--mode", type=click.Choice(["dynamic", "static"]), default="dynamic", help="ONNX: dynamic (weights only) or static (calibrated activations)")
+@click.option("--calibration", default=None, type=click.Path(exists=True, dir_okay=False), help="ONNX static: calibration text file")
+@click.option("--calibration-samples", default=128, type=int, help="ONNX static: number of calibration samples")
+@click.option("--calibration-method", type=click.Choice(["minmax", "entropy", "percentile"]), default="minmax", help="ONNX static: range estimation method")
+@click.option("--tokenizer", default=None, help="ONNX static: tokenizer path or repo id (default: model directory)")
+@click.option("--per-channel", is_flag=True, help="ONNX static: per-channel weight scales")
+@click.option("--format", "quant_format", type=click.Choice(["qdq", "qoperator"]), default="qdq", help="ONNX static: quantized graph format")
+@click.option("--activation-type", type=click.Choice(["int8", "uint8"]), default=None, help="ONNX static: activation type")
+@click.option("--ops", default=None, help="ONNX: only quantize these operator types (comma-separated)")
+@click.option("--op-override", multiple=True, help="ONNX static: per-operator types as OP:WEIGHT:ACTIVATION (e.g. MatMul:int8:uint8)")
+@click.option("--compare", is_flag=True, help="ONNX: benchmark latency and size against fp32 and dynamic")
+def quantize(model_name, type, jobs, output_dir, mode, calibration, calibration_samples, calibration_method,
+             tokenizer, per_channel, quant_format, activation_type, ops, op_override, compare):
     """Quantize a model"""
     try:
         # This is a simplified CLI that assumes model_name is a path for now
         # In a real app, we would look up the model in a registry
         model_path = model_name
+        if type is None:
+            type = "int8" if model_path.endswith(".onnx") else "q4_k_m"
+        types = [t.strip() for t in type.split(",") if t.strip()]
         
         if not Path(model_path).exists():
             click.echo(f"❌ Model file not found: '{model_path}'", err=True)
             click.echo(f"💡 Provide the full path to the model file", err=True)
             sys.exit(1)
         
+        if not types:
+            click.echo(f"❌ No quantization type given", err=True)
+            sys.exit(1)
+        
         if model_path.endswith(".gguf"):
-            output_path = model_path.replace(".gguf", f"-{type}.gguf")
-            click.echo(f"Quantizing GGUF model to {type}...")
-            Quantizer.quantize_gguf(model_path, output_path, type)
+            if len(types) == 1 and not output_dir:
+                output_path = model_path.replace(".gguf", f"-{types[0]}.gguf")
+                click.echo(f"Quantizing GGUF model to {types[0]}...")
+                Quantizer.quantize_gguf(model_path, output_path, types[0])
+                return
+            
+            click.echo(f"Quantizing GGUF model to {', '.join(types)}...")
+            results = Quantizer.quantize_gguf_many(model_path, types, output_dir=output_dir, max_workers=jobs)
+            
+            click.echo(f"\n📊 Quantization Summary:")
+            for result in results:
+                if result.ok:
+                    size_mb = result.output_size / (1024 * 1024)
+                    click.echo(
+                        f"   ✅ {result.type:<8} {size_mb:>9.1f} MB  "
+                        f"{result.wall_time_sec:>7.1f}s  {result.compression_ratio:.2f}x  {result.output_path}"
+                    )
+                else:
+                    click.echo(f"   ❌ {result.type:<8} failed after {result.wall_time_sec:.1f}s")
+                    click.echo(f"      {result.error.splitlines()[0]}")
+            
+            if not all(result.ok for result in results):
+                sys.exit(1)
         elif model_path.endswith(".onnx"):
-            output_path = model_path.replace(".onnx", f"-{type}.onnx")
-            click.echo(f"Quantizing ONNX model to {type}...")
-            Quantizer.quantize_onnx(model_path, output_path, type)
+            if len(types) > 1:
+                click.echo(f"❌ ONNX quantization accepts a single --type", err=True)
+                sys.exit(1)
+            suffix = types[0] if mode == "dynamic" else f"{types[0]}-static"
+            output_path = model_path.replace(".onnx", f"-{suffix}.onnx")
+            
+            overrides = {}
+            for spec in op_override:
+                parts = spec.split(":")
+                if len(parts) != 3:
+                    click.echo(f"❌ Invalid --op-override '{spec}'", err=True)
+                    click.echo(f"💡 Use OP:WEIGHT:ACTIVATION, e.g. MatMul:int8:uint8", err=True)
+                    sys.exit(1)
+                overrides[parts[0]] = (parts[1], parts[2])
+            
+            click.echo(f"Quantizing ONNX model to {types[0]} ({mode})...")
+            Quantizer.quantize_onnx(
+                model_path, output_path, types[0],
+                mode=mode,
+                calibration_data=calibration,
+                tokenizer=tokenizer,
+                per_channel=per_channel,
+                quant_format=quant_format,
+                activation_type=activation_type,
+                op_types=ops.split(",") if ops else None,
+                op_overrides=overrides or None,
+                calibration_samples=calibration_samples,
+                calibration_method=calibration_method
+            )
+            
+            if compare:
+                import tempfile
+                with tempfile.TemporaryDirectory() as tmp:
+                    variants = {"fp32": model_path}
+                    if mode == "static":
+                        dynamic_path = str(Path(tmp) / "dynamic.onnx")
+                        Quantizer.quantize_onnx(model_path, dynamic_path, types[0])
+                        variants["dynamic"] = dynamic_path
+                    variants[mode] = output_path
+                    
+                    click.echo(f"\nBenchmarking {', '.join(variants)}...")
+                    results = Benchmarker.compare_onnx_models(variants)
+                
+                baseline = results["fp32"]
+                click.echo(f"\n📊 ONNX Variant Comparison:")
+                for label, metrics in results.items():
+                    speedup = baseline["latency_p50_ms"] / metrics["latency_p50_ms"]
+                    click.echo(
+                        f"   {label:<8} {metrics['size_mb']:>9.1f} MB  "
+                        f"p50 {metrics['latency_p50_ms']:>8.2f} ms  {speedup:.2f}x"
+                    )
         else:
             click.echo(f"❌ Unsupported file extension: '{Path(model_path).suffix}'", err=True)
             click.echo(f"💡 Only .gguf and .onnx are supported", err=True)
             sys.exit(1)
             
+    except KeyboardInterrupt:
+        click.echo(f"\n\n⚠️  Quantization cancelled by user (Ctrl+C)", err=True)
+        sys.exit(130)
     except Exception as e:
         click.echo(f"\n❌ Error during quantization:", err=True)
         click.echo(f"   {str(e)}", err=True)
@@ -168,12 +494,21 @@ def quantize(model_name, type):
 @cli.command()
 @click.option("--host", default="0.0.0.0", help="Host to bind to")
 @click.option("--port", default=8000, help="Port to bind to")
-def serve(host, port):
+@click.option("--trace", "trace_path", type=click.Path(dir_okay=False), default=None, help="Record a JSONL request trace to this file")
+@click.option("--trace-prompts", type=click.Choice(["hash", "drop"]), default="hash", help="Store a prompt hash or drop prompts entirely")
+@click.option("--profile", "profile_path", type=click.Path(dir_okay=False), default=None, help="Write sampled per-phase timings as Chrome trace JSON on shutdown")
+@click.option("--profile-sample", default=0.01, type=click.FloatRange(0.0, 1.0, min_open=True), help="Fraction of requests to profile")
+def serve(host, port, trace_path, trace_prompts, profile_path, profile_sample):
     """Start the API server"""
     try:
         click.echo(f"🚀 Starting API server on {host}:{port}")
+        if trace_path:
+            click.echo(f"   Recording request trace to {trace_path}")
+        if profile_path:
+            click.echo(f"   Profiling {profile_sample:.0%} of requests; trace written to {profile_path} on shutdown")
         click.echo(f"   Press Ctrl+C to stop")
-        start_server(host, port)
+        start_server(host, port, trace_path=trace_path, trace_prompts=trace_prompts,
+                     profile=profile_path, profile_sample=profile_sample)
     except KeyboardInterrupt:
         click.echo(f"\n\n⚠️  Server stopped by user (Ctrl+C)")
         sys.exit(0)
@@ -193,32 +528,289 @@ def serve(host, port):
         sys.exit(1)
 
 @cli.command()
-@click.argument("model_name")
+@click.option("--backend", "backends", multiple=True, required=True, help="slm serve instance as host:port (repeatable)")
+@click.option("--host", default="0.0.0.0", help="Host to bind to")
+@click.option("--port", default=9000, help="Port to bind to")
+@click.option("--affinity", is_flag=True, help="Send prompts with a shared prefix to the same backend")
+@click.option("--prefix-chars", default=256, type=int, help="Prompt characters hashed for --affinity")
+@click.option("--affinity-slack", default=2048, type=int, help="Outstanding tokens an affine backend may exceed the least loaded by")
+@click.option("--health-interval", default=5.0, type=float, help="Seconds between /health checks")
+def router(backends, host, port, affinity, prefix_chars, affinity_slack, health_interval):
+    """Route requests across several slm serve instances"""
+    try:
+        click.echo(f"🔀 Starting router on {host}:{port} for {len(backends)} backends")
+        for backend in backends:
+            click.echo(f"   - {backend}")
+        if affinity:
+            click.echo(f"   Prefix affinity on (first {prefix_chars} characters)")
+        click.echo(f"   Press Ctrl+C to stop")
+        start_router(
+            list(backends), host=host, port=port, affinity=affinity, prefix_chars=prefix_chars,
+            affinity_slack=affinity_slack, health_interval=health_interval,
+        )
+    except KeyboardInterrupt:
+        click.echo(f"\n\n⚠️  Router stopped by user (Ctrl+C)")
+        sys.exit(0)
+    except Exception as e:
+        click.echo(f"\n❌ Error starting router:", err=True)
+        click.echo(f"   {type(e).__name__}: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("config_path", type=click.Path(exists=True))
+@click.option("--format", "export_format", type=click.Choice(["onnx"]), default="onnx", help="Export format")
+@click.option("--output", "-o", default=None, type=click.Path(file_okay=False), help="Output directory (default: ./<model-name>-onnx)")
+@click.option("--opset", default=17, type=int, help="ONNX opset version")
+@click.option("--atol", default=1e-3, type=float, help="Maximum allowed logit difference vs PyTorch")
+def export(config_path, export_format, output, opset, atol):
+    """Export a Transformers model to ONNX with KV-cache inputs"""
+    try:
+        config = ConfigLoader.load(config_path)
+        output_dir = output or f"{config.model.name.replace('/', '-')}-onnx"
+        
+        exporter = OnnxExporter(config, output_dir, opset=opset, atol=atol)
+        result = exporter.export()
+        
+        click.echo(f"\n✅ Exported {result.num_layers}-layer decoder: {result.model_path}")
+        click.echo(f"✅ Config created: {result.config_path}")
+        click.echo(f"\n🚀 Ready to use:")
+        click.echo(f"   slm run {result.config_path} --prompt \"Hello!\"")
+        
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error exporting model:", err=True)
+        click.echo(f"   {type(e).__name__}: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("config_path", type=click.Path(exists=True))
+@click.option("--output", "-o", default=None, type=click.Path(dir_okay=False), help="Bundle file (default: ./<model-name>.slmpkg)")
+def package(config_path, output):
+    """Bundle weights, tokenizer and config into one .slmpkg file"""
+    try:
+        config = ConfigLoader.load(config_path)
+        output = output or f"{config.model.name.replace('/', '-')}{BUNDLE_SUFFIX}"
+        click.echo(f"📦 Packaging {config.model.name}...")
+        
+        started = set()
+        def progress(name, nbytes):
+            if name not in started:
+                started.add(name)
+                click.echo(f"   + {name}")
+        
+        result = build_bundle(config, output, progress=progress)
+        click.echo(f"\n✅ Wrote {result.path} ({result.size / 1024**3:.2f} GB, {result.files} files) in {result.elapsed_sec:.1f}s")
+        click.echo(f"\n🚀 Ready to use:")
+        click.echo(f"   slm run {result.path} --prompt \"Hello!\"")
+        
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error packaging model:", err=True)
+        click.echo(f"   {type(e).__name__}: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("bundle_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--verify", is_flag=True, help="Check every file against its SHA-256 (reads the whole bundle)")
+def inspect(bundle_path, verify):
+    """Show the contents of a .slmpkg bundle"""
+    try:
+        bundle = open_bundle(bundle_path)
+        manifest = bundle.manifest
+        config = bundle.config()
+        click.echo(f"📦 {config.model.name} ({config.runtime.type.value}), packaged {manifest['created']} from {manifest['source']}")
+        for entry in bundle.files.values():
+            click.echo(f"   {entry.name:<40} {entry.kind:<9} {entry.size / 1024**2:>10.1f} MB  @ {entry.offset}")
+        if verify:
+            bad = bundle.verify()
+            if bad:
+                click.echo(f"\n❌ Checksum mismatch: {', '.join(bad)}", err=True)
+                click.echo(f"💡 Copy the bundle again or rebuild it with slm package", err=True)
+                sys.exit(1)
+            click.echo(f"\n✅ All {len(bundle.files)} files match the manifest")
+    except (FileNotFoundError, ValueError) as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error reading bundle:", err=True)
+        click.echo(f"   {type(e).__name__}: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.group("eval")
+def eval_group():
+    """Evaluate model quality"""
+    pass
+
+@eval_group.command("perplexity")
+@click.argument("config_path", type=click.Path(exists=True))
+@click.option("--data", "data_path", required=True, type=click.Path(exists=True, dir_okay=False), help="UTF-8 text corpus (any size)")
+@click.option("--batch-size", default=4, type=int, help="Windows scored per forward batch")
+@click.option("--window", default=None, type=int, help="Window size in tokens (default: model context size)")
+@click.option("--stride", default=None, type=int, help="Tokens between window starts (default: window / 2)")
+@click.option("--max-tokens", default=None, type=click.IntRange(min=1), help="Stop after scoring this many tokens")
+@click.option("--confidence", default=0.95, type=float, help="Confidence level for the interval")
+def eval_perplexity(config_path, data_path, batch_size, window, stride, max_tokens, confidence):
+    """Measure perplexity of a model on a text corpus"""
+    try:
+        config = ConfigLoader.load(config_path)
+        click.echo(f"Evaluating perplexity of {config.model.name} on {data_path}...")
+        
+        evaluator = PerplexityEvaluator(config, batch_size=batch_size, window=window, stride=stride)
+        
+        def progress(tokens):
+            click.echo(f"   Scored {tokens:,} tokens", nl=False)
+            click.echo("\r", nl=False)
+        
+        result = evaluator.run(data_path, max_tokens=max_tokens, confidence=confidence, progress=progress)
+        
+        click.echo(f"\n📊 Perplexity Results:")
+        click.echo(f"   Perplexity: {result.perplexity:.3f}")
+        click.echo(f"   {result.confidence:.0%} CI: [{result.ci_low:.3f}, {result.ci_high:.3f}]")
+        click.echo(f"   Tokens Scored: {result.tokens:,} in {result.windows:,} windows")
+        click.echo(f"   Time: {result.elapsed_sec:.2f}s")
+        click.echo(f"   Throughput: {result.tokens_per_second:.1f} tokens/s")
+        
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        click.echo(f"\n\n⚠️  Interrupted by user (Ctrl+C)", err=True)
+        sys.exit(130)
+    except Exception as e:
+        click.echo(f"\n❌ Error during evaluation:", err=True)
+        click.echo(f"   {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("trace_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--config", "config_path", type=click.Path(exists=True), default=None, help="Replay directly into a runtime loaded from this config")
+@click.option("--url", default=None, help="Replay against a running server (e.g. http://localhost:8000)")
+@click.option("--speed", default=1.0, type=float, help="Time scale: 2.0 replays twice as fast")
+@click.option("--concurrency", default=8, type=int, help="Maximum in-flight requests")
+@click.option("--limit", default=None, type=int, help="Replay only the first N records")
+@click.option("--keep-max-tokens", is_flag=True, help="Use recorded max_tokens instead of recorded output length")
+def replay(trace_path, config_path, url, speed, concurrency, limit, keep_max_tokens):
+    """Replay a recorded request trace for benchmarking"""
+    if bool(config_path) == bool(url):
+        click.echo("❌ Provide exactly one of --config or --url", err=True)
+        sys.exit(1)
+    
+    try:
+        records = []
+        for record in load_trace(trace_path):
+            if limit is not None and len(records) >= limit:
+                break
+            records.append(record)
+        
+        replayer = TraceReplayer(records, speed=speed, match_output_tokens=not keep_max_tokens)
+        click.echo(f"Replaying {len(records)} requests at {speed}x...")
+        
+        if url:
+            metrics = replayer.replay_http(url, concurrency=concurrency)
+        else:
+            config = ConfigLoader.load(config_path)
+            runtime = get_runtime(config)
+            runtime.load()
+            try:
+                metrics = replayer.replay_runtime(runtime, concurrency=concurrency)
+            finally:
+                runtime.unload()
+        
+        def fmt(value):
+            return f"{value:.1f} ms" if value is not None else "n/a"
+        
+        click.echo(f"\n📊 Replay Results:")
+        click.echo(f"   Requests: {metrics['requests']} ({metrics['errors']} errors)")
+        click.echo(f"   Wall Time: {metrics['wall_time_sec']:.2f}s")
+        click.echo(f"   Throughput: {metrics['requests_per_sec']:.2f} req/s")
+        click.echo(f"   Latency p50/p95: {fmt(metrics['latency_p50_ms'])} / {fmt(metrics['latency_p95_ms'])}")
+        click.echo(f"   TTFT p50/p95: {fmt(metrics['ttft_p50_ms'])} / {fmt(metrics['ttft_p95_ms'])}")
+        click.echo(f"   Start Lag p95: {fmt(metrics['start_lag_p95_ms'])}")
+        
+    except (FileNotFoundError, ValueError) as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        click.echo(f"\n\n⚠️  Interrupted by user (Ctrl+C)", err=True)
+        sys.exit(130)
+    except Exception as e:
+        click.echo(f"\n❌ Error replaying trace:", err=True)
+        click.echo(f"   {type(e).__name__}: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument("model_names", nargs=-1)
 @click.option("--quant", "--quantization", default=None, help="Quantization type (q4_k_m, q8_0, etc.)")
 @click.option("--list-variants", is_flag=True, help="List available variants for this model")
-def pull(model_name, quant, list_variants):
-    """Pull a model from the registry"""
+@click.option("--all-recommended", is_flag=True, help="Pull every registry model in its recommended variant")
+@click.option("--jobs", "-j", default=3, type=int, help="Models downloaded at the same time")
+@click.option("--max-bandwidth", default=None, type=float, help="Cap on the combined download rate (MB/s)")
+@click.option("--auto", is_flag=True, help="Choose each variant from this machine's memory, CPU and benchmarks")
+def pull(model_names, quant, list_variants, all_recommended, jobs, max_bandwidth, auto):
+    """Pull one or more models from the registry"""
     try:
         downloader = ModelDownloader()
         registry = ModelRegistry()
         
+        if all_recommended:
+            model_names = registry.list_models()
+        # Keep order but never pull the same model twice at once
+        model_names = list(dict.fromkeys(model_names))
+        if not model_names:
+            click.echo("❌ No model given", err=True)
+            click.echo("💡 Usage: slm pull <model> [<model> ...] or slm pull --all-recommended", err=True)
+            sys.exit(1)
+        
         # List variants if requested
         if list_variants:
-            model = registry.get_model(model_name)
-            if not model:
-                click.echo(f"❌ Model '{model_name}' not found", err=True)
-                click.echo(f"💡 See available models with: slm list", err=True)
-                sys.exit(1)
-            
-            click.echo(f"\nAvailable variants for {model.name}:")
-            for variant_name, variant in model.variants.items():
-                recommended = " ⭐" if variant.recommended else ""
-                click.echo(f"  • {variant_name} ({variant.size}){recommended}")
-                click.echo(f"    Speed: {variant.speed}, Quality: {variant.quality}")
+            for model_name in model_names:
+                model = registry.get_model(model_name)
+                if not model:
+                    click.echo(f"❌ Model '{model_name}' not found", err=True)
+                    click.echo(f"💡 See available models with: slm list", err=True)
+                    sys.exit(1)
+                
+                click.echo(f"\nAvailable variants for {model.name}:")
+                for variant_name, variant in model.variants.items():
+                    recommended = " ⭐" if variant.recommended else ""
+                    click.echo(f"  • {variant_name} ({variant.size}){recommended}")
+                    click.echo(f"    Speed: {variant.speed}, Quality: {variant.quality}")
             sys.exit(0)
         
+        if auto:
+            if quant:
+                click.echo("❌ --auto and --quant cannot be combined", err=True)
+                sys.exit(1)
+            quant = _choose_variants(registry, model_names)
+        
         # Pull model
-        downloader.pull(model_name, quant)
+        if len(model_names) == 1 and not max_bandwidth:
+            downloader.pull(model_names[0], quant.get(model_names[0]) if auto else quant)
+            return
+        
+        limit = f", limited to {max_bandwidth:g}MB/s" if max_bandwidth else ""
+        click.echo(f"\n📥 Pulling {len(model_names)} models ({jobs} at a time{limit})\n")
+        results = downloader.pull_many(model_names, quant, max_parallel=jobs, bandwidth_mbps=max_bandwidth)
+        
+        click.echo(f"\n📊 Pull Summary:")
+        for result in results:
+            if result.ok:
+                click.echo(f"   ✅ {result.name}: {result.path} ({result.elapsed_sec:.1f}s)")
+            else:
+                # Summary line plus the underlying cause, without the hints
+                lines = [l.strip().lstrip("❌ ") for l in result.error.splitlines() if l.strip()]
+                click.echo(f"   ❌ {result.name}: {' - '.join(lines[:2])}", err=True)
+        
+        failed = [r for r in results if not r.ok]
+        if failed:
+            click.echo(f"\n{len(results) - len(failed)}/{len(results)} models pulled", err=True)
+            click.echo(f"💡 Re-run the same command to retry; finished chunks are kept", err=True)
+            sys.exit(1)
+        click.echo(f"\n🚀 Ready to use: slm run <model> --prompt \"Hello!\"")
         
     except ValueError as e:
         click.echo(f"\n{str(e)}", err=True)
@@ -228,9 +820,33 @@ def pull(model_name, quant, list_variants):
         click.echo(f"   {str(e)}", err=True)
         sys.exit(1)
 
+def _choose_variants(registry, model_names):
+    """Pick and explain a variant per model for this host"""
+    selector = VariantSelector()
+    choices = {}
+    for model_name in model_names:
+        model = registry.get_model(model_name)
+        if not model:
+            raise ValueError(
+                f"❌ Model '{model_name}' not found in registry\n"
+                "💡 See available models with: slm list"
+            )
+        choice = selector.choose(model)
+        click.echo(f"\n🧭 {model_name}: {choice.variant}")
+        for reason in choice.reasons:
+            click.echo(f"   {reason}")
+        for warning in choice.warnings:
+            click.echo(f"   {warning}", err=True)
+        choices[model_name] = choice.variant
+    return choices
+
 @cli.command("list")
 @click.option("--installed", is_flag=True, help="Show only installed models")
-def list_models(installed):
+@click.option("--runtime", default=None, type=click.Choice(["llama_cpp", "onnx", "transformers"]), help="Only models for this runtime")
+@click.option("--format", "model_format", default=None, type=click.Choice(["gguf", "onnx", "pytorch"]), help="Only models in this format")
+@click.option("--max-size", default=None, help="Only models with a variant up to this size (e.g. 1GB)")
+@click.option("--quant", default=None, help="Only models offering this quantization")
+def list_models(installed, runtime, model_format, max_size, quant):
     """List available or installed models"""
     try:
         if installed:
@@ -248,11 +864,21 @@ def list_models(installed):
                 click.echo(f"  • {model['name']} ({model['size']})")
                 click.echo(f"    Format: {model['format']}")
                 click.echo(f"    Path: {model['path']}")
+                click.echo(f"    Last used: {_format_age(model['last_used'])}")
                 click.echo()
         else:
             # List available models from registry
             registry = ModelRegistry()
-            models = registry.get_all_models()
+            models = registry.query(
+                runtime=runtime,
+                format=model_format,
+                max_size=parse_size(max_size) if max_size else None,
+                quantization=quant
+            )
+            
+            if not models:
+                click.echo("\nNo models match these filters.\n")
+                sys.exit(0)
             
             click.echo("\n📋 Available models in registry:\n")
             for name, model in models.items():
@@ -271,6 +897,47 @@ def list_models(installed):
         click.echo(f"   {str(e)}", err=True)
         sys.exit(1)
 
+@cli.command()
+@click.option("--keep-recent", default=None, type=int, help="Keep this many most recently used models")
+@click.option("--max-size", default=None, help="Evict least recently used models until the store fits (e.g. 20GB)")
+@click.option("--dry-run", is_flag=True, help="Show what would be removed without deleting")
+def gc(keep_recent, max_size, dry_run):
+    """Evict unused models and delete unreferenced weight blobs"""
+    try:
+        store = ModelStore()
+        limit = parse_size(max_size) if max_size else None
+        before = store.total_size()
+        result = store.gc(keep_recent=keep_recent, max_size=limit, dry_run=dry_run)
+        
+        verb = "Would evict" if dry_run else "Evicted"
+        if result.evicted:
+            click.echo(f"\n🗑️  {verb} {len(result.evicted)} models:")
+            for name in result.evicted:
+                click.echo(f"   • {name}")
+        else:
+            click.echo(f"\n✅ No models to evict")
+        click.echo(f"   Blobs removed: {result.blobs_removed}")
+        click.echo(f"   Space freed: {result.bytes_freed / (1024**3):.2f}GB")
+        click.echo(f"   Store size: {(before - result.bytes_freed) / (1024**3):.2f}GB")
+        if dry_run and result.evicted:
+            click.echo(f"\n💡 Run again without --dry-run to delete")
+    except ValueError as e:
+        click.echo(f"\n{str(e)}", err=True)
+        sys.exit(1)
+    except Exception as e:
+        click.echo(f"\n❌ Error collecting garbage:", err=True)
+        click.echo(f"   {str(e)}", err=True)
+        sys.exit(1)
+
+def _format_age(timestamp: float) -> str:
+    if not timestamp:
+        return "never"
+    seconds = max(0, time.time() - timestamp)
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= length:
+            return f"{int(seconds // length)}{unit} ago"
+    return "just now"
+
 if __name__ == "__main__":
     cli()
 
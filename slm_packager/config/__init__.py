@@ -1,2 +1,2 @@
-from .models import SLMConfig, ModelConfig, RuntimeConfig, GenerationParams, RuntimeType, DeviceType
+from .models import SLMConfig, ModelConfig, RuntimeConfig, GenerationParams, RuntimeType, DeviceType, LlamaCppOptions, OnnxOptions, CpuOptions, LoraOptions
 from .loader import ConfigLoader
@@ -22,6 +22,11 @@ class ConfigLoader:
                 "   Or see examples/ directory for reference configs"
             )
 
+        if path.suffix == ".slmpkg":
+            # Bundles carry their own config; imported here to avoid a cycle
+            from ..bundle import open_bundle
+            return open_bundle(path).config()
+
         try:
             with open(path, "r") as f:
                 if path.suffix in [".yaml", ".yml"]:
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal, Union
 from pydantic import BaseModel, Field, field_validator
 
 class RuntimeType(str, Enum):
@@ -27,13 +27,82 @@ class ModelConfig(BaseModel):
     path: str
     description: Optional[str] = None
     format: str = Field(..., description="Model format: gguf, onnx, pytorch")
+    repo: Optional[str] = Field(default=None, description="Catalog repo the model was pulled from")
+    variant: Optional[str] = Field(default=None, description="Catalog quantization variant that was pulled")
+
+KVCacheType = Literal["f32", "f16", "q8_0", "q5_1", "q5_0", "q4_1", "q4_0"]
+
+class LlamaCppOptions(BaseModel):
+    """llama.cpp-specific load options"""
+    logits_all: bool = Field(default=False, description="Keep logits for every prompt position (needed for perplexity)")
+    use_mmap: bool = Field(default=True, description="Map the model file instead of copying it into memory")
+    use_mlock: bool = Field(default=False, description="Lock weights in RAM so they are never paged out")
+    prefetch: Literal["none", "advise", "read"] = Field(default="none", description="Warm the page cache before loading")
+    warmup_tokens: int = Field(default=0, ge=0, description="Generate this many tokens after loading, before reporting ready")
+    preset: Optional[Literal["low-memory", "balanced", "throughput"]] = Field(
+        default=None, description="Named defaults for the performance options below; values that are set win"
+    )
+    # None: taken from the preset, or from the 'balanced' values without one
+    type_k: Optional[KVCacheType] = Field(default=None, description="KV cache key type (default: f16)")
+    type_v: Optional[KVCacheType] = Field(
+        default=None, description="KV cache value type; quantized types need flash_attn (default: f16)"
+    )
+    n_batch: Optional[int] = Field(default=None, ge=1, description="Prompt tokens submitted per decode call (default: 512)")
+    n_ubatch: Optional[int] = Field(default=None, ge=1, description="Physical batch size; bounds compute buffer memory (default: 512)")
+    n_threads_batch: Optional[int] = Field(default=None, ge=1, description="Threads for prompt processing (default: threads)")
+    flash_attn: Optional[bool] = Field(default=None, description="Flash attention (default: false)")
+    overflow: Literal["error", "shift"] = Field(
+        default="error", description="When prompt + max_tokens exceeds the context: fail, or drop the oldest tokens"
+    )
+    n_keep: int = Field(default=0, ge=0, description="Leading prompt tokens kept when shifting (e.g. a system prompt)")
+    rope_freq_scale: Optional[float] = Field(default=None, gt=0, description="RoPE frequency scale for contexts beyond training length")
+    parallel_slots: int = Field(default=1, ge=1, description="Sequences decoded together in one batch; each gets context_size tokens of KV cache")
+    pool_size: int = Field(default=1, ge=1, description="Independent contexts sharing the mmap'd weights; threads are split between them")
+    speculative: bool = Field(
+        default=False, description="Allow prompt-lookup speculative decoding per request (keeps logits for every position)"
+    )
+
+class OnnxOptions(BaseModel):
+    """ONNX Runtime session options"""
+    graph_optimization_level: Literal["disable", "basic", "extended", "all"] = "all"
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+    inter_op_threads: Optional[int] = Field(default=None, ge=1, description="Threads across independent nodes (parallel mode)")
+    enable_cpu_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    cache_optimized_graph: bool = Field(default=True, description="Save the optimized graph once and reload it on later starts")
+    cache_dir: Optional[str] = Field(default=None, description="Optimized graph cache (default: ~/.slm/cache/onnx)")
+
+class CpuOptions(BaseModel):
+    """CPU placement applied by every runtime"""
+    cpu_set: Optional[str] = Field(default=None, description="Pin to these logical CPUs, e.g. '0-3,8'")
+    numa_node: Optional[int] = Field(default=None, ge=0, description="Pin to the CPUs of one NUMA node")
+    inter_op_threads: Optional[int] = Field(default=None, ge=1, description="Threads across independent ops (torch; ONNX unless set there)")
+
+class LoraOptions(BaseModel):
+    """LoRA adapters served on top of the resident base model"""
+    adapters: Dict[str, str] = Field(
+        default_factory=dict, description="Adapter name -> PEFT directory (transformers) or GGUF LoRA file (llama_cpp)"
+    )
+    max_loaded: int = Field(default=4, ge=1, description="Adapters kept in memory; least recently used are evicted")
+    scale: float = Field(default=1.0, gt=0, description="LoRA scale (llama_cpp)")
 
 class RuntimeConfig(BaseModel):
     type: RuntimeType
     device: DeviceType = DeviceType.CPU
-    threads: int = Field(default=4, ge=1)
+    threads: Union[Literal["auto"], int] = Field(default=4, description="Compute threads, or 'auto' for one per physical core")
     gpu_layers: int = Field(default=0, ge=0)
     context_size: int = Field(default=2048, ge=512)
+    llama_cpp: LlamaCppOptions = Field(default_factory=LlamaCppOptions)
+    onnx: OnnxOptions = Field(default_factory=OnnxOptions)
+    cpu: CpuOptions = Field(default_factory=CpuOptions)
+    lora: LoraOptions = Field(default_factory=LoraOptions)
+
+    @field_validator("threads")
+    @classmethod
+    def _check_threads(cls, value):
+        if value != "auto" and value < 1:
+            raise ValueError("threads must be 'auto' or at least 1")
+        return value
 
 class GenerationParams(BaseModel):
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
@@ -42,6 +111,9 @@ class GenerationParams(BaseModel):
     max_tokens: int = Field(default=512, ge=1)
     stop: List[str] = Field(default_factory=list)
     stream: bool = False
+    adapter: Optional[str] = Field(default=None, description="Name of a runtime.lora adapter to apply")
+    speculative: bool = Field(default=False, description="Draft tokens by matching n-grams in the prompt and output so far")
+    draft_tokens: int = Field(default=10, ge=1, description="Tokens proposed per speculative step")
 
 class SLMConfig(BaseModel):
     model: ModelConfig
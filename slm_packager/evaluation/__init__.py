@@ -1 +1,3 @@
 from .benchmark import Benchmarker
+from .traces import RequestTraceRecorder, TraceReplayer, load_trace
+from .perplexity import PerplexityEvaluator, PerplexityResult
@@ -1,7 +1,9 @@
 import time
 import psutil
 import os
-from typing import Dict, Any
+import statistics
+from pathlib import Path
+from typing import Dict, Any, Optional
 from ..config.models import SLMConfig
 from ..runtime import get_runtime
 
@@ -48,3 +50,468 @@ class Benchmarker:
         self.runtime.unload()
         
         return metrics
+
+    def run_session_startup(self, runs: int = 3) -> Dict[str, Any]:
+        """
+        Measure ONNX session creation time without and with the
+        optimized-graph cache.
+        """
+        from ..config.models import RuntimeType
+        if self.config.runtime.type != RuntimeType.ONNX:
+            raise ValueError("❌ Session startup benchmark is only available for the onnx runtime")
+
+        model_path = Path(self.config.model.path)
+        options = self.config.runtime.onnx
+        original_cache = options.cache_optimized_graph
+
+        def time_session() -> float:
+            start = time.perf_counter()
+            session = self.runtime._create_session(model_path)
+            elapsed = (time.perf_counter() - start) * 1000
+            del session
+            return elapsed
+
+        try:
+            options.cache_optimized_graph = False
+            cold = [time_session() for _ in range(runs)]
+
+            options.cache_optimized_graph = True
+            cached_path = self.runtime._optimized_graph_path(model_path, self.runtime._providers())
+            if cached_path and cached_path.exists():
+                cached_path.unlink()
+            populate = time_session()
+            cached = [time_session() for _ in range(runs)]
+        finally:
+            options.cache_optimized_graph = original_cache
+
+        cold_ms = statistics.median(cold)
+        cached_ms = statistics.median(cached)
+        return {
+            "cold_ms": cold_ms,
+            "populate_ms": populate,
+            "cached_ms": cached_ms,
+            "speedup": cold_ms / cached_ms if cached_ms > 0 else 0.0,
+        }
+
+    def run_warm_start(self, prompt: str = "The quick brown fox", warmup_tokens: int = 8) -> Dict[str, Dict[str, float]]:
+        """
+        Compare load time and time-to-first-token for a cold page cache,
+        a prefetched model file, and prefetch plus a warm-up generation.
+
+        The model's pages are evicted before each scenario (posix_fadvise
+        DONTNEED), so this needs Linux or another platform with fadvise.
+        """
+        from ..runtime.warmup import evict, prefetch
+
+        model_path = self.config.model.path
+        if not evict(model_path):
+            raise RuntimeError(
+                "❌ Cold-start measurement needs posix_fadvise to evict the model from the page cache\n"
+                "💡 Run it on Linux"
+            )
+
+        results = {}
+        for scenario in ("cold", "prefetched", "warmed"):
+            config = self.config.model_copy(deep=True)
+            config.params.stream = True
+            config.params.max_tokens = 1
+            # Warm-up is driven from here so every runtime is treated alike
+            config.runtime.llama_cpp.prefetch = "none"
+            config.runtime.llama_cpp.warmup_tokens = 0
+
+            evict(model_path)
+            start = time.perf_counter()
+            if scenario != "cold":
+                prefetch(model_path, mode="read")
+            runtime = get_runtime(config)
+            runtime.load()
+            if scenario == "warmed":
+                warm_params = config.params.model_copy(update={"stream": False, "max_tokens": warmup_tokens})
+                runtime.generate("Hello", warm_params)
+            load_sec = time.perf_counter() - start
+
+            request_start = time.perf_counter()
+            next(iter(runtime.generate(prompt, config.params)), None)
+            ttft_ms = (time.perf_counter() - request_start) * 1000
+            runtime.unload()
+
+            results[scenario] = {"load_sec": load_sec, "ttft_ms": ttft_ms}
+        return results
+
+    def compare_llama_presets(
+        self,
+        presets=("low-memory", "balanced", "throughput"),
+        prompt_tokens: int = 512,
+        max_tokens: int = 64,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Load the model once per llama.cpp preset and report memory, KV
+        cache size, time-to-first-token (prompt processing) and decode speed.
+        """
+        from ..config.models import RuntimeType
+        from ..runtime.llama_tuning import PRESETS, effective_options, kv_cache_bytes
+
+        if self.config.runtime.type != RuntimeType.LLAMA_CPP:
+            raise ValueError("❌ Preset comparison is only available for the llama_cpp runtime")
+
+        process = psutil.Process(os.getpid())
+        # A long prompt makes batch sizing visible in time-to-first-token
+        prompt = " ".join(["The quick brown fox jumps over the lazy dog."] * max(1, prompt_tokens // 10))
+        base = self.config.runtime.llama_cpp.model_dump(exclude=set(PRESETS["balanced"]) | {"preset"})
+
+        results = {}
+        for preset in presets:
+            config = self.config.model_copy(deep=True)
+            config.runtime.llama_cpp = type(config.runtime.llama_cpp)(**base, preset=preset)
+            config.params = config.params.model_copy(update={"stream": True, "max_tokens": max_tokens, "temperature": 0.0})
+
+            rss_before = process.memory_info().rss
+            runtime = get_runtime(config)
+            runtime.load()
+            rss_loaded = process.memory_info().rss
+            kv_bytes = kv_cache_bytes(effective_options(config.runtime.llama_cpp), runtime.metadata, runtime.context_length)
+
+            start = time.perf_counter()
+            first = None
+            chunks = 0
+            for _ in runtime.generate(prompt, config.params):
+                if first is None:
+                    first = time.perf_counter()
+                chunks += 1
+            end = time.perf_counter()
+            rss_peak = process.memory_info().rss
+            runtime.unload()
+
+            decode_sec = end - first if first else 0.0
+            results[preset] = {
+                "load_rss_mb": (rss_loaded - rss_before) / 1024 / 1024,
+                "peak_rss_mb": (rss_peak - rss_before) / 1024 / 1024,
+                "kv_cache_mb": kv_bytes / 1024 / 1024 if kv_bytes else 0.0,
+                "ttft_ms": ((first or end) - start) * 1000,
+                "tokens_per_second": (chunks - 1) / decode_sec if chunks > 1 and decode_sec > 0 else 0.0,
+            }
+        return results
+
+    def compare_thread_settings(
+        self,
+        settings=(1, 2, 4, "auto"),
+        prompt: str = "The quick brown fox jumps over the lazy dog.",
+        max_tokens: int = 32,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Measure generation speed for several `threads` values with the
+        config's CPU placement (cpu_set / numa_node) otherwise unchanged.
+        """
+        affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+        results = {}
+        for threads in settings:
+            config = self.config.model_copy(deep=True)
+            config.runtime.threads = threads
+            config.params = config.params.model_copy(update={"stream": True, "max_tokens": max_tokens, "temperature": 0.0})
+            runtime = get_runtime(config)
+            try:
+                runtime.load()
+                placement = runtime.cpu_placement
+                # Warm-up pass so thread pools and buffers exist
+                for _ in runtime.generate(prompt, config.params.model_copy(update={"max_tokens": 2})):
+                    pass
+
+                start = time.perf_counter()
+                first = None
+                chunks = 0
+                for _ in runtime.generate(prompt, config.params):
+                    if first is None:
+                        first = time.perf_counter()
+                    chunks += 1
+                end = time.perf_counter()
+            finally:
+                runtime.unload()
+                if affinity is not None:
+                    # Pinning is process-wide; undo it before the next setting
+                    os.sched_setaffinity(0, affinity)
+
+            decode_sec = end - first if first else 0.0
+            results[str(threads)] = {
+                "threads": placement.threads,
+                "ttft_ms": ((first or end) - start) * 1000,
+                "tokens_per_second": (chunks - 1) / decode_sec if chunks > 1 and decode_sec > 0 else 0.0,
+            }
+        return results
+
+    def compare_concurrency(
+        self,
+        levels=(1, 4, 8, 16),
+        prompt: str = "The quick brown fox jumps over the lazy dog.",
+        max_tokens: int = 64,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Run N simultaneous requests for each concurrency level and report
+        aggregate tokens/sec and mean request latency.
+
+        llama.cpp models are loaded with parallel_slots set to the highest
+        level so every stream gets its own slot in the batched engine.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from ..config.models import RuntimeType
+
+        config = self.config.model_copy(deep=True)
+        if config.runtime.type == RuntimeType.LLAMA_CPP:
+            config.runtime.llama_cpp.parallel_slots = max(levels)
+        params = config.params.model_copy(update={"stream": False, "max_tokens": max_tokens})
+        runtime = get_runtime(config)
+        runtime.load()
+
+        def one_request(_) -> tuple:
+            start = time.perf_counter()
+            output = runtime.generate(prompt, params)
+            return time.perf_counter() - start, runtime.count_tokens(output, add_special_tokens=False)
+
+        results = {}
+        try:
+            # Warm-up pass so buffers exist before timing
+            runtime.generate(prompt, params.model_copy(update={"max_tokens": 2}))
+            for level in levels:
+                # Runtimes without slots are serialized, as the server does
+                workers = min(level, runtime.max_concurrency)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    outcomes = list(pool.map(one_request, range(level)))
+                wall = time.perf_counter() - start
+                tokens = sum(n for _, n in outcomes)
+                results[str(level)] = {
+                    "streams": level,
+                    "tokens": tokens,
+                    "wall_sec": wall,
+                    "aggregate_tokens_per_second": tokens / wall if wall > 0 else 0.0,
+                    "mean_latency_sec": statistics.mean(t for t, _ in outcomes),
+                }
+        finally:
+            runtime.unload()
+        return results
+
+    def compare_pool_sizes(
+        self,
+        sizes=(1, 2, 4),
+        prompt: str = "The quick brown fox jumps over the lazy dog.",
+        max_tokens: int = 64,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Load a llama.cpp context pool of each size and report resident
+        memory and aggregate throughput for max(sizes) concurrent streams.
+
+        Contexts share the mapped weights, so RSS should grow by roughly
+        one KV cache plus compute buffers per added context.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from ..config.models import RuntimeType
+
+        if self.config.runtime.type != RuntimeType.LLAMA_CPP:
+            raise ValueError("❌ Context pool comparison is only available for the llama_cpp runtime")
+
+        process = psutil.Process(os.getpid())
+        streams = max(sizes)
+        results = {}
+        for size in sizes:
+            config = self.config.model_copy(deep=True)
+            config.runtime.llama_cpp.pool_size = size
+            config.runtime.llama_cpp.parallel_slots = 1
+            params = config.params.model_copy(update={"stream": False, "max_tokens": max_tokens})
+            runtime = get_runtime(config)
+            runtime.load()
+            try:
+                rss_mb = process.memory_info().rss / 1024 / 1024
+                runtime.generate(prompt, params.model_copy(update={"max_tokens": 2}))
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=streams) as pool:
+                    outputs = list(pool.map(lambda _: runtime.generate(prompt, params), range(streams)))
+                wall = time.perf_counter() - start
+                tokens = sum(runtime.count_tokens(o, add_special_tokens=False) for o in outputs)
+                stats = runtime.stats()
+            finally:
+                runtime.unload()
+
+            # Contexts actually serving requests; a pooled run's tokenizer-sized context is negligible
+            contexts = stats.get("contexts") or [stats]
+            results[str(size)] = {
+                "contexts": len(contexts),
+                "rss_mb": rss_mb,
+                "aggregate_tokens_per_second": tokens / wall if wall > 0 else 0.0,
+                "mean_utilization": statistics.mean(c.get("utilization", 0.0) for c in contexts),
+            }
+
+        first = results[str(sizes[0])]
+        for m in results.values():
+            added = m["contexts"] - first["contexts"]
+            m["rss_per_added_context_mb"] = (m["rss_mb"] - first["rss_mb"]) / added if added else 0.0
+        return results
+
+    def compare_adapters(
+        self,
+        names=None,
+        prompt: str = "The quick brown fox jumps over the lazy dog.",
+        max_tokens: int = 64,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Serve each LoRA adapter on one resident base model and report load
+        time, added RSS and throughput against the base.
+
+        The "merged" estimate is what one fully merged model per adapter
+        would cost: the base model's RSS and speed, times the adapter count.
+        """
+        names = list(names or self.config.runtime.lora.adapters)
+        if not names:
+            raise ValueError(
+                "❌ No adapters to compare\n"
+                "💡 Add them under runtime.lora.adapters or pass --adapters"
+            )
+
+        process = psutil.Process(os.getpid())
+        baseline_mb = process.memory_info().rss / 1024 / 1024
+        config = self.config.model_copy(deep=True)
+        config.runtime.lora.max_loaded = max(config.runtime.lora.max_loaded, len(names))
+        params = config.params.model_copy(update={"stream": False, "max_tokens": max_tokens})
+        runtime = get_runtime(config)
+        runtime.load()
+
+        def throughput(adapter) -> float:
+            p = params.model_copy(update={"adapter": adapter})
+            start = time.perf_counter()
+            output = runtime.generate(prompt, p)
+            elapsed = time.perf_counter() - start
+            return runtime.count_tokens(output, add_special_tokens=False) / elapsed if elapsed > 0 else 0.0
+
+        try:
+            runtime.generate(prompt, params.model_copy(update={"max_tokens": 2}))
+            base_rss = process.memory_info().rss / 1024 / 1024
+            results = {"base": {
+                "rss_mb": base_rss,
+                "model_mb": base_rss - baseline_mb,
+                "tokens_per_second": throughput(None),
+            }}
+            for name in names:
+                before = process.memory_info().rss / 1024 / 1024
+                adapter = runtime.adapters.get(name)
+                results[name] = {
+                    "load_sec": adapter.load_sec,
+                    "size_mb": adapter.size_bytes / 1024 / 1024,
+                    "rss_delta_mb": process.memory_info().rss / 1024 / 1024 - before,
+                    "tokens_per_second": throughput(name),
+                }
+            shared_rss = process.memory_info().rss / 1024 / 1024
+        finally:
+            runtime.unload()
+
+        base = results["base"]
+        for name in names:
+            m = results[name]
+            m["relative_speed"] = m["tokens_per_second"] / base["tokens_per_second"] if base["tokens_per_second"] else 0.0
+        results["total"] = {
+            "shared_mb": shared_rss - baseline_mb,
+            "merged_estimate_mb": base["model_mb"] * len(names),
+        }
+        return results
+
+    def compare_speculative(
+        self,
+        prompt: Optional[str] = None,
+        max_tokens: int = 128,
+        draft_tokens: int = 10,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Generate from a copy-heavy prompt with and without prompt-lookup
+        speculation and report throughput and tokens per forward pass.
+
+        Sampling is pinned to top_k=1 so both runs produce the same text
+        and the speedup is not an artifact of different outputs.
+        """
+        from ..config.models import RuntimeType
+        from ..runtime.speculative import COPY_PROMPT
+
+        if self.config.runtime.type not in (RuntimeType.LLAMA_CPP, RuntimeType.TRANSFORMERS):
+            raise ValueError("❌ Speculative decoding is only available for the llama_cpp and transformers runtimes")
+
+        prompt = prompt or COPY_PROMPT
+        config = self.config.model_copy(deep=True)
+        config.runtime.llama_cpp.speculative = True
+        config.runtime.llama_cpp.parallel_slots = 1
+        config.runtime.llama_cpp.pool_size = 1
+        base = config.params.model_copy(update={"stream": False, "max_tokens": max_tokens, "top_k": 1})
+        runtime = get_runtime(config)
+        runtime.load()
+        results = {}
+        try:
+            runtime.generate(prompt, base.model_copy(update={"max_tokens": 2}))
+            for name, speculative in (("baseline", False), ("speculative", True)):
+                params = base.model_copy(update={"speculative": speculative, "draft_tokens": draft_tokens})
+                before = runtime.stats().get("speculative", {})
+                start = time.perf_counter()
+                output = runtime.generate(prompt, params)
+                elapsed = time.perf_counter() - start
+                after = runtime.stats().get("speculative", {})
+                tokens = runtime.count_tokens(output, add_special_tokens=False)
+                steps = after.get("steps", 0) - before.get("steps", 0)
+                drafted = after.get("tokens", 0) - before.get("tokens", 0)
+                results[name] = {
+                    "tokens": tokens,
+                    "time_sec": elapsed,
+                    "tokens_per_second": tokens / elapsed if elapsed > 0 else 0.0,
+                    "tokens_per_step": drafted / steps if steps else 1.0,
+                }
+        finally:
+            runtime.unload()
+
+        baseline = results["baseline"]["tokens_per_second"]
+        results["speculative"]["speedup"] = results["speculative"]["tokens_per_second"] / baseline if baseline else 0.0
+        results["baseline"]["speedup"] = 1.0
+        return results
+
+    @staticmethod
+    def compare_onnx_models(
+        models: Dict[str, str],
+        seq_len: int = 128,
+        runs: int = 20,
+        warmup: int = 3,
+        threads: int = 4
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Compare forward-pass latency and file size of ONNX model variants.
+
+        Args:
+            models: Label -> .onnx path, e.g. {"fp32": ..., "dynamic": ..., "static": ...}
+            seq_len: Prompt length of the synthetic input
+        """
+        import numpy as np
+        import onnxruntime as ort
+        from ..runtime.onnx import build_feeds
+
+        results = {}
+        for label, path in models.items():
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = threads
+            session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+            # Small token ids are valid for any vocabulary
+            input_ids = np.arange(seq_len, dtype=np.int64)[None, :] % 100
+            feeds = build_feeds(session.get_inputs(), input_ids)
+
+            for _ in range(warmup):
+                session.run(None, feeds)
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                session.run(None, feeds)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            model_file = Path(path)
+            # Count external weight files saved next to the graph
+            size = model_file.stat().st_size + sum(
+                f.stat().st_size for f in model_file.parent.glob(f"{model_file.name}.data")
+            )
+            results[label] = {
+                "size_mb": size / 1024 / 1024,
+                "latency_mean_ms": statistics.mean(latencies),
+                "latency_p50_ms": statistics.median(latencies),
+                "latency_min_ms": min(latencies),
+            }
+            del session
+        return results
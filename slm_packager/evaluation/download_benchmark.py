@@ -0,0 +1,118 @@
+"""Benchmark the range downloader against a local HTTP server"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..registry.transfer import RangeDownloader
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class RangeFileServer:
+    """
+    Serves one file over HTTP with Range support on 127.0.0.1.
+
+    `per_connection_mbps` throttles each connection, approximating the
+    per-stream limits of real CDNs so connection scaling is visible.
+    """
+
+    def __init__(self, path: Path, per_connection_mbps: Optional[float] = None):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        file_path, size = self.path, self.size
+        rate = per_connection_mbps * 1024 * 1024 if per_connection_mbps else None
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                begin, end, status = 0, size - 1, 200
+                match = _RANGE_RE.fullmatch(self.headers.get("Range", ""))
+                if match:
+                    begin = int(match.group(1))
+                    end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+                    status = 206
+                length = end - begin + 1
+                self.send_response(status)
+                self.send_header("Content-Length", str(length))
+                self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {begin}-{end}/{size}")
+                self.end_headers()
+
+                start = time.perf_counter()
+                sent = 0
+                with open(file_path, "rb") as f:
+                    f.seek(begin)
+                    while sent < length:
+                        block = f.read(min(256 * 1024, length - sent))
+                        if not block:
+                            break
+                        self.wfile.write(block)
+                        sent += len(block)
+                        if rate:
+                            ahead = sent / rate - (time.perf_counter() - start)
+                            if ahead > 0:
+                                time.sleep(ahead)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{self.path.name}"
+
+    def __enter__(self) -> "RangeFileServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def benchmark_downloads(
+    size_mb: int = 256,
+    connections: List[int] = (1, 4, 8),
+    per_connection_mbps: Optional[float] = None,
+    chunk_mb: int = 8,
+) -> List[Dict[str, Any]]:
+    """
+    Download a random file of size_mb from a local server once per
+    connection count and report throughput; every run is checksum-verified.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "payload.bin"
+        digest = hashlib.sha256()
+        with open(source, "wb") as f:
+            for _ in range(size_mb):
+                block = os.urandom(1024 * 1024)
+                digest.update(block)
+                f.write(block)
+        expected = digest.hexdigest()
+
+        with RangeFileServer(source, per_connection_mbps=per_connection_mbps) as server:
+            for count in connections:
+                dest = Path(tmp) / f"download-{count}.bin"
+                downloader = RangeDownloader(connections=count, chunk_size=chunk_mb * 1024 * 1024)
+                result = downloader.download(server.url, dest, expected_sha256=expected)
+                results.append({
+                    "connections": count,
+                    "elapsed_sec": result.elapsed_sec,
+                    "mb_per_second": result.mb_per_second,
+                    "verified": result.sha256 == expected,
+                })
+                dest.unlink()
+    return results
@@ -0,0 +1,221 @@
+"""Streaming perplexity evaluation over large text corpora"""
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import NormalDist
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from ..config.models import SLMConfig
+from ..runtime import get_runtime
+
+# Characters of text tokenized at a time; the corpus is never fully in memory
+_READ_CHUNK_CHARS = 1 << 20
+
+
+@dataclass
+class PerplexityResult:
+    """Perplexity estimate with a normal-approximation confidence interval"""
+    perplexity: float
+    ci_low: float
+    ci_high: float
+    confidence: float
+    mean_nll: float
+    tokens: int
+    windows: int
+    elapsed_sec: float
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+class _RunningNLL:
+    """Welford accumulator over per-token negative log-likelihoods"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, logprobs: List[float]):
+        for lp in logprobs:
+            nll = -lp
+            self.count += 1
+            delta = nll - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (nll - self.mean)
+
+    @property
+    def stderr(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1) / self.count)
+
+
+class PerplexityEvaluator:
+    """
+    Computes perplexity of a model over a text file.
+
+    The corpus is read and tokenized incrementally, split into sliding
+    windows of the model's context size and scored in batches through the
+    runtime. Each window after the first only scores the tokens it adds,
+    so every corpus token is counted once with up to `window - stride`
+    tokens of left context.
+    """
+
+    def __init__(
+        self,
+        config: SLMConfig,
+        batch_size: int = 4,
+        window: Optional[int] = None,
+        stride: Optional[int] = None,
+    ):
+        self.config = config.model_copy(deep=True)
+        # llama.cpp only keeps per-position logits when asked at load time
+        self.config.runtime.llama_cpp.logits_all = True
+        # Scoring runs on the runtime's own context, not a batched engine
+        self.config.runtime.llama_cpp.parallel_slots = 1
+        self.config.runtime.llama_cpp.pool_size = 1
+        self.config.params.stream = False
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self.stride = stride
+        self.runtime = get_runtime(self.config)
+
+    def run(
+        self,
+        data_path: Union[str, Path],
+        max_tokens: Optional[int] = None,
+        confidence: float = 0.95,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PerplexityResult:
+        """
+        Evaluate perplexity over a corpus file.
+
+        Args:
+            data_path: UTF-8 text file, any size
+            max_tokens: Stop after scoring this many tokens
+            confidence: Confidence level for the interval
+            progress: Called with the number of scored tokens after each batch
+        """
+        data_path = Path(data_path)
+        if max_tokens is not None and max_tokens < 1:
+            raise ValueError(f"❌ max_tokens must be at least 1 (got {max_tokens})")
+        if not data_path.exists():
+            raise FileNotFoundError(f"❌ Corpus file not found: '{data_path}'")
+
+        self.runtime.load()
+        try:
+            window = min(self.window or self.runtime.context_length, self.runtime.context_length)
+            stride = self.stride or window // 2
+            if window < 2 or not 0 < stride <= window - 1:
+                raise ValueError(
+                    f"❌ Invalid window/stride: window={window}, stride={stride}\n"
+                    "💡 Stride must be between 1 and window - 1"
+                )
+
+            stats = _RunningNLL()
+            windows = 0
+            start = time.perf_counter()
+            batch: List[Tuple[List[int], int]] = []
+
+            def flush():
+                scored = self.runtime.score_tokens([tokens for tokens, _ in batch])
+                for (_, n_new), logprobs in zip(batch, scored):
+                    stats.update(logprobs[-n_new:])
+                batch.clear()
+                if progress:
+                    progress(stats.count)
+
+            for tokens, n_new in self._windows(data_path, window, stride, max_tokens):
+                batch.append((tokens, n_new))
+                windows += 1
+                if len(batch) >= self.batch_size:
+                    flush()
+            if batch:
+                flush()
+
+            elapsed = time.perf_counter() - start
+        finally:
+            self.runtime.unload()
+
+        if stats.count == 0:
+            raise ValueError(f"❌ Corpus is too short to evaluate: '{data_path}'")
+
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        margin = z * stats.stderr
+        return PerplexityResult(
+            perplexity=math.exp(stats.mean),
+            ci_low=math.exp(stats.mean - margin),
+            ci_high=math.exp(stats.mean + margin),
+            confidence=confidence,
+            mean_nll=stats.mean,
+            tokens=stats.count,
+            windows=windows,
+            elapsed_sec=elapsed,
+        )
+
+    def _windows(
+        self,
+        data_path: Path,
+        window: int,
+        stride: int,
+        max_tokens: Optional[int],
+    ) -> Iterator[Tuple[List[int], int]]:
+        """
+        Yield (window_tokens, n_new) pairs where the last n_new tokens of
+        each window have not been scored by an earlier window.
+        """
+        buffer: List[int] = []
+        scored_until = 0  # corpus offset of the first unscored token
+        buffer_start = 0  # corpus offset of buffer[0]
+        remaining = max_tokens
+
+        for tokens in self._token_stream(data_path):
+            buffer.extend(tokens)
+            while len(buffer) >= window:
+                chunk = buffer[:window]
+                end = buffer_start + window
+                # The very first token has no context and is never scored
+                n_new = end - max(scored_until, 1)
+                if remaining is not None:
+                    n_new = min(n_new, remaining)
+                    remaining -= n_new
+                # Scoring takes the last n_new positions; with none there is nothing to score
+                if n_new > 0:
+                    yield chunk, n_new
+                scored_until = end
+                del buffer[:stride]
+                buffer_start += stride
+                if remaining is not None and remaining <= 0:
+                    return
+
+        # Tail: score whatever is left after the last full window
+        end = buffer_start + len(buffer)
+        n_new = end - max(scored_until, 1)
+        if remaining is not None:
+            n_new = min(n_new, remaining)
+        if n_new > 0 and len(buffer) >= 2:
+            yield buffer, n_new
+
+    def _token_stream(self, data_path: Path) -> Iterator[List[int]]:
+        """Tokenize the corpus in newline-aligned chunks"""
+        with open(data_path, "r", encoding="utf-8", errors="replace") as f:
+            carry = ""
+            while True:
+                text = f.read(_READ_CHUNK_CHARS)
+                if not text:
+                    break
+                text = carry + text
+                cut = text.rfind("\n")
+                if cut == -1:
+                    # No line break in sight: split on whitespace instead
+                    cut = text.rfind(" ")
+                if cut == -1:
+                    carry = text
+                    continue
+                carry = text[cut + 1:]
+                yield self.runtime.tokenize(text[:cut + 1], add_special_tokens=False)
+            if carry:
+                yield self.runtime.tokenize(carry, add_special_tokens=False)
@@ -0,0 +1,280 @@
+"""Request trace capture and replay for realistic load benchmarks"""
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ..config.models import GenerationParams
+
+PROMPT_MODES = ("hash", "drop")
+
+# Common short words that encode to roughly one token each in most
+# tokenizers; used to rebuild prompts of a recorded length.
+_FILLER_WORDS = (
+    "the quick brown fox jumps over a lazy dog while small models "
+    "answer simple questions about data and code"
+).split()
+
+
+@dataclass
+class TraceRecord:
+    """One served request, without the prompt text"""
+    timestamp: float
+    prompt_tokens: int
+    output_tokens: int
+    params: Dict[str, Any]
+    latency_ms: float
+    ttft_ms: Optional[float] = None
+    prompt_hash: Optional[str] = None
+    status: str = "ok"
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TraceRecord":
+        known = {k: data[k] for k in cls.__dataclass_fields__ if k in data}
+        return cls(**known)
+
+
+class RequestTraceRecorder:
+    """Appends a compact JSONL trace of served requests"""
+
+    def __init__(self, path: Union[str, Path], prompt_mode: str = "hash"):
+        if prompt_mode not in PROMPT_MODES:
+            raise ValueError(
+                f"❌ Unknown trace prompt mode: '{prompt_mode}'\n"
+                f"💡 Use one of: {', '.join(PROMPT_MODES)}"
+            )
+        self.path = Path(path)
+        self.prompt_mode = prompt_mode
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        prompt: str,
+        params: GenerationParams,
+        prompt_tokens: int,
+        output_tokens: int,
+        started_at: float,
+        latency_ms: float,
+        ttft_ms: Optional[float] = None,
+        status: str = "ok",
+    ):
+        """Write one request to the trace"""
+        rec = TraceRecord(
+            timestamp=started_at,
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            params=params.model_dump(mode="json"),
+            latency_ms=round(latency_ms, 3),
+            ttft_ms=round(ttft_ms, 3) if ttft_ms is not None else None,
+            prompt_hash=self._hash(prompt) if self.prompt_mode == "hash" else None,
+            status=status,
+        )
+        line = json.dumps(asdict(rec), separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    @staticmethod
+    def _hash(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def load_trace(path: Union[str, Path]) -> Iterator[TraceRecord]:
+    """Stream records from a JSONL trace file"""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"❌ Trace file not found: '{path}'")
+
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield TraceRecord.from_dict(json.loads(line))
+            except (json.JSONDecodeError, TypeError) as e:
+                raise ValueError(
+                    f"❌ Invalid trace record at {path}:{line_no}\n"
+                    f"   {str(e)}"
+                ) from e
+
+
+def synthesize_prompt(num_tokens: int) -> str:
+    """Build a filler prompt of approximately num_tokens tokens"""
+    words = [_FILLER_WORDS[i % len(_FILLER_WORDS)] for i in range(max(1, num_tokens))]
+    return " ".join(words)
+
+
+@dataclass
+class ReplayResult:
+    """Outcome of one replayed request"""
+    scheduled_offset: float
+    start_lag_ms: float
+    latency_ms: float
+    ttft_ms: Optional[float]
+    output_chars: int
+    error: Optional[str] = None
+
+
+class TraceReplayer:
+    """
+    Replays a recorded trace against a runtime or a running `slm serve`.
+
+    Requests are issued at their original relative arrival times divided
+    by `speed`, so speed=2.0 replays the same mix twice as fast.
+    """
+
+    def __init__(
+        self,
+        records: List[TraceRecord],
+        speed: float = 1.0,
+        match_output_tokens: bool = True,
+    ):
+        if speed <= 0:
+            raise ValueError("❌ Replay speed must be greater than 0")
+        self.records = sorted(records, key=lambda r: r.timestamp)
+        self.speed = speed
+        self.match_output_tokens = match_output_tokens
+
+    def replay_runtime(self, runtime, concurrency: int = 1) -> Dict[str, Any]:
+        """Replay directly into a loaded runtime"""
+        lock = threading.Lock()
+
+        def send(prompt: str, params: GenerationParams):
+            # Runtimes are not thread-safe; queueing shows up as latency
+            with lock:
+                start = time.perf_counter()
+                ttft = None
+                if params.stream:
+                    chunks = []
+                    for chunk in runtime.generate(prompt, params):
+                        if ttft is None:
+                            ttft = (time.perf_counter() - start) * 1000
+                        chunks.append(chunk)
+                    text = "".join(chunks)
+                else:
+                    text = runtime.generate(prompt, params)
+                return text, ttft
+
+        return self._run(send, concurrency)
+
+    def replay_http(self, url: str, concurrency: int = 8, timeout: float = 600.0) -> Dict[str, Any]:
+        """Replay against a running `slm serve` instance"""
+        endpoint = url.rstrip("/") + "/generate"
+
+        def send(prompt: str, params: GenerationParams):
+            body = json.dumps({
+                "prompt": prompt,
+                "params": params.model_dump(mode="json"),
+            }).encode("utf-8")
+            req = urllib.request.Request(
+                endpoint,
+                data=body,
+                headers={"Content-Type": "application/json"},
+            )
+            start = time.perf_counter()
+            ttft = None
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                if not params.stream:
+                    return json.loads(resp.read())["text"], None
+                chunks = []
+                for raw in resp:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    if ttft is None:
+                        ttft = (time.perf_counter() - start) * 1000
+                    chunks.append(json.loads(data).get("text", ""))
+                return "".join(chunks), ttft
+
+        return self._run(send, concurrency)
+
+    def _request_for(self, record: TraceRecord):
+        params = GenerationParams(**record.params)
+        if self.match_output_tokens and record.output_tokens > 0:
+            params.max_tokens = record.output_tokens
+        return synthesize_prompt(record.prompt_tokens), params
+
+    def _run(self, send, concurrency: int) -> Dict[str, Any]:
+        if not self.records:
+            raise ValueError("❌ Trace contains no records to replay")
+
+        t0 = self.records[0].timestamp
+        results: List[ReplayResult] = []
+        results_lock = threading.Lock()
+        wall_start = time.perf_counter()
+
+        def worker(record: TraceRecord, offset: float):
+            prompt, params = self._request_for(record)
+            start = time.perf_counter()
+            lag = (start - wall_start - offset) * 1000
+            try:
+                text, ttft = send(prompt, params)
+                result = ReplayResult(
+                    scheduled_offset=offset,
+                    start_lag_ms=lag,
+                    latency_ms=(time.perf_counter() - start) * 1000,
+                    ttft_ms=ttft,
+                    output_chars=len(text),
+                )
+            except Exception as e:
+                result = ReplayResult(
+                    scheduled_offset=offset,
+                    start_lag_ms=lag,
+                    latency_ms=(time.perf_counter() - start) * 1000,
+                    ttft_ms=None,
+                    output_chars=0,
+                    error=f"{type(e).__name__}: {str(e)}",
+                )
+            with results_lock:
+                results.append(result)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for record in self.records:
+                offset = (record.timestamp - t0) / self.speed
+                delay = offset - (time.perf_counter() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(worker, record, offset)
+
+        wall = time.perf_counter() - wall_start
+        return self._summarize(results, wall)
+
+    @staticmethod
+    def _summarize(results: List[ReplayResult], wall: float) -> Dict[str, Any]:
+        ok = [r for r in results if r.error is None]
+        latencies = sorted(r.latency_ms for r in ok)
+        ttfts = sorted(r.ttft_ms for r in ok if r.ttft_ms is not None)
+        return {
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "wall_time_sec": wall,
+            "requests_per_sec": len(ok) / wall if wall > 0 else 0.0,
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "ttft_p50_ms": _percentile(ttfts, 50),
+            "ttft_p95_ms": _percentile(ttfts, 95),
+            "start_lag_p95_ms": _percentile(sorted(r.start_lag_ms for r in results), 95),
+            "results": results,
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
@@ -0,0 +1 @@
+from .onnx_exporter import OnnxExporter, ExportResult
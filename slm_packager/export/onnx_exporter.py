@@ -0,0 +1,274 @@
+"""Export Transformers causal LMs to ONNX decoder graphs with a KV cache"""
+import inspect
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple, Union
+
+try:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    EXPORT_AVAILABLE = True
+except ImportError as e:
+    EXPORT_AVAILABLE = False
+    IMPORT_ERROR = str(e)
+
+from ..config.models import SLMConfig, ModelConfig, RuntimeConfig, RuntimeType
+from ..config.loader import ConfigLoader
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "model.onnx"
+CONFIG_FILENAME = "slm.yaml"
+
+
+@dataclass
+class ExportResult:
+    """Paths and validation outcome of an export"""
+    model_path: Path
+    config_path: Path
+    max_abs_diff: float
+    num_layers: int
+
+
+class OnnxExporter:
+    """
+    Exports a model loadable by TransformersRuntime to a single ONNX
+    decoder graph.
+
+    The graph takes `input_ids`, `attention_mask` (and `position_ids` when
+    the model accepts them) plus `past_key_values.{i}.key/value`, and
+    returns `logits` and `present.{i}.key/value`. A zero-length past runs
+    the prompt; later steps feed the previous presents back in.
+    """
+
+    def __init__(
+        self,
+        config: SLMConfig,
+        output_dir: Union[str, Path],
+        opset: int = 17,
+        atol: float = 1e-3,
+    ):
+        if not EXPORT_AVAILABLE:
+            raise ImportError(
+                "❌ ONNX export requires 'torch', 'transformers' and 'onnx'\n"
+                "💡 Install them with: pip install torch transformers onnx\n"
+                f"   Error details: {IMPORT_ERROR}"
+            )
+        if config.runtime.type != RuntimeType.TRANSFORMERS:
+            raise ValueError(
+                f"❌ Only transformers models can be exported (got '{config.runtime.type.value}')\n"
+                "💡 Use a config with runtime.type: transformers and model.format: pytorch"
+            )
+        self.config = config
+        self.output_dir = Path(output_dir)
+        self.opset = opset
+        self.atol = atol
+
+    def export(self) -> ExportResult:
+        """Export, validate against PyTorch and write a ready-to-run config"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        model_path = self.output_dir / MODEL_FILENAME
+
+        print(f"📥 Loading '{self.config.model.path}' for export...")
+        tokenizer = AutoTokenizer.from_pretrained(self.config.model.path, trust_remote_code=True)
+        model = AutoModelForCausalLM.from_pretrained(
+            self.config.model.path,
+            torch_dtype=torch.float32,
+            trust_remote_code=True
+        )
+        model.eval()
+        model.config.use_cache = True
+
+        num_layers, num_kv_heads, head_dim = _cache_geometry(model.config)
+        wrapper = _DecoderWithPast(model, num_layers)
+
+        print(f"📦 Exporting {num_layers}-layer decoder to {model_path}...")
+        self._export_graph(wrapper, model_path, num_layers, num_kv_heads, head_dim)
+
+        print("🔍 Validating ONNX logits against PyTorch...")
+        max_diff = self._validate(model, tokenizer, model_path, num_layers, num_kv_heads, head_dim)
+        if max_diff > self.atol:
+            raise ValueError(
+                f"❌ ONNX logits differ from PyTorch by {max_diff:.2e} (tolerance {self.atol:.0e})\n"
+                f"   Exported files were kept in {self.output_dir} for inspection\n"
+                "💡 Try a different --opset or a looser --atol"
+            )
+        print(f"✅ Logits match (max abs diff {max_diff:.2e})")
+
+        tokenizer.save_pretrained(str(self.output_dir))
+
+        onnx_config = SLMConfig(
+            model=ModelConfig(
+                name=self.config.model.name,
+                path=str(model_path.resolve()),
+                format="onnx",
+                description=f"{self.config.model.name} exported to ONNX"
+            ),
+            runtime=RuntimeConfig(
+                type=RuntimeType.ONNX,
+                device=self.config.runtime.device,
+                threads=self.config.runtime.threads,
+                context_size=self.config.runtime.context_size
+            ),
+            params=self.config.params
+        )
+        config_path = self.output_dir / CONFIG_FILENAME
+        ConfigLoader.save(onnx_config, config_path)
+
+        return ExportResult(
+            model_path=model_path,
+            config_path=config_path,
+            max_abs_diff=max_diff,
+            num_layers=num_layers
+        )
+
+    def _export_graph(self, wrapper, model_path: Path, num_layers: int, num_kv_heads: int, head_dim: int):
+        batch, seq_len, past_len = 1, 4, 3
+        past = _dummy_past(num_layers, batch, num_kv_heads, past_len, head_dim)
+        input_ids = torch.ones((batch, seq_len), dtype=torch.long)
+        attention_mask = torch.ones((batch, past_len + seq_len), dtype=torch.long)
+        args = [input_ids, attention_mask]
+        input_names = ["input_ids", "attention_mask"]
+        dynamic_axes = {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "total_sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        }
+        if wrapper.accepts_position_ids:
+            args.append(torch.arange(past_len, past_len + seq_len, dtype=torch.long)[None, :])
+            input_names.append("position_ids")
+            dynamic_axes["position_ids"] = {0: "batch", 1: "sequence"}
+
+        output_names = ["logits"]
+        for i in range(num_layers):
+            for kind in ("key", "value"):
+                input_names.append(f"past_key_values.{i}.{kind}")
+                output_names.append(f"present.{i}.{kind}")
+                dynamic_axes[f"past_key_values.{i}.{kind}"] = {0: "batch", 2: "past_sequence"}
+                dynamic_axes[f"present.{i}.{kind}"] = {0: "batch", 2: "total_sequence"}
+        args.extend(past)
+
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            # The TorchScript exporter handles dynamic_axes for these graphs
+            export_kwargs["dynamo"] = False
+
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper,
+                tuple(args),
+                str(model_path),
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dynamic_axes,
+                opset_version=self.opset,
+                do_constant_folding=True,
+                **export_kwargs
+            )
+
+    def _validate(self, model, tokenizer, model_path: Path, num_layers: int, num_kv_heads: int, head_dim: int) -> float:
+        """Compare prompt and one cached decode step against PyTorch"""
+        import numpy as np
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        input_names = {meta.name for meta in session.get_inputs()}
+        ids = tokenizer.encode("The quick brown fox jumps over the lazy dog")
+        prompt, next_token = ids[:-1], ids[-1:]
+
+        def feeds(step_ids: List[int], past: List["np.ndarray"], past_len: int):
+            data = {
+                "input_ids": np.asarray([step_ids], dtype=np.int64),
+                "attention_mask": np.ones((1, past_len + len(step_ids)), dtype=np.int64),
+            }
+            if "position_ids" in input_names:
+                data["position_ids"] = np.arange(past_len, past_len + len(step_ids), dtype=np.int64)[None, :]
+            for i in range(num_layers):
+                data[f"past_key_values.{i}.key"] = past[2 * i]
+                data[f"past_key_values.{i}.value"] = past[2 * i + 1]
+            return data
+
+        empty = [np.zeros((1, num_kv_heads, 0, head_dim), dtype=np.float32)] * (2 * num_layers)
+        onnx_prompt = session.run(None, feeds(prompt, empty, 0))
+        onnx_step = session.run(None, feeds(next_token, onnx_prompt[1:], len(prompt)))
+
+        with torch.no_grad():
+            torch_prompt = model(torch.tensor([prompt]), use_cache=True)
+            torch_step = model(
+                torch.tensor([next_token]),
+                past_key_values=torch_prompt.past_key_values,
+                use_cache=True
+            )
+
+        return max(
+            float(np.abs(onnx_prompt[0] - torch_prompt.logits.numpy()).max()),
+            float(np.abs(onnx_step[0] - torch_step.logits.numpy()).max())
+        )
+
+
+class _DecoderWithPast(torch.nn.Module if EXPORT_AVAILABLE else object):
+    """Flattens the KV cache into positional tensors for tracing"""
+
+    def __init__(self, model, num_layers: int):
+        super().__init__()
+        self.model = model
+        self.num_layers = num_layers
+        self.accepts_position_ids = "position_ids" in inspect.signature(model.forward).parameters
+
+    def forward(self, input_ids, attention_mask, *rest):
+        if self.accepts_position_ids:
+            position_ids, past = rest[0], rest[1:]
+        else:
+            position_ids, past = None, rest
+        legacy = tuple((past[2 * i], past[2 * i + 1]) for i in range(self.num_layers))
+        kwargs = {"position_ids": position_ids} if self.accepts_position_ids else {}
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=_to_cache(legacy),
+            use_cache=True,
+            return_dict=True,
+            **kwargs
+        )
+        present = _to_legacy(outputs.past_key_values)
+        return (outputs.logits,) + tuple(t for layer in present for t in layer)
+
+
+def _cache_geometry(model_config) -> Tuple[int, int, int]:
+    """(num_layers, num_kv_heads, head_dim) from a Transformers config"""
+    num_layers = getattr(model_config, "num_hidden_layers", None) or getattr(model_config, "n_layer")
+    num_heads = getattr(model_config, "num_attention_heads", None) or getattr(model_config, "n_head")
+    num_kv_heads = getattr(model_config, "num_key_value_heads", None) or num_heads
+    hidden = getattr(model_config, "hidden_size", None) or getattr(model_config, "n_embd")
+    head_dim = getattr(model_config, "head_dim", None) or hidden // num_heads
+    return num_layers, num_kv_heads, head_dim
+
+
+def _dummy_past(num_layers: int, batch: int, num_kv_heads: int, past_len: int, head_dim: int) -> List["torch.Tensor"]:
+    return [
+        torch.zeros((batch, num_kv_heads, past_len, head_dim), dtype=torch.float32)
+        for _ in range(2 * num_layers)
+    ]
+
+
+def _to_cache(legacy):
+    """Wrap a tuple KV cache in the Cache object newer Transformers expect"""
+    try:
+        from transformers.cache_utils import DynamicCache
+    except ImportError:
+        return legacy
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(legacy)
+    cache = DynamicCache()
+    for layer_idx, (key, value) in enumerate(legacy):
+        cache.update(key, value, layer_idx)
+    return cache
+
+
+def _to_legacy(cache):
+    if isinstance(cache, tuple):
+        return cache
+    if hasattr(cache, "to_legacy_cache"):
+        return cache.to_legacy_cache()
+    return tuple((layer.keys, layer.values) for layer in cache.layers)
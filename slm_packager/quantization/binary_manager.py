@@ -1,9 +1,10 @@
 """Binary manager for auto-downloading quantization tools"""
 import platform
-import urllib.request
 from pathlib import Path
 from typing import Optional
 
+from ..registry.transfer import RangeDownloader, ConsoleProgress
+
 class BinaryManager:
     """Manages downloading and caching of quantization binaries"""
     
@@ -61,15 +62,15 @@ class BinaryManager:
     def _download_and_extract(cls, binary_path: Path):
         """Download and extract binary from llama.cpp releases"""
         import zipfile
-        import tempfile
         
         url = cls._get_url()
         
-        # Download to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp:
-            print(f"   Downloading from: {url}")
-            urllib.request.urlretrieve(url, tmp.name, reporthook=cls._show_progress)
-            zip_path = Path(tmp.name)
+        # Download next to the binary so an interrupted download resumes
+        zip_path = binary_path.parent / Path(url).name
+        print(f"   Downloading from: {url}")
+        progress = ConsoleProgress()
+        RangeDownloader(progress=progress).download(url, zip_path)
+        progress.finish()
         
         # Extract quantize binary
         try:
@@ -108,13 +109,3 @@ class BinaryManager:
         
         return cls.BINARY_URLS[system]
     
-    @classmethod
-    def _show_progress(cls, block_num, block_size, total_size):
-        """Show download progress"""
-        downloaded = block_num * block_size
-        percent = min(100, (downloaded / total_size) * 100) if total_size > 0 else 0
-        
-        if block_num % 50 == 0:  # Update every 50 blocks
-            mb_downloaded = downloaded / (1024 * 1024)
-            mb_total = total_size / (1024 * 1024)
-            print(f"   Downloaded: {mb_downloaded:.1f}MB / {mb_total:.1f}MB ({percent:.1f}%)", end='\r')
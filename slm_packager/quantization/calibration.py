@@ -0,0 +1,84 @@
+"""Calibration data for static ONNX quantization"""
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader
+    ONNX_QUANT_AVAILABLE = True
+except ImportError:
+    CalibrationDataReader = object
+    ONNX_QUANT_AVAILABLE = False
+
+from ..runtime.onnx import build_feeds
+
+
+class TextCalibrationReader(CalibrationDataReader):
+    """
+    Streams a text file through a tokenizer as ONNX calibration batches.
+
+    Each blank-line separated paragraph becomes one sample, truncated to
+    `seq_len` tokens. Samples are produced lazily, so calibration files of
+    any size work; only the first `max_samples` are used.
+    """
+
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        data_path: Union[str, Path],
+        tokenizer,
+        max_samples: int = 128,
+        seq_len: int = 128,
+    ):
+        if not ONNX_QUANT_AVAILABLE:
+            raise ImportError(
+                "ONNX quantization requires 'onnxruntime'\n"
+                "Install with: pip install onnxruntime"
+            )
+        self.data_path = Path(data_path)
+        if not self.data_path.exists():
+            raise FileNotFoundError(f"Calibration data not found: '{self.data_path}'")
+
+        self.tokenizer = tokenizer
+        self.max_samples = max_samples
+        self.seq_len = seq_len
+        # Only input metadata is needed; skip graph optimization
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_metas = session.get_inputs()
+        del session
+        self._samples = self._iter_samples()
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        return next(self._samples, None)
+
+    def rewind(self):
+        self._samples = self._iter_samples()
+
+    def _iter_samples(self) -> Iterator[Dict[str, np.ndarray]]:
+        produced = 0
+        for text in self._iter_texts():
+            ids = self.tokenizer.encode(text)[:self.seq_len]
+            if not ids:
+                continue
+            yield build_feeds(self.input_metas, np.asarray([ids], dtype=np.int64))
+            produced += 1
+            if produced >= self.max_samples:
+                return
+
+    def _iter_texts(self) -> Iterator[str]:
+        paragraph = []
+        with open(self.data_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    paragraph.append(line)
+                    continue
+                if paragraph:
+                    yield " ".join(paragraph)
+                    paragraph = []
+        if paragraph:
+            yield " ".join(paragraph)
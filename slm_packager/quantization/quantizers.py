@@ -1,42 +1,83 @@
 import subprocess
 import logging
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Sequence, Dict, Tuple
 
 from .binary_manager import BinaryManager
 
 logger = logging.getLogger(__name__)
 
+# Resident memory budgeted per quantize job on top of a share of the input
+# size. llama.cpp's quantize reads tensors from the mmap'd input one at a
+# time, so a job only holds a few working buffers, not the whole model.
+_JOB_BASE_MEMORY = 512 * 1024 * 1024
+_JOB_INPUT_FRACTION = 0.25
+
+@dataclass
+class QuantizationResult:
+    """Outcome of one quantization job"""
+    type: str
+    output_path: str
+    input_size: int
+    output_size: int
+    wall_time_sec: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.input_size / self.output_size if self.output_size else 0.0
+
+class QuantizationCancelled(RuntimeError):
+    """Raised when a running quantization job is cancelled"""
+
 class Quantizer:
+    # Serializes live output from concurrent jobs so lines don't interleave
+    _output_lock = threading.Lock()
+
     @staticmethod
-    def quantize_gguf(model_path: str, output_path: str, type: str = "q4_k_m"):
+    def quantize_gguf(
+        model_path: str,
+        output_path: str,
+        type: str = "q4_k_m",
+        threads: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        label: Optional[str] = None
+    ):
         """
         Quantize a GGUF model - downloads tool automatically if needed
+
+        Tool output is streamed line by line as it is produced. Setting
+        `cancel_event` terminates the tool and removes the partial output.
         """
         try:
             # Auto-download binary
             binary = BinaryManager.get_quantize_binary()
-            
+
             logger.info(f"Quantizing {Path(model_path).name} to {type}")
             logger.debug(f"Output: {output_path}")
-            
+
             cmd = [str(binary), model_path, output_path, type]
-            
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
-            
-            if result.stdout:
-                print(result.stdout)
-            
+            if threads:
+                cmd.append(str(threads))
+
+            Quantizer._run_streaming(cmd, label, cancel_event, output_path)
+
             logger.info(f"Quantized successfully: {output_path}")
-            print(f"Quantization complete: {output_path}")
-            print(f"Use with: slm run {output_path}")
-            
+            Quantizer._echo(f"Quantization complete: {output_path}", label)
+            Quantizer._echo(f"Use with: slm run {output_path}", label)
+
+        except QuantizationCancelled:
+            raise
         except subprocess.CalledProcessError as e:
             raise RuntimeError(
                 f"Quantization failed\n"
@@ -49,15 +90,185 @@ class Quantizer:
         except Exception as e:
             raise RuntimeError(
                 f"Unexpected error during quantization\n"
-                f"   {type(e).__name__}: {str(e)}\n"
+                f"   {e.__class__.__name__}: {str(e)}\n"
                 "Alternatives:\n"
                 "   - Download pre-quantized models: slm pull tinyllama --quant q4_k_m"
             ) from e
 
     @staticmethod
-    def quantize_onnx(model_path: str, output_path: str, type: str = "int8"):
+    def quantize_gguf_many(
+        model_path: str,
+        types: Sequence[str],
+        output_dir: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[QuantizationResult]:
+        """
+        Build several quantized variants of a GGUF model concurrently.
+
+        The worker pool is sized from CPU cores and available RAM unless
+        `max_workers` is given. Cores are split evenly between jobs. A
+        failing job does not stop the others; Ctrl+C cancels all of them.
+
+        Returns:
+            One QuantizationResult per requested type, in request order
+        """
+        source = Path(model_path)
+        input_size = source.stat().st_size
+        out_dir = Path(output_dir) if output_dir else source.parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        # Resolve the binary once up front so jobs don't race to download it
+        BinaryManager.get_quantize_binary()
+
+        workers = max_workers or Quantizer._default_workers(input_size, len(types))
+        workers = max(1, min(workers, len(types)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        cancel_event = cancel_event or threading.Event()
+
+        logger.info(f"Quantizing to {len(types)} types with {workers} workers x {threads} threads")
+
+        def job(qtype: str) -> QuantizationResult:
+            output_path = str(out_dir / f"{source.stem}-{qtype}.gguf")
+            start = time.perf_counter()
+            error = None
+            try:
+                if cancel_event.is_set():
+                    raise QuantizationCancelled("cancelled before start")
+                Quantizer.quantize_gguf(
+                    str(source), output_path, qtype,
+                    threads=threads, cancel_event=cancel_event, label=qtype
+                )
+            except Exception as e:
+                error = str(e).strip() or e.__class__.__name__
+                # Prefer the tool's last output line over the generic message
+                cause = e.__cause__
+                if isinstance(cause, subprocess.CalledProcessError) and cause.stderr:
+                    error = cause.stderr.splitlines()[-1].strip()
+            output_file = Path(output_path)
+            return QuantizationResult(
+                type=qtype,
+                output_path=output_path,
+                input_size=input_size,
+                output_size=output_file.stat().st_size if error is None and output_file.exists() else 0,
+                wall_time_sec=time.perf_counter() - start,
+                error=error
+            )
+
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(job, qtype) for qtype in types]
+            results = []
+            for future in futures:
+                # Poll so KeyboardInterrupt is delivered promptly
+                while True:
+                    try:
+                        results.append(future.result(timeout=0.5))
+                        break
+                    except FutureTimeoutError:
+                        continue
+            return results
+        except KeyboardInterrupt:
+            cancel_event.set()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+
+    @staticmethod
+    def _default_workers(input_size: int, num_jobs: int) -> int:
+        """Size the worker pool from CPU cores and available memory"""
+        cores = os.cpu_count() or 1
+        # Each job gets at least two threads when there are enough cores
+        by_cores = max(1, cores // 2)
+
+        try:
+            import psutil
+            available = psutil.virtual_memory().available
+            per_job = _JOB_BASE_MEMORY + int(input_size * _JOB_INPUT_FRACTION)
+            by_memory = max(1, available // per_job)
+        except ImportError:
+            by_memory = 1
+
+        return max(1, min(num_jobs, by_cores, by_memory))
+
+    @staticmethod
+    def _run_streaming(
+        cmd: List[str],
+        label: Optional[str],
+        cancel_event: Optional[threading.Event],
+        output_path: str
+    ):
+        """Run a tool, echoing its output live and honoring cancellation"""
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+        tail = deque(maxlen=20)
+
+        def watch():
+            while proc.poll() is None:
+                if cancel_event.wait(0.2):
+                    proc.terminate()
+                    return
+
+        if cancel_event is not None:
+            threading.Thread(target=watch, daemon=True).start()
+
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                tail.append(line)
+                Quantizer._echo(line, label)
+        returncode = proc.wait()
+
+        if cancel_event is not None and cancel_event.is_set():
+            Path(output_path).unlink(missing_ok=True)
+            raise QuantizationCancelled(f"Quantization cancelled: {label or output_path}")
+        if returncode != 0:
+            Path(output_path).unlink(missing_ok=True)
+            raise subprocess.CalledProcessError(returncode, cmd, stderr="\n   ".join(tail))
+
+    @staticmethod
+    def _echo(message: str, label: Optional[str] = None):
+        prefix = f"[{label}] " if label else ""
+        with Quantizer._output_lock:
+            print(f"{prefix}{message}", flush=True)
+
+    @staticmethod
+    def quantize_onnx(
+        model_path: str,
+        output_path: str,
+        type: str = "int8",
+        mode: str = "dynamic",
+        calibration_data: Optional[str] = None,
+        tokenizer: Optional[str] = None,
+        per_channel: bool = False,
+        quant_format: str = "qdq",
+        activation_type: Optional[str] = None,
+        op_types: Optional[Sequence[str]] = None,
+        op_overrides: Optional[Dict[str, Tuple[str, str]]] = None,
+        calibration_samples: int = 128,
+        calibration_method: str = "minmax"
+    ):
         """
         Quantize an ONNX model using onnxruntime.quantization.
+
+        Args:
+            type: Weight type, "int8" (signed) or "uint8"
+            mode: "dynamic" quantizes weights only and computes activation
+                scales at run time; "static" calibrates activation ranges
+                ahead of time by streaming `calibration_data` through the model
+            tokenizer: Tokenizer path or repo id for calibration text
+                (default: the model's directory)
+            per_channel: Per-channel weight scales (static mode)
+            quant_format: "qdq" or "qoperator" graph format (static mode)
+            activation_type: "int8" or "uint8" activations (static mode)
+            op_types: Restrict quantization to these operator types
+            op_overrides: {op_type: (weight_type, activation_type)} for
+                per-operator types (static mode, QDQ format)
         """
         try:
             from onnxruntime.quantization import quantize_dynamic, QuantType
@@ -67,20 +278,148 @@ class Quantizer:
                 "Install with: pip install onnxruntime"
             )
 
-        logger.info(f"Quantizing ONNX model to {type}")
-        
-        quant_type = QuantType.QUInt8 if type == "int8" else QuantType.QInt8
-        
+        if mode not in ("dynamic", "static"):
+            raise ValueError(f"Unknown ONNX quantization mode: '{mode}' (use dynamic or static)")
+
+        weight_type = Quantizer._onnx_quant_type(type)
+        logger.info(f"Quantizing ONNX model to {type} ({mode})")
+
         try:
-            quantize_dynamic(
-                model_input=Path(model_path),
-                model_output=Path(output_path),
-                weight_type=quant_type
-            )
+            if mode == "dynamic":
+                if type == "int8" and "Conv" in Quantizer._onnx_op_types(model_path):
+                    # ConvInteger has no signed-weight kernel on CPU
+                    logger.info("Model has Conv nodes; using uint8 weights for dynamic quantization")
+                    weight_type = QuantType.QUInt8
+                quantize_dynamic(
+                    model_input=Path(model_path),
+                    model_output=Path(output_path),
+                    weight_type=weight_type,
+                    op_types_to_quantize=list(op_types) if op_types else None
+                )
+            else:
+                Quantizer._quantize_onnx_static(
+                    model_path, output_path, weight_type,
+                    calibration_data=calibration_data,
+                    tokenizer=tokenizer,
+                    per_channel=per_channel,
+                    quant_format=quant_format,
+                    activation_type=activation_type,
+                    op_types=op_types,
+                    op_overrides=op_overrides,
+                    calibration_samples=calibration_samples,
+                    calibration_method=calibration_method
+                )
             logger.info(f"Successfully quantized to {output_path}")
             print(f"Quantization complete: {output_path}")
+        except (ValueError, FileNotFoundError):
+            raise
         except Exception as e:
             raise RuntimeError(
                 f"ONNX quantization failed\n"
                 f"   {str(e)}"
             ) from e
+
+    @staticmethod
+    def _quantize_onnx_static(
+        model_path: str,
+        output_path: str,
+        weight_type,
+        calibration_data: Optional[str],
+        tokenizer: Optional[str],
+        per_channel: bool,
+        quant_format: str,
+        activation_type: Optional[str],
+        op_types: Optional[Sequence[str]],
+        op_overrides: Optional[Dict[str, Tuple[str, str]]],
+        calibration_samples: int,
+        calibration_method: str
+    ):
+        from onnxruntime.quantization import quantize_static, QuantFormat, CalibrationMethod
+        from .calibration import TextCalibrationReader
+
+        if not calibration_data:
+            raise ValueError(
+                "Static quantization needs calibration data\n"
+                "   Pass a representative text file, e.g. --calibration data.txt"
+            )
+
+        formats = {"qdq": QuantFormat.QDQ, "qoperator": QuantFormat.QOperator}
+        if quant_format not in formats:
+            raise ValueError(f"Unknown ONNX quantization format: '{quant_format}' (use qdq or qoperator)")
+        methods = {
+            "minmax": CalibrationMethod.MinMax,
+            "entropy": CalibrationMethod.Entropy,
+            "percentile": CalibrationMethod.Percentile,
+        }
+        if calibration_method not in methods:
+            raise ValueError(f"Unknown calibration method: '{calibration_method}' (use {', '.join(methods)})")
+
+        # QDQ runs best with signed activations on x86; QOperator kernels expect uint8
+        if activation_type is None:
+            activation_type = "int8" if quant_format == "qdq" else "uint8"
+
+        extra_options = {}
+        if op_overrides:
+            if quant_format != "qdq":
+                raise ValueError("Per-operator quantization types require the QDQ format")
+            extra_options["TensorQuantOverrides"] = Quantizer._tensor_overrides(model_path, op_overrides)
+
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                "Calibration requires 'transformers' for tokenization\n"
+                "Install with: pip install transformers"
+            )
+        tokenizer_source = tokenizer or str(Path(model_path).parent)
+        text_tokenizer = AutoTokenizer.from_pretrained(tokenizer_source, trust_remote_code=True)
+
+        reader = TextCalibrationReader(
+            model_path, calibration_data, text_tokenizer,
+            max_samples=calibration_samples
+        )
+        quantize_static(
+            model_input=Path(model_path),
+            model_output=Path(output_path),
+            calibration_data_reader=reader,
+            quant_format=formats[quant_format],
+            op_types_to_quantize=list(op_types) if op_types else None,
+            per_channel=per_channel,
+            weight_type=weight_type,
+            activation_type=Quantizer._onnx_quant_type(activation_type),
+            calibrate_method=methods[calibration_method],
+            extra_options=extra_options
+        )
+
+    @staticmethod
+    def _onnx_quant_type(name: str):
+        from onnxruntime.quantization import QuantType
+        types = {"int8": QuantType.QInt8, "uint8": QuantType.QUInt8}
+        if name not in types:
+            raise ValueError(f"Unsupported ONNX quantization type: '{name}' (use int8 or uint8)")
+        return types[name]
+
+    @staticmethod
+    def _onnx_op_types(model_path: str) -> set:
+        import onnx
+        model = onnx.load(model_path, load_external_data=False)
+        return {node.op_type for node in model.graph.node}
+
+    @staticmethod
+    def _tensor_overrides(model_path: str, op_overrides: Dict[str, Tuple[str, str]]) -> Dict[str, list]:
+        """Translate per-operator types into onnxruntime per-tensor overrides"""
+        import onnx
+        model = onnx.load(model_path, load_external_data=False)
+        initializers = {init.name for init in model.graph.initializer}
+
+        overrides: Dict[str, list] = {}
+        for node in model.graph.node:
+            if node.op_type not in op_overrides:
+                continue
+            weight_type, activation_type = op_overrides[node.op_type]
+            for name in list(node.input) + list(node.output):
+                if not name:
+                    continue
+                qtype = weight_type if name in initializers else activation_type
+                overrides.setdefault(name, [{"quant_type": Quantizer._onnx_quant_type(qtype)}])
+        return overrides
@@ -1,8 +1,21 @@
 """Model registry management"""
+import bisect
 import json
+import logging
+import os
+import pickle
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_CATALOG = Path(__file__).parent / "models.json"
+# Bump when the compiled index layout changes
+INDEX_VERSION = 1
+
+_SIZE_UNITS = {"TB": 1024**4, "GB": 1024**3, "MB": 1024**2, "KB": 1024, "B": 1}
 
 @dataclass
 class ModelVariant:
@@ -22,59 +35,228 @@ class ModelInfo:
     runtime: str
     repo: str
     variants: Dict[str, ModelVariant]
+    source: str = field(default="", compare=False)
+
+def parse_size(text: str) -> int:
+    """Parse sizes like 637MB, 1.1GB or plain bytes"""
+    value = str(text).strip().upper()
+    for suffix, factor in _SIZE_UNITS.items():
+        if value.endswith(suffix):
+            number = value[:-len(suffix)].strip()
+            break
+    else:
+        number, factor = value, 1
+    try:
+        return int(float(number) * factor)
+    except ValueError:
+        raise ValueError(
+            f"❌ Invalid size: '{text}'\n"
+            "💡 Use a number with an optional unit, e.g. 500MB or 20GB"
+        )
+
+def default_sources() -> List[Path]:
+    """
+    Catalog sources in increasing priority: the bundled catalog, every
+    *.json in the directories listed in SLM_CATALOG_DIR (a team catalog),
+    then ~/.slm/models.json. A later source replaces same-named models.
+    """
+    sources = [BUNDLED_CATALOG]
+    for directory in filter(None, os.environ.get("SLM_CATALOG_DIR", "").split(os.pathsep)):
+        sources.extend(sorted(Path(directory).expanduser().glob("*.json")))
+    sources.append(Path.home() / ".slm" / "models.json")
+    return sources
+
+class _CatalogIndex:
+    """Compiled, query-ready form of the merged catalogs"""
+
+    def __init__(self, models: Dict[str, ModelInfo]):
+        self.models = models
+        self.position = {name: i for i, name in enumerate(models)}
+        self.recommended: Dict[str, Optional[str]] = {}
+        self.by_runtime: Dict[str, set] = {}
+        self.by_format: Dict[str, set] = {}
+        self.by_quant: Dict[str, set] = {}
+        # (bytes, model, variant) sorted by size for range queries
+        self.sizes: List[Tuple[int, str, str]] = []
+
+        for name, model in models.items():
+            self.by_runtime.setdefault(model.runtime, set()).add(name)
+            self.by_format.setdefault(model.format, set()).add(name)
+            recommended = None
+            for variant_name, variant in model.variants.items():
+                self.by_quant.setdefault(variant_name, set()).add(name)
+                if variant.recommended and recommended is None:
+                    recommended = variant_name
+                try:
+                    self.sizes.append((parse_size(variant.size), name, variant_name))
+                except ValueError:
+                    logger.debug(f"Unparseable size '{variant.size}' for {name}/{variant_name}")
+            if recommended is None and model.variants:
+                recommended = next(iter(model.variants))
+            self.recommended[name] = recommended
+        self.sizes.sort()
+        self._size_keys = [entry[0] for entry in self.sizes]
+
+    def fitting(self, max_size: int) -> List[Tuple[int, str, str]]:
+        return self.sizes[:bisect.bisect_right(self._size_keys, max_size)]
+
+# Compiled indexes shared by every ModelRegistry in this process
+_MEMORY_CACHE: Dict[tuple, _CatalogIndex] = {}
+_MEMORY_LOCK = threading.Lock()
 
 class ModelRegistry:
-    """Manages the model registry"""
-    
-    def __init__(self):
-        self.registry_path = Path(__file__).parent / "models.json"
-        self._registry = self._load_registry()
-    
-    def _load_registry(self) -> Dict:
-        """Load registry from JSON file"""
-        with open(self.registry_path, 'r') as f:
-            return json.load(f)
-    
-    def get_model(self, model_name: str) -> Optional[ModelInfo]:
-        """Get model info by name"""
-        if model_name not in self._registry['models']:
+    """
+    Manages the model registry.
+
+    Several catalog sources are merged into one compiled index. The index
+    is cached on disk (keyed by the sources' paths, sizes and mtimes) and
+    in memory, so constructing a registry only stats the sources and
+    lookups never re-parse JSON.
+    """
+
+    def __init__(self, sources: Optional[List[Path]] = None, cache_path: Optional[Path] = None):
+        self.sources = [Path(p) for p in sources] if sources is not None else default_sources()
+        self.registry_path = BUNDLED_CATALOG
+        self.cache_path = cache_path or Path.home() / ".slm" / "cache" / "catalog.pickle"
+        self._index = self._load_index()
+
+    def _fingerprint(self) -> tuple:
+        entries = []
+        for path in self.sources:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((str(path.resolve()), stat.st_size, stat.st_mtime_ns))
+        return (INDEX_VERSION,) + tuple(entries)
+
+    def _load_index(self) -> _CatalogIndex:
+        """Return the compiled index, rebuilding it only when a source changed"""
+        key = self._fingerprint()
+        with _MEMORY_LOCK:
+            index = _MEMORY_CACHE.get(key)
+            if index is not None:
+                return index
+
+            index = self._read_cache(key)
+            if index is None:
+                index = _CatalogIndex(self._merge_sources())
+                self._write_cache(key, index)
+            _MEMORY_CACHE.clear()
+            _MEMORY_CACHE[key] = index
+            return index
+
+    def _read_cache(self, key: tuple) -> Optional[_CatalogIndex]:
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached_key, index = pickle.load(f)
+        except FileNotFoundError:
             return None
-        
-        data = self._registry['models'][model_name]
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable catalog cache {self.cache_path}: {e}")
+            return None
+        return index if cached_key == key else None
+
+    def _write_cache(self, key: tuple, index: _CatalogIndex):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_name(self.cache_path.name + f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump((key, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.debug(f"Could not write catalog cache {self.cache_path}: {e}")
+
+    def _merge_sources(self) -> Dict[str, ModelInfo]:
+        models: Dict[str, ModelInfo] = {}
+        for path in self.sources:
+            if not path.exists():
+                continue
+            try:
+                with open(path, 'r') as f:
+                    catalog = json.load(f)
+            except (OSError, ValueError) as e:
+                if path == BUNDLED_CATALOG:
+                    raise
+                logger.warning(f"Skipping unreadable catalog {path}: {e}")
+                continue
+
+            for name, data in catalog.get('models', {}).items():
+                try:
+                    models[name] = self._compile(data, source=str(path))
+                except (KeyError, TypeError) as e:
+                    logger.warning(f"Skipping invalid entry '{name}' in {path}: {e}")
+        return models
+
+    @staticmethod
+    def _compile(data: Dict, source: str) -> ModelInfo:
         variants = {
-            k: ModelVariant(**v) 
+            k: ModelVariant(**v)
             for k, v in data['variants'].items()
         }
-        
+
         return ModelInfo(
             name=data['name'],
             description=data['description'],
             format=data['format'],
             runtime=data['runtime'],
             repo=data['repo'],
-            variants=variants
+            variants=variants,
+            source=source
         )
-    
+
+    def get_model(self, model_name: str) -> Optional[ModelInfo]:
+        """Get model info by name"""
+        return self._index.models.get(model_name)
+
     def list_models(self) -> List[str]:
         """List all available model names"""
-        return list(self._registry['models'].keys())
-    
+        return list(self._index.models.keys())
+
     def get_all_models(self) -> Dict[str, ModelInfo]:
         """Get all models as ModelInfo objects"""
-        return {
-            name: self.get_model(name)
-            for name in self.list_models()
-        }
-    
+        return dict(self._index.models)
+
     def get_recommended_variant(self, model_name: str) -> Optional[str]:
         """Get recommended quantization variant for a model"""
-        model = self.get_model(model_name)
-        if not model:
-            return None
-        
-        for variant_name, variant in model.variants.items():
-            if variant.recommended:
-                return variant_name
-        
-        # Fallback to first variant
-        return list(model.variants.keys())[0] if model.variants else None
+        return self._index.recommended.get(model_name)
+
+    def query(
+        self,
+        runtime: Optional[str] = None,
+        format: Optional[str] = None,
+        max_size: Optional[int] = None,
+        quantization: Optional[str] = None,
+    ) -> Dict[str, ModelInfo]:
+        """
+        Models matching every given filter, in catalog order
+
+        Args:
+            runtime: Runtime type (llama_cpp, onnx, transformers)
+            format: Model format (gguf, onnx, pytorch)
+            max_size: Size ceiling in bytes; a model matches when a variant
+                (the given quantization, if any) fits
+            quantization: Variant name the model must offer
+        """
+        index = self._index
+        candidates: Optional[set] = None
+        for table, value in (
+            (index.by_runtime, runtime),
+            (index.by_format, format),
+            (index.by_quant, quantization),
+        ):
+            if value is None:
+                continue
+            names = table.get(value, set())
+            candidates = names if candidates is None else candidates & names
+
+        if max_size is not None:
+            fitting = {
+                name for _, name, variant in index.fitting(max_size)
+                if quantization is None or variant == quantization
+            }
+            candidates = fitting if candidates is None else candidates & fitting
+
+        if candidates is None:
+            return dict(index.models)
+        return {name: index.models[name] for name in sorted(candidates, key=index.position.__getitem__)}
@@ -1,11 +1,17 @@
 """Download manager for pulling models from HuggingFace"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, List, Union
+import os
 import sys
+import threading
+import time
 
 try:
-    from huggingface_hub import hf_hub_download
-    from tqdm import tqdm
+    from huggingface_hub import hf_hub_url, get_hf_file_metadata, HfApi
+    from huggingface_hub.utils import build_hf_headers
     HF_AVAILABLE = True
 except ImportError:
     HF_AVAILABLE = False
@@ -13,11 +19,45 @@ except ImportError:
 from ..config.models import SLMConfig, ModelConfig, RuntimeConfig
 from ..config.loader import ConfigLoader
 from . import ModelRegistry
+from .store import ModelStore
+from .transfer import RangeDownloader, ConsoleProgress, BandwidthLimiter, ChecksumMismatchError
+
+# Files needed to load a Transformers model offline: configs, tokenizer
+# files, remote-code modules and safetensors weights
+SNAPSHOT_PATTERNS = [
+    "*.json",
+    "*.safetensors",
+    "*.py",
+    "tokenizer.model",
+    "*.tiktoken",
+    "merges.txt",
+    "vocab.txt",
+]
+# Only used when a repo publishes no safetensors weights
+LEGACY_WEIGHT_PATTERNS = ["pytorch_model*.bin"]
+
+@dataclass
+class PullResult:
+    """Outcome of pulling one model as part of a batch"""
+    name: str
+    path: Optional[Path] = None
+    error: Optional[str] = None
+    elapsed_sec: float = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 class ModelDownloader:
     """Handles downloading models from HuggingFace"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        max_workers: int = 8,
+        connections: int = 8,
+        max_connections: int = 16,
+    ):
         if not HF_AVAILABLE:
             raise ImportError(
                 "❌ Model downloading requires 'huggingface-hub'\n"
@@ -25,8 +65,18 @@ class ModelDownloader:
             )
         
         self.registry = ModelRegistry()
+        # Hub base URL; override to point at a mirror or a local stand-in
+        self.endpoint = endpoint or os.environ.get("SLM_HF_ENDPOINT")
+        self.max_workers = max_workers
+        self.connections = connections
+        # Concurrent pulls, snapshot files and range requests nest; this caps
+        # the HTTP connections open across all of them
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
         self.models_dir = Path.home() / ".slm" / "models"
         self.configs_dir = Path.home() / ".slm" / "configs"
+        self.store = ModelStore()
+        # SHA-256 of files fetched by this downloader, so the store need not rehash them
+        self._hashes = {}
         
         # Create directories
         self.models_dir.mkdir(parents=True, exist_ok=True)
@@ -43,6 +93,59 @@ class ModelDownloader:
         Returns:
             Path to downloaded model file
         """
+        path = self._pull(model_name, quantization)
+        print(f"\n🚀 Ready to use:")
+        print(f"   slm run {model_name} --prompt \"Hello!\"")
+        return path
+    
+    def pull_many(
+        self,
+        model_names: List[str],
+        quantization: Union[str, Dict[str, str], None] = None,
+        max_parallel: int = 3,
+        bandwidth_mbps: Optional[float] = None,
+    ) -> List["PullResult"]:
+        """
+        Pull several models concurrently with one aggregated progress line
+        
+        Args:
+            model_names: Names of models in registry
+            quantization: Quantization for every model, or a per-model mapping
+                (default: each model's recommended variant)
+            max_parallel: Number of models downloaded at the same time
+            bandwidth_mbps: Optional cap on the combined download rate in MB/s
+        
+        Returns:
+            One PullResult per model, in the order given; a failed model
+            does not stop the others
+        """
+        limiter = BandwidthLimiter(bandwidth_mbps) if bandwidth_mbps else None
+        progress = ConsoleProgress(label=f"Downloading {len(model_names)} models")
+        
+        def run(name: str) -> PullResult:
+            start = time.perf_counter()
+            try:
+                quant = quantization.get(name) if isinstance(quantization, dict) else quantization
+                path = self._pull(name, quant, progress=progress, limiter=limiter, verbose=False)
+                return PullResult(name=name, path=path, elapsed_sec=time.perf_counter() - start)
+            except Exception as e:
+                return PullResult(name=name, error=str(e), elapsed_sec=time.perf_counter() - start)
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            results = list(pool.map(run, model_names))
+        progress.finish()
+        return results
+    
+    def _pull(
+        self,
+        model_name: str,
+        quantization: Optional[str],
+        progress: Optional[ConsoleProgress] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        verbose: bool = True,
+    ) -> Path:
+        say = print if verbose else (lambda *args, **kwargs: None)
+        
         # Get model info from registry
         model_info = self.registry.get_model(model_name)
         if not model_info:
@@ -54,7 +157,7 @@ class ModelDownloader:
         # Determine quantization variant
         if quantization is None:
             quantization = self.registry.get_recommended_variant(model_name)
-            print(f"📦 Using recommended quantization: {quantization}")
+            say(f"📦 Using recommended quantization: {quantization}")
         
         if quantization not in model_info.variants:
             raise ValueError(
@@ -64,41 +167,51 @@ class ModelDownloader:
         
         variant = model_info.variants[quantization]
         
-        print(f"\n📥 Downloading {model_info.name} ({quantization})")
-        print(f"   Source: {model_info.repo}")
-        print(f"   Size: {variant.size}")
-        print(f"   Speed: {variant.speed}, Quality: {variant.quality}\n")
+        say(f"\n📥 Downloading {model_info.name} ({quantization})")
+        say(f"   Source: {model_info.repo}")
+        say(f"   Size: {variant.size}")
+        say(f"   Speed: {variant.speed}, Quality: {variant.quality}\n")
         
         # Handle based on format
         if model_info.format == "pytorch":
-            # PyTorch/Transformers models don't need file download
-            # They auto-download on first use with transformers
-            print(f"✅ Model configured: {model_info.repo}")
-            print(f"   (Will download automatically on first run)\n")
+            # Prefetch a local snapshot so later loads never touch the network
+            try:
+                local_dir = self._prefetch_snapshot(model_name, model_info.repo, progress, limiter, verbose)
+            except Exception as e:
+                raise RuntimeError(
+                    f"❌ Failed to download model snapshot\n"
+                    f"   {str(e)}\n"
+                    "💡 Check:\n"
+                    "   - Internet connection\n"
+                    "   - HuggingFace availability\n"
+                    "   - Disk space\n"
+                    "   Re-running 'slm pull' resumes interrupted downloads"
+                ) from e
+            
+            say(f"\n✅ Model snapshot downloaded to: {local_dir}")
             
-            # Create config pointing to HF repo
             config_path = self._create_config(
                 model_name,
-                model_info.repo,  # Use repo ID as path
+                str(local_dir),
                 model_info,
                 quantization
             )
-            print(f"✅ Config created: {config_path}")
-            print(f"\n🚀 Ready to use:")
-            print(f"   slm run {model_name} --prompt \"Hello!\"")
+            say(f"✅ Config created: {config_path}")
+            self._record(model_name, local_dir, model_info, config_path, f"hf://{model_info.repo}")
             
-            return Path(model_info.repo)
+            return local_dir
         
         # GGUF/ONNX models - download file from HuggingFace
         try:
-            model_path = hf_hub_download(
-                repo_id=model_info.repo,
-                filename=variant.file,
-                cache_dir=str(self.models_dir),
-                resume_download=True
-            )
+            model_path = str(self._download_file(
+                model_info.repo,
+                variant.file,
+                progress=progress,
+                limiter=limiter,
+                verbose=verbose
+            ))
             
-            print(f"\n✅ Model downloaded to: {model_path}")
+            say(f"\n✅ Model downloaded to: {model_path}")
             
             # Create config
             config_path = self._create_config(
@@ -107,13 +220,13 @@ class ModelDownloader:
                 model_info,
                 quantization
             )
-            print(f"✅ Config created: {config_path}")
-            
-            print(f"\n🚀 Ready to use:")
-            print(f"   slm run {model_name} --prompt \"Hello!\"")
+            say(f"✅ Config created: {config_path}")
+            self._record(model_name, Path(model_path), model_info, config_path, f"hf://{model_info.repo}/{variant.file}")
             
             return Path(model_path)
             
+        except ChecksumMismatchError:
+            raise
         except Exception as e:
             raise RuntimeError(
                 f"❌ Failed to download model\n"
@@ -124,6 +237,105 @@ class ModelDownloader:
                 "   - Disk space"
             ) from e
     
+    def _download_file(
+        self,
+        repo: str,
+        filename: str,
+        dest_dir: Optional[Path] = None,
+        progress: Optional[ConsoleProgress] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        verbose: bool = True,
+    ) -> Path:
+        """
+        Fetch one repository file with parallel range requests, verifying
+        it against the SHA-256 the hub publishes for LFS files.
+        
+        A shared progress display and bandwidth limiter may be passed in
+        when several files download at once.
+        """
+        dest = (dest_dir or self.models_dir / repo.replace("/", "--")) / filename
+        if dest.exists():
+            if verbose:
+                print(f"   Already downloaded: {dest}")
+            return dest
+        
+        url = hf_hub_url(repo_id=repo, filename=filename, endpoint=self.endpoint)
+        headers = build_hf_headers()
+        metadata = get_hf_file_metadata(url, headers=headers)
+        # LFS files report their SHA-256 as the ETag
+        expected = metadata.etag if metadata.etag and len(metadata.etag) == 64 else None
+        
+        shared = progress is not None
+        if shared:
+            progress.add_total(metadata.size or 0)
+        else:
+            progress = ConsoleProgress(total=metadata.size or 0)
+        downloader = RangeDownloader(
+            connections=self.connections,
+            headers=headers,
+            progress=progress,
+            limiter=limiter,
+            slots=self._slots
+        )
+        result = downloader.download(url, dest, expected_sha256=expected, size=metadata.size)
+        self._hashes[str(dest.resolve())] = result.sha256
+        if not shared:
+            progress.finish()
+        
+        if verbose:
+            verified = "verified" if expected else "not verified (no published checksum)"
+            print(f"   {result.size / (1024 * 1024):.1f}MB in {result.elapsed_sec:.1f}s "
+                  f"({result.mb_per_second:.1f}MB/s, {result.connections} connections), sha256 {verified}")
+        return dest
+    
+    def _prefetch_snapshot(
+        self,
+        model_name: str,
+        repo: str,
+        progress: Optional[ConsoleProgress] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+        verbose: bool = True,
+    ) -> Path:
+        """
+        Download the files a Transformers model needs into
+        ~/.slm/models/<model_name>, in parallel. Interrupted downloads
+        resume on the next call; complete files are skipped.
+        """
+        files = HfApi(endpoint=self.endpoint).list_repo_files(repo)
+        wanted = self._snapshot_files(files)
+        if not any(f.endswith((".safetensors", ".bin")) for f in wanted):
+            raise ValueError(f"No model weights found in repository '{repo}'")
+        
+        local_dir = self.models_dir / model_name
+        if verbose:
+            print(f"   Fetching {len(wanted)} files ({self.max_workers} parallel)...")
+        # One display for the whole snapshot instead of one line per file
+        shared = progress is not None
+        if not shared:
+            progress = ConsoleProgress()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                pool.submit(self._download_file, repo, f, local_dir, progress, limiter, False)
+                for f in wanted
+            ]
+            for future in futures:
+                future.result()
+        if not shared:
+            progress.finish()
+        return local_dir
+    
+    @staticmethod
+    def _snapshot_files(files: List[str]) -> List[str]:
+        """Pick top-level config, tokenizer and weight files from a repo listing"""
+        top_level = [f for f in files if "/" not in f]
+        wanted = [f for f in top_level if any(fnmatch(f, p) for p in SNAPSHOT_PATTERNS)]
+        if not any(f.endswith(".safetensors") for f in wanted):
+            legacy = [f for f in top_level if any(fnmatch(f, p) for p in LEGACY_WEIGHT_PATTERNS)]
+            if legacy:
+                print("   ⚠️  No safetensors weights published; falling back to .bin files")
+            wanted.extend(legacy)
+        return sorted(wanted)
+    
     def _create_config(
         self, 
         model_name: str, 
@@ -137,7 +349,9 @@ class ModelDownloader:
                 name=model_name,
                 path=model_path,
                 format=model_info.format,
-                description=f"{model_info.name} ({quantization})"
+                description=f"{model_info.name} ({quantization})",
+                repo=model_info.repo,
+                variant=quantization
             ),
             runtime=RuntimeConfig(
                 type=model_info.runtime
@@ -149,24 +363,26 @@ class ModelDownloader:
         
         return config_path
     
+    def _record(self, model_name: str, path: Path, model_info, config_path: Path, source: str):
+        """Add a pulled model to the store, sharing weights with identical blobs"""
+        self.store.add(
+            model_name,
+            path,
+            format=model_info.format,
+            config_path=config_path,
+            source=source,
+            hashes=self._hashes
+        )
+    
     def list_installed(self) -> list:
-        """List installed models"""
-        configs = list(self.configs_dir.glob("*.yaml"))
-        installed = []
-        
-        for config_path in configs:
-            try:
-                config = ConfigLoader.load(config_path)
-                model_file = Path(config.model.path)
-                if model_file.exists():
-                    size = model_file.stat().st_size / (1024**3)  # GB
-                    installed.append({
-                        'name': config.model.name,
-                        'path': config.model.path,
-                        'size': f"{size:.2f}GB",
-                        'format': config.model.format
-                    })
-            except Exception:
-                continue
-        
-        return installed
+        """List installed models from the store index"""
+        return [
+            {
+                'name': model.name,
+                'path': model.path,
+                'size': f"{model.size / (1024**3):.2f}GB",
+                'format': model.format,
+                'last_used': model.last_used
+            }
+            for model in self.store.list_models()
+        ]
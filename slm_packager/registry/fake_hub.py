@@ -0,0 +1,266 @@
+"""
+Stand-in for the HuggingFace Hub that serves repositories from a local
+directory, for exercising `slm pull` without network access.
+
+    python -m slm_packager.registry.fake_hub ./hub --port 8002
+    SLM_HF_ENDPOINT=http://127.0.0.1:8002 slm pull phi-2
+
+Each repository is a directory `./hub/<org>/<name>` (or `./hub/<name>`).
+It answers what the downloader asks for: the repository file listing and
+`/<repo>/resolve/<revision>/<file>` with HEAD metadata, Range requests
+and LFS-style SHA-256 ETags for weight files. With `--redirect-lfs`,
+weight files redirect to a different host name, like the hub's CDN.
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+_TREE_RE = re.compile(r"/api/models/(.+?)/tree/([^/]+)(?:/.*)?")
+_INFO_RE = re.compile(r"/api/models/(.+?)(?:/revision/([^/]+))?")
+_RESOLVE_RE = re.compile(r"/(?:cdn/)?(.+?)/resolve/([^/]+)/(.+)")
+
+# Stored through git LFS on the real hub, which reports their SHA-256 as the ETag
+_LFS_SUFFIXES = (".safetensors", ".bin", ".gguf", ".onnx", ".pt", ".pth", ".h5")
+_LFS_MIN_SIZE = 10 * 1024 * 1024
+_POINTER_SIZE = 134
+
+
+class FakeHub:
+    """
+    Serves every repository under `root` on 127.0.0.1.
+
+    `requests` records (method, path, sent Authorization) for each request
+    received, so callers can check what was fetched and where credentials
+    went.
+    """
+
+    def __init__(self, root: Union[str, Path], port: int = 0, redirect_lfs: bool = False):
+        self.root = Path(root)
+        self.redirect_lfs = redirect_lfs
+        self.requests: List[Tuple[str, str, bool]] = []
+        self._hashes: Dict[Tuple[Path, int, float], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                hub._handle(self, body=False)
+
+            def do_GET(self):
+                hub._handle(self, body=True)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """Endpoint to pass as SLM_HF_ENDPOINT"""
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "FakeHub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    # Request handling
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bool):
+        path = unquote(urlsplit(handler.path).path)
+        with self._lock:
+            self.requests.append((handler.command, path, "Authorization" in handler.headers))
+
+        match = _TREE_RE.fullmatch(path)
+        if match:
+            return self._send_json(handler, self._tree(match.group(1)), body)
+        match = _RESOLVE_RE.fullmatch(path)
+        if match:
+            return self._resolve(handler, match.group(1), match.group(3), path.startswith("/cdn/"), body)
+        match = _INFO_RE.fullmatch(path)
+        if match:
+            return self._send_json(handler, self._info(match.group(1)), body)
+        self._send_error(handler, 404, "Not found")
+
+    def _repo_dir(self, repo: str) -> Optional[Path]:
+        path = (self.root / repo).resolve()
+        if self.root.resolve() not in path.parents or not path.is_dir():
+            return None
+        return path
+
+    def _files(self, repo: str) -> Optional[List[Path]]:
+        repo_dir = self._repo_dir(repo)
+        if repo_dir is None:
+            return None
+        return sorted(p for p in repo_dir.rglob("*") if p.is_file())
+
+    def _tree(self, repo: str):
+        files = self._files(repo)
+        if files is None:
+            return None
+        repo_dir = self._repo_dir(repo)
+        entries = []
+        for file in files:
+            size = file.stat().st_size
+            git_oid, sha256 = self._digests(file)
+            entry = {"type": "file", "path": file.relative_to(repo_dir).as_posix(), "size": size, "oid": git_oid}
+            if self._is_lfs(file):
+                entry["lfs"] = {"oid": sha256, "size": size, "pointerSize": _POINTER_SIZE}
+            entries.append(entry)
+        return entries
+
+    def _info(self, repo: str):
+        files = self._files(repo)
+        if files is None:
+            return None
+        repo_dir = self._repo_dir(repo)
+        return {
+            "id": repo,
+            "modelId": repo,
+            "sha": _commit(repo),
+            "siblings": [{"rfilename": f.relative_to(repo_dir).as_posix()} for f in files],
+        }
+
+    def _resolve(self, handler, repo: str, filename: str, from_cdn: bool, body: bool):
+        repo_dir = self._repo_dir(repo)
+        file = (repo_dir / filename).resolve() if repo_dir else None
+        if file is None or repo_dir not in file.parents or not file.is_file():
+            return self._send_error(handler, 404, "Entry not found")
+        size = file.stat().st_size
+        git_oid, sha256 = self._digests(file)
+        lfs = self._is_lfs(file)
+
+        if lfs and self.redirect_lfs and not from_cdn:
+            # Another host name for the same server, so credentials must be dropped
+            handler.send_response(302)
+            handler.send_header("Location", f"http://localhost:{self.port}/cdn/{repo}/resolve/main/{filename}")
+            handler.send_header("X-Repo-Commit", _commit(repo))
+            handler.send_header("X-Linked-Etag", f'"{sha256}"')
+            handler.send_header("X-Linked-Size", str(size))
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        begin, end, status = 0, size - 1, 200
+        match = _RANGE_RE.fullmatch(handler.headers.get("Range", ""))
+        if match:
+            begin = int(match.group(1))
+            if begin >= size:
+                handler.send_response(416)
+                handler.send_header("Content-Range", f"bytes */{size}")
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            status = 206
+        length = end - begin + 1
+
+        handler.send_response(status)
+        handler.send_header("Content-Length", str(length))
+        handler.send_header("Accept-Ranges", "bytes")
+        handler.send_header("X-Repo-Commit", _commit(repo))
+        handler.send_header("ETag", f'"{sha256 if lfs else git_oid}"')
+        if status == 206:
+            handler.send_header("Content-Range", f"bytes {begin}-{end}/{size}")
+        handler.end_headers()
+        if not body:
+            return
+        with open(file, "rb") as f:
+            f.seek(begin)
+            remaining = length
+            while remaining:
+                block = f.read(min(256 * 1024, remaining))
+                if not block:
+                    break
+                handler.wfile.write(block)
+                remaining -= len(block)
+
+    def _digests(self, file: Path) -> Tuple[str, str]:
+        """(git blob id, SHA-256) of a file, cached until it changes"""
+        stat = file.stat()
+        key = (file, stat.st_size, stat.st_mtime)
+        with self._lock:
+            cached = self._hashes.get(key)
+        if cached:
+            return cached
+        git = hashlib.sha1(f"blob {stat.st_size}\0".encode())
+        sha = hashlib.sha256()
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                git.update(block)
+                sha.update(block)
+        digests = (git.hexdigest(), sha.hexdigest())
+        with self._lock:
+            self._hashes[key] = digests
+        return digests
+
+    @staticmethod
+    def _is_lfs(file: Path) -> bool:
+        return file.suffix in _LFS_SUFFIXES or file.stat().st_size >= _LFS_MIN_SIZE
+
+    @staticmethod
+    def _send_json(handler, data, body: bool):
+        if data is None:
+            return FakeHub._send_error(handler, 404, "Repository not found")
+        raw = json.dumps(data).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(raw)))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(raw)
+
+    @staticmethod
+    def _send_error(handler, status: int, message: str):
+        raw = json.dumps({"error": message}).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("X-Error-Message", message)
+        handler.send_header("Content-Length", str(len(raw)))
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(raw)
+
+
+def _commit(repo: str) -> str:
+    """Stable fake commit hash for a repository"""
+    return hashlib.sha1(repo.encode("utf-8")).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", help="Directory holding <org>/<name> repositories")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--redirect-lfs", action="store_true", help="Redirect weight files to another host name")
+    args = parser.parse_args()
+    hub = FakeHub(args.root, port=args.port, redirect_lfs=args.redirect_lfs)
+    print(f"Serving {args.root} as a hub at {hub.url} (set SLM_HF_ENDPOINT to use it)")
+    try:
+        hub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
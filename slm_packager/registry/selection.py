@@ -0,0 +1,259 @@
+"""Hardware-aware choice of a model's quantization variant"""
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional
+
+import psutil
+
+from . import ModelInfo, parse_size
+
+logger = logging.getLogger(__name__)
+
+# Peak resident memory relative to the download size, per model format:
+# quantized files are mmapped as-is plus KV cache and scratch buffers,
+# pytorch checkpoints are materialized by torch next to the file cache.
+_MEMORY_OVERHEAD = {"gguf": 1.2, "onnx": 1.3, "pytorch": 2.0}
+_RUNTIME_BASELINE = 256 * 1024**2
+
+_QUALITY_RANK = {"good": 0, "better": 1, "excellent": 2}
+
+# Instruction set extensions relevant to llama.cpp / onnxruntime kernels,
+# best first
+_ISA_LEVELS = ["avx512f", "avx2", "avx", "neon"]
+
+
+@dataclass
+class HostProfile:
+    """What the selector knows about this machine"""
+    machine: str
+    physical_cores: int
+    total_ram: int
+    available_ram: int
+    cpu_features: FrozenSet[str] = field(default_factory=frozenset)
+
+    @classmethod
+    def detect(cls) -> "HostProfile":
+        memory = psutil.virtual_memory()
+        return cls(
+            machine=platform.machine().lower(),
+            physical_cores=psutil.cpu_count(logical=False) or os.cpu_count() or 1,
+            total_ram=memory.total,
+            available_ram=memory.available,
+            cpu_features=_cpu_features(),
+        )
+
+    @property
+    def isa(self) -> str:
+        for level in _ISA_LEVELS:
+            if level in self.cpu_features:
+                return level
+        return "generic"
+
+    @property
+    def host_class(self) -> str:
+        """
+        Coarse bucket for sharing benchmark results between similar hosts,
+        e.g. 'x86_64-avx2-8c-16g'. RAM is rounded to a power of two.
+        """
+        ram_gb = max(1, round(self.total_ram / 1024**3))
+        bucket = 1 << (ram_gb - 1).bit_length()
+        return f"{self.machine}-{self.isa}-{self.physical_cores}c-{bucket}g"
+
+    def describe(self) -> str:
+        return (
+            f"{self.physical_cores} cores ({self.isa}), "
+            f"{self.available_ram / 1024**3:.1f}GB of {self.total_ram / 1024**3:.1f}GB RAM available"
+        )
+
+
+def benchmark_key(repo: str, variant: str) -> str:
+    """Identifies a catalog variant in the benchmark store"""
+    return f"{repo}:{variant}"
+
+
+class BenchmarkStore:
+    """
+    Benchmark results per host class and catalog variant (see
+    `benchmark_key`), kept in ~/.slm/benchmarks.json so later pulls on
+    similar hosts can use them. Configs not pulled from the catalog are
+    recorded under their model file name.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else Path.home() / ".slm" / "benchmarks.json"
+
+    def _load(self) -> Dict:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable benchmark store {self.path}: {e}")
+            return {}
+
+    def record(self, host_class: str, key: str, metrics: Dict[str, float]):
+        data = self._load()
+        data.setdefault(host_class, {})[key] = {
+            "tokens_per_second": metrics.get("tokens_per_second"),
+            "memory_mb": metrics.get("memory_mb"),
+            "recorded_at": time.time(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, indent=1))
+        os.replace(tmp, self.path)
+
+    def results_for(self, host_class: str) -> Dict[str, Dict[str, float]]:
+        return self._load().get(host_class, {})
+
+
+@dataclass
+class VariantChoice:
+    """Selected variant plus the reasoning shown to the user"""
+    variant: str
+    reasons: List[str]
+    warnings: List[str] = field(default_factory=list)
+
+
+class VariantSelector:
+    """
+    Picks the quantization variant that fits this host.
+
+    Variants whose estimated peak memory exceeds the budget (a fraction of
+    currently available RAM) are ruled out. Among the rest, measured
+    throughput on this host class wins when available; otherwise the
+    highest quality variant is chosen, except on small or older CPUs where
+    the smallest variant is faster.
+    """
+
+    def __init__(
+        self,
+        host: Optional[HostProfile] = None,
+        benchmarks: Optional[BenchmarkStore] = None,
+        memory_fraction: float = 0.8,
+        min_tokens_per_second: float = 5.0,
+    ):
+        self.host = host or HostProfile.detect()
+        self.benchmarks = benchmarks or BenchmarkStore()
+        self.memory_fraction = memory_fraction
+        self.min_tokens_per_second = min_tokens_per_second
+
+    def estimate_memory(self, model: ModelInfo, variant_name: str) -> int:
+        size = parse_size(model.variants[variant_name].size)
+        return int(size * _MEMORY_OVERHEAD.get(model.format, 1.5)) + _RUNTIME_BASELINE
+
+    def choose(self, model: ModelInfo) -> VariantChoice:
+        if not model.variants:
+            raise ValueError(f"❌ {model.name} has no variants in the catalog")
+
+        budget = int(self.host.available_ram * self.memory_fraction)
+        estimates = {name: self.estimate_memory(model, name) for name in model.variants}
+        fitting = [name for name in model.variants if estimates[name] <= budget]
+        reasons = [f"Host: {self.host.describe()}; memory budget {_gb(budget)}"]
+        warnings: List[str] = []
+
+        if not fitting:
+            smallest = min(model.variants, key=estimates.__getitem__)
+            if estimates[smallest] > self.host.total_ram:
+                raise ValueError(
+                    f"❌ No variant of {model.name} fits in this machine's memory\n"
+                    f"   Smallest ({smallest}) needs ~{_gb(estimates[smallest])}, "
+                    f"host has {_gb(self.host.total_ram)} RAM\n"
+                    "💡 Pick a smaller model: slm list --max-size "
+                    f"{max(1, int(self.host.total_ram / 1024**2 / 2))}MB"
+                )
+            warnings.append(
+                f"⚠️  Even {smallest} (~{_gb(estimates[smallest])}) exceeds the budget; "
+                "free memory or expect swapping"
+            )
+            return VariantChoice(smallest, reasons + [f"{smallest} is the smallest variant"], warnings)
+
+        ruled_out = [name for name in model.variants if name not in fitting]
+        if ruled_out:
+            reasons.append(
+                "Too large for the budget: "
+                + ", ".join(f"{name} (~{_gb(estimates[name])})" for name in ruled_out)
+            )
+
+        measured = self._measured(model, fitting)
+        if measured:
+            fast_enough = [name for name in fitting if measured.get(name, 0.0) >= self.min_tokens_per_second]
+            if fast_enough:
+                best = max(fast_enough, key=lambda n: (self._quality(model, n), measured[n]))
+                reasons.append(
+                    f"{best} is the highest quality variant measured at "
+                    f"{measured[best]:.1f} tok/s on {self.host.host_class} "
+                    f"(minimum {self.min_tokens_per_second:g})"
+                )
+            else:
+                best = max(measured, key=measured.__getitem__)
+                reasons.append(
+                    f"No variant reaches {self.min_tokens_per_second:g} tok/s on {self.host.host_class}; "
+                    f"{best} was fastest at {measured[best]:.1f} tok/s"
+                )
+            return VariantChoice(best, reasons, warnings)
+
+        if self._prefers_speed():
+            best = min(fitting, key=estimates.__getitem__)
+            reasons.append(
+                f"{best} is the smallest fitting variant; with {self.host.physical_cores} cores "
+                f"and {self.host.isa} kernels inference is bandwidth bound"
+            )
+        else:
+            best = max(fitting, key=lambda n: (self._quality(model, n), -estimates[n]))
+            reasons.append(f"{best} is the highest quality variant that fits (~{_gb(estimates[best])})")
+        return VariantChoice(best, reasons, warnings)
+
+    def _measured(self, model: ModelInfo, candidates: List[str]) -> Dict[str, float]:
+        """tokens/s recorded for this host class, keyed by variant"""
+        results = self.benchmarks.results_for(self.host.host_class)
+        measured = {}
+        for name in candidates:
+            # Results recorded by file name predate the catalog key
+            entry = results.get(benchmark_key(model.repo, name)) or results.get(Path(model.variants[name].file).name)
+            if entry and entry.get("tokens_per_second"):
+                measured[name] = float(entry["tokens_per_second"])
+        return measured
+
+    def _prefers_speed(self) -> bool:
+        return self.host.physical_cores <= 4 or self.host.isa in ("avx", "generic")
+
+    @staticmethod
+    def _quality(model: ModelInfo, variant_name: str) -> int:
+        return _QUALITY_RANK.get(model.variants[variant_name].quality, 0)
+
+
+def _cpu_features() -> FrozenSet[str]:
+    """Instruction set flags; best effort, empty when unknown"""
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        # Advanced SIMD is mandatory on 64-bit ARM
+        return frozenset({"neon"})
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    if platform.system() == "Darwin":
+        try:
+            out = subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+                capture_output=True, text=True, timeout=5
+            ).stdout
+            # Intel Macs report e.g. AVX1.0 AVX2 AVX512F
+            return frozenset(flag.lower().replace("avx1.0", "avx") for flag in out.split())
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return frozenset()
+
+
+def _gb(nbytes: int) -> str:
+    return f"{nbytes / 1024**3:.1f}GB"
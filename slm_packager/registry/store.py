@@ -0,0 +1,368 @@
+"""Content-addressed store for downloaded model weights"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+_HASH_BLOCK = 8 * 1024 * 1024
+
+
+@dataclass
+class StoredModel:
+    """One installed model as recorded in the index"""
+    name: str
+    path: str
+    format: str
+    config: str
+    source: str = ""
+    size: int = 0
+    files: Dict[str, str] = field(default_factory=dict)  # path relative to model -> sha256
+    added: float = 0.0
+    last_used: float = 0.0
+
+
+@dataclass
+class GCResult:
+    """What a garbage collection run removed (or would remove)"""
+    evicted: List[str]
+    blobs_removed: int
+    bytes_freed: int
+    dry_run: bool = False
+
+
+class ModelStore:
+    """
+    Tracks installed models and the weight blobs they reference.
+
+    Every weight file is hardlinked into `~/.slm/blobs/sha256/<digest>`, so
+    identical files pulled for different configs share one copy on disk.
+    Blobs no model references any more are deleted on removal and by gc.
+    The whole state lives in a single JSON index (`~/.slm/store.json`)
+    holding per-model metadata and per-blob hash, size, source and
+    last-used time, so listing installed models is one file read.
+
+    Linked files are made read-only: a model file and its blob are one
+    inode, so an in-place edit would silently corrupt every model sharing
+    it. Tools that rewrite weights should write a new file and rename it
+    over the old one, which leaves the blob intact.
+
+    Filesystems without hardlinks still get an index; duplicates are then
+    simply not shared.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        self.root = Path(root) if root else Path.home() / ".slm"
+        self.blobs_dir = self.root / "blobs" / "sha256"
+        self.index_path = self.root / "store.json"
+        self._lock = threading.RLock()
+
+    # Index I/O
+
+    def _load(self) -> Dict:
+        try:
+            index = json.loads(self.index_path.read_text())
+            if index.get("version") == INDEX_VERSION:
+                return index
+            logger.warning(f"Ignoring store index with unknown version: {self.index_path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Store index unreadable ({e}); rebuilding from configs")
+        return self._rebuild()
+
+    def _save(self, index: Dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(self.index_path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, indent=1))
+        os.replace(tmp, self.index_path)
+
+    def _rebuild(self) -> Dict:
+        """Index models installed before the store existed from their configs"""
+        from ..config.loader import ConfigLoader
+
+        index = {"version": INDEX_VERSION, "models": {}, "blobs": {}}
+        configs_dir = self.root / "configs"
+        for config_path in sorted(configs_dir.glob("*.yaml")) if configs_dir.exists() else []:
+            try:
+                config = ConfigLoader.load(config_path)
+            except Exception:
+                continue
+            if Path(config.model.path).exists():
+                self._add_to_index(
+                    index,
+                    name=config_path.stem,
+                    path=Path(config.model.path),
+                    format=config.model.format,
+                    config_path=config_path,
+                    source="",
+                )
+        self._save(index)
+        return index
+
+    # Public API
+
+    def add(
+        self,
+        name: str,
+        path: Union[str, Path],
+        format: str,
+        config_path: Union[str, Path],
+        source: str = "",
+        hashes: Optional[Dict[str, str]] = None,
+    ) -> StoredModel:
+        """
+        Record a model (a file or a snapshot directory) and deduplicate its
+        files against the blobs already stored.
+
+        `hashes` maps absolute file paths to known SHA-256 digests (e.g. from
+        a verified download) so those files are not read again.
+        """
+        with self._lock:
+            index = self._load()
+            entry = self._add_to_index(index, name, Path(path), format, Path(config_path), source, hashes)
+            self._save(index)
+            return entry
+
+    def list_models(self) -> List[StoredModel]:
+        """Installed models, most recently used first"""
+        index = self._load()
+        models = [StoredModel(**data) for data in index["models"].values()]
+        return sorted(models, key=lambda m: m.last_used, reverse=True)
+
+    def touch(self, model_path: Union[str, Path]):
+        """Mark the model stored at model_path as just used"""
+        resolved = str(Path(model_path).resolve())
+        with self._lock:
+            index = self._load()
+            now = time.time()
+            for data in index["models"].values():
+                if data["path"] == resolved:
+                    data["last_used"] = now
+                    for digest in data["files"].values():
+                        if digest in index["blobs"]:
+                            index["blobs"][digest]["last_used"] = now
+                    self._save(index)
+                    return
+
+    def remove(self, name: str) -> int:
+        """Delete a model's files and config; returns bytes freed on disk"""
+        with self._lock:
+            index = self._load()
+            data = index["models"].get(name)
+            if data is None:
+                raise ValueError(
+                    f"❌ Model '{name}' is not installed\n"
+                    "💡 See installed models with: slm list --installed"
+                )
+            before = self._unique_size(index, index["models"].values())
+            del index["models"][name]
+            self._delete_model_files(index, data)
+            self._sweep_blobs(index)
+            self._save(index)
+            return before - self._unique_size(index, index["models"].values())
+
+    def gc(
+        self,
+        keep_recent: Optional[int] = None,
+        max_size: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> GCResult:
+        """
+        Evict least recently used models, then delete unreferenced blobs.
+
+        Args:
+            keep_recent: Always keep this many most recently used models;
+                when given without max_size, every other model is evicted
+            max_size: Evict until the deduplicated store fits in this many bytes
+            dry_run: Report what would be removed without deleting anything
+        """
+        with self._lock:
+            index = self._load()
+            # Forget models whose files were deleted by hand
+            for name, data in list(index["models"].items()):
+                if not Path(data["path"]).exists():
+                    logger.info(f"Dropping '{name}' from the store index: {data['path']} is gone")
+                    del index["models"][name]
+            models = sorted(index["models"].values(), key=lambda m: m["last_used"] or m["added"])
+            protected = set()
+            if keep_recent:
+                protected = {m["name"] for m in models[-keep_recent:]}
+            candidates = [m for m in models if m["name"] not in protected]
+
+            evict = []
+            if max_size is None:
+                if keep_recent is not None:
+                    evict = candidates
+            else:
+                remaining = {m["name"]: m for m in models}
+                for data in candidates:
+                    if self._unique_size(index, remaining.values()) <= max_size:
+                        break
+                    evict.append(data)
+                    del remaining[data["name"]]
+
+            if dry_run:
+                kept = [m for m in models if m not in evict]
+                freed = self._unique_size(index, models) - self._unique_size(index, kept)
+                orphans = self._orphan_blobs(index, kept)
+                return GCResult([m["name"] for m in evict], len(orphans), freed, dry_run=True)
+
+            before = self._unique_size(index, models)
+            for data in evict:
+                del index["models"][data["name"]]
+                self._delete_model_files(index, data)
+            removed = self._sweep_blobs(index)
+            self._save(index)
+            freed = before - self._unique_size(index, index["models"].values())
+            return GCResult([m["name"] for m in evict], removed, freed)
+
+    def total_size(self) -> int:
+        """Bytes on disk used by installed models, counting shared blobs once"""
+        index = self._load()
+        return self._unique_size(index, index["models"].values())
+
+    # Internals
+
+    def _add_to_index(
+        self,
+        index: Dict,
+        name: str,
+        path: Path,
+        format: str,
+        config_path: Path,
+        source: str,
+        hashes: Optional[Dict[str, str]] = None,
+    ) -> StoredModel:
+        path = path.resolve()
+        files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file() and not _is_metadata(path, p))
+        now = time.time()
+        previous = index["models"].get(name, {})
+        digests = {}
+        size = 0
+        for file in files:
+            digest = (hashes or {}).get(str(file)) or self._known_digest(index, previous, path, file) or _sha256(file)
+            self._link_blob(file, digest)
+            stat = file.stat()
+            blob = index["blobs"].setdefault(digest, {"size": stat.st_size, "source": source, "added": now})
+            blob["last_used"] = now
+            digests[str(file.relative_to(path)) if file != path else file.name] = digest
+            size += stat.st_size
+
+        entry = StoredModel(
+            name=name,
+            path=str(path),
+            format=format,
+            config=str(Path(config_path).resolve()),
+            source=source,
+            size=size,
+            files=digests,
+            added=previous.get("added", now),
+            last_used=now,
+        )
+        index["models"][name] = asdict(entry)
+        return entry
+
+    def _known_digest(self, index: Dict, previous: Dict, root: Path, file: Path) -> Optional[str]:
+        """Reuse a digest already recorded for this exact file"""
+        rel = str(file.relative_to(root)) if file != root else file.name
+        digest = previous.get("files", {}).get(rel)
+        if digest and digest in index["blobs"] and _same_inode(file, self.blobs_dir / digest):
+            return digest
+        return None
+
+    def _link_blob(self, file: Path, digest: str):
+        """Make file and its blob the same read-only inode, keeping an existing blob"""
+        blob = self.blobs_dir / digest
+        try:
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+            if not blob.exists():
+                os.link(file, blob)
+            elif not _same_inode(file, blob):
+                # Duplicate content: point this file at the stored copy
+                tmp = file.with_name(file.name + ".slm-link")
+                os.link(blob, tmp)
+                os.replace(tmp, file)
+                logger.info(f"Deduplicated {file} against blob {digest[:12]}")
+            _make_read_only(blob)
+        except OSError as e:
+            logger.debug(f"Hardlinks unavailable for {file}: {e}")
+
+    def _delete_model_files(self, index: Dict, data: Dict):
+        """Delete a model that was already dropped from the index"""
+        Path(data["config"]).unlink(missing_ok=True)
+        path = Path(data["path"])
+        if any(m["path"] == data["path"] for m in index["models"].values()):
+            # Another config still points at the same weights
+            return
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+            # Drop the per-repo directory once it is empty
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+
+    def _orphan_blobs(self, index: Dict, kept) -> List[str]:
+        referenced = {d for m in kept for d in m["files"].values()}
+        return [digest for digest in index["blobs"] if digest not in referenced]
+
+    def _sweep_blobs(self, index: Dict) -> int:
+        """Delete blobs no installed model references any more"""
+        orphans = self._orphan_blobs(index, index["models"].values())
+        for digest in orphans:
+            (self.blobs_dir / digest).unlink(missing_ok=True)
+            del index["blobs"][digest]
+        return len(orphans)
+
+    @staticmethod
+    def _unique_size(index: Dict, models) -> int:
+        digests = {d for m in models for d in m["files"].values()}
+        return sum(index["blobs"][d]["size"] for d in digests if d in index["blobs"])
+
+
+def mark_used(model_path: Union[str, Path]):
+    """Best-effort last-used update; never fails the caller"""
+    try:
+        ModelStore().touch(model_path)
+    except Exception as e:
+        logger.debug(f"Could not update last-used time for {model_path}: {e}")
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _same_inode(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _make_read_only(path: Path):
+    mode = stat.S_IMODE(path.stat().st_mode)
+    if mode & 0o222:
+        os.chmod(path, mode & ~0o222)
+
+
+def _is_metadata(root: Path, file: Path) -> bool:
+    """Skip download bookkeeping and hub cache files inside snapshot dirs"""
+    parts = file.relative_to(root).parts
+    return parts[0] == ".cache" or file.name.endswith((".part", ".part.json", ".slm-link"))
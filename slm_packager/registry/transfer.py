@@ -0,0 +1,424 @@
+"""Parallel HTTP range-request downloads with streaming SHA-256 verification"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_SIZE = 1 << 20
+
+ProgressCallback = Callable[[int], None]
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a completed download"""
+    path: Path
+    size: int
+    sha256: str
+    elapsed_sec: float
+    connections: int
+    resumed_bytes: int = 0
+
+    @property
+    def mb_per_second(self) -> float:
+        fetched = self.size - self.resumed_bytes
+        return fetched / 1024 / 1024 / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+class _SameHostAuthRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follows redirects, dropping Authorization once the host changes"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        new = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if new is not None and urlparse(newurl).netloc != urlparse(req.full_url).netloc:
+            new.remove_header("Authorization")
+        return new
+
+
+# urllib's default handler copies every header, tokens included, to the redirect target
+_opener = urllib.request.build_opener(_SameHostAuthRedirectHandler)
+
+
+def _urlopen(req: urllib.request.Request, timeout: float):
+    return _opener.open(req, timeout=timeout)
+
+
+class ChecksumMismatchError(ValueError):
+    """Downloaded bytes do not match the expected SHA-256"""
+
+
+class ConsoleProgress:
+    """Single-line byte progress display, throttled to a few updates per second"""
+
+    def __init__(self, total: int = 0, label: str = "Downloaded", interval: float = 0.25):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self._start = time.perf_counter()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add_total(self, nbytes: int):
+        """Grow the expected total when another file joins the display"""
+        with self._lock:
+            self.total += nbytes
+
+    def __call__(self, nbytes: int):
+        with self._lock:
+            self.done += nbytes
+            now = time.perf_counter()
+            if now - self._last < self.interval and self.done < self.total:
+                return
+            self._last = now
+            self._render(now)
+
+    def _render(self, now: float):
+        mb_done = self.done / (1024 * 1024)
+        rate = mb_done / max(now - self._start, 1e-6)
+        if self.total:
+            mb_total = self.total / (1024 * 1024)
+            percent = min(100.0, self.done * 100 / self.total)
+            line = f"   {self.label}: {mb_done:.1f}MB / {mb_total:.1f}MB ({percent:.1f}%) {rate:.1f}MB/s"
+        else:
+            line = f"   {self.label}: {mb_done:.1f}MB {rate:.1f}MB/s"
+        print(line, end="\r", file=sys.stdout, flush=True)
+
+    def finish(self):
+        with self._lock:
+            self._render(time.perf_counter())
+        print()
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by any number of download threads.
+
+    `acquire(nbytes)` blocks until the aggregate rate stays within
+    `mb_per_second`; after an idle period up to one second of unused
+    budget can be spent in a burst.
+    """
+
+    def __init__(self, mb_per_second: float):
+        if mb_per_second <= 0:
+            raise ValueError(f"Bandwidth limit must be positive (got {mb_per_second})")
+        self.rate = mb_per_second * 1024 * 1024
+        self.capacity = max(self.rate, _BLOCK_SIZE)
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes: int):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve immediately; a negative balance makes later callers
+            # wait their turn as well
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RangeDownloader:
+    """
+    Downloads a file over several concurrent HTTP range requests.
+
+    The destination is preallocated as `<dest>.part` and filled chunk by
+    chunk; completed chunks are recorded in `<dest>.part.json`, so an
+    interrupted download resumes from the chunks it already has. A
+    hashing thread follows the download in file order and computes the
+    SHA-256 while bytes are still arriving. Servers without range support
+    fall back to a single stream.
+    """
+
+    def __init__(
+        self,
+        connections: int = 8,
+        chunk_size: int = 16 * 1024 * 1024,
+        headers: Optional[Dict[str, str]] = None,
+        progress: Optional[ProgressCallback] = None,
+        limiter=None,
+        timeout: float = 60.0,
+        retries: int = 3,
+        slots: Optional[threading.Semaphore] = None,
+    ):
+        self.connections = max(1, connections)
+        self.chunk_size = max(_BLOCK_SIZE, chunk_size)
+        self.headers = dict(headers or {})
+        self.progress = progress
+        # Optional shared bandwidth budget with an acquire(nbytes) method
+        self.limiter = limiter
+        self.timeout = timeout
+        self.retries = retries
+        # Optional semaphore shared by downloaders to cap open connections in total
+        self.slots = slots
+
+    def download(
+        self,
+        url: str,
+        dest: Union[str, Path],
+        expected_sha256: Optional[str] = None,
+        size: Optional[int] = None,
+    ) -> DownloadResult:
+        """
+        Download url to dest, verifying expected_sha256 when given.
+
+        A known `size` of at most one chunk skips the range probe: the
+        file is fetched with a single GET.
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+
+        if size is not None and (size <= self.chunk_size or self.connections == 1):
+            final_url, ranges = url, False
+        else:
+            final_url, size, ranges = self._probe(url)
+        headers = self._headers_for(url, final_url)
+
+        if ranges and size > self.chunk_size and self.connections > 1:
+            sha, resumed = self._download_ranges(final_url, headers, dest, size)
+            connections = self.connections
+        else:
+            sha = self._download_stream(final_url, headers, dest)
+            resumed, connections = 0, 1
+
+        part = _part_path(dest)
+        if expected_sha256 and sha != expected_sha256.lower():
+            part.unlink(missing_ok=True)
+            _state_path(dest).unlink(missing_ok=True)
+            raise ChecksumMismatchError(
+                f"❌ Checksum mismatch for {dest.name}\n"
+                f"   Expected: {expected_sha256}\n"
+                f"   Got:      {sha}\n"
+                "💡 The partial file was removed; run the command again to re-download"
+            )
+
+        os.replace(part, dest)
+        _state_path(dest).unlink(missing_ok=True)
+        return DownloadResult(
+            path=dest,
+            size=dest.stat().st_size,
+            sha256=sha,
+            elapsed_sec=time.perf_counter() - start,
+            connections=connections,
+            resumed_bytes=resumed,
+        )
+
+    def _probe(self, url: str):
+        """Resolve redirects and learn the size and range support"""
+        req = urllib.request.Request(url, headers={**self.headers, "Range": "bytes=0-0"})
+        with self._slot():
+            try:
+                resp = _urlopen(req, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                if e.code == 416:
+                    # No byte 0 to return: the file is empty
+                    e.close()
+                    return e.geturl(), 0, False
+                raise
+            with resp:
+                final_url = resp.geturl()
+                content_range = resp.headers.get("Content-Range", "")
+                if resp.status == 206 and "/" in content_range:
+                    total = content_range.rsplit("/", 1)[1]
+                    if total.isdigit():
+                        return final_url, int(total), True
+                return final_url, int(resp.headers.get("Content-Length") or 0), False
+
+    def _slot(self):
+        return self.slots if self.slots is not None else nullcontext()
+
+    def _headers_for(self, url: str, final_url: str) -> Dict[str, str]:
+        """Don't forward credentials to a different host after a redirect"""
+        if urlparse(url).netloc == urlparse(final_url).netloc:
+            return dict(self.headers)
+        return {k: v for k, v in self.headers.items() if k.lower() != "authorization"}
+
+    def _read_blocks(self, resp, on_block: Callable[[bytes], None], abort: Optional[threading.Event] = None):
+        while True:
+            if abort is not None and abort.is_set():
+                raise InterruptedError("download aborted")
+            if self.limiter is not None:
+                self.limiter.acquire(_BLOCK_SIZE)
+            block = resp.read(_BLOCK_SIZE)
+            if not block:
+                return
+            on_block(block)
+            if self.progress:
+                self.progress(len(block))
+
+    def _download_stream(self, url: str, headers: Dict[str, str], dest: Path) -> str:
+        digest = hashlib.sha256()
+        part = _part_path(dest)
+        req = urllib.request.Request(url, headers=headers)
+        with self._slot(), _urlopen(req, timeout=self.timeout) as resp, open(part, "wb") as f:
+            def on_block(block: bytes):
+                f.write(block)
+                digest.update(block)
+            self._read_blocks(resp, on_block)
+        return digest.hexdigest()
+
+    def _download_ranges(self, url: str, headers: Dict[str, str], dest: Path, size: int):
+        part = _part_path(dest)
+        num_chunks = (size + self.chunk_size - 1) // self.chunk_size
+        done = self._load_state(dest, size)
+        if not done or not part.exists() or part.stat().st_size != size:
+            done = set()
+            _preallocate(part, size)
+
+        resumed = sum(self._chunk_len(i, size) for i in done)
+        if resumed:
+            logger.info(f"Resuming {dest.name}: {len(done)}/{num_chunks} chunks already present")
+            if self.progress:
+                self.progress(resumed)
+
+        lock = threading.Condition()
+        pending: List[int] = [i for i in range(num_chunks) if i not in done]
+        abort = threading.Event()
+        errors: List[BaseException] = []
+
+        def fetch(index: int):
+            begin = index * self.chunk_size
+            end = begin + self._chunk_len(index, size) - 1
+            for attempt in range(self.retries + 1):
+                written = 0
+                try:
+                    req = urllib.request.Request(url, headers={**headers, "Range": f"bytes={begin}-{end}"})
+                    with self._slot(), _urlopen(req, timeout=self.timeout) as resp, open(part, "r+b") as f:
+                        if resp.status != 206:
+                            raise IOError(f"server ignored range request (HTTP {resp.status})")
+                        f.seek(begin)
+
+                        def on_block(block: bytes):
+                            nonlocal written
+                            f.write(block)
+                            written += len(block)
+                        self._read_blocks(resp, on_block, abort)
+                    if written != end - begin + 1:
+                        raise IOError(f"chunk {index} truncated ({written} of {end - begin + 1} bytes)")
+                    return
+                except InterruptedError:
+                    raise
+                except Exception as e:
+                    # Bytes of a failed attempt are fetched again
+                    if self.progress and written:
+                        self.progress(-written)
+                    if attempt == self.retries:
+                        raise
+                    logger.debug(f"Chunk {index} attempt {attempt + 1} failed: {e}")
+                    time.sleep(min(2 ** attempt, 10))
+
+        def worker():
+            while not abort.is_set():
+                with lock:
+                    if not pending:
+                        return
+                    index = pending.pop(0)
+                try:
+                    fetch(index)
+                except BaseException as e:
+                    with lock:
+                        errors.append(e)
+                    abort.set()
+                    with lock:
+                        lock.notify_all()
+                    return
+                with lock:
+                    done.add(index)
+                    self._save_state(dest, size, done)
+                    lock.notify_all()
+
+        digest = hashlib.sha256()
+
+        def hasher():
+            # Follows the download in file order, re-reading finished chunks
+            # while they are still in the page cache
+            with open(part, "rb") as f:
+                for index in range(num_chunks):
+                    with lock:
+                        while index not in done and not abort.is_set():
+                            lock.wait(0.5)
+                        if index not in done:
+                            return
+                    f.seek(index * self.chunk_size)
+                    remaining = self._chunk_len(index, size)
+                    while remaining:
+                        block = f.read(min(_BLOCK_SIZE, remaining))
+                        digest.update(block)
+                        remaining -= len(block)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(self.connections, max(1, len(pending))))]
+        hash_thread = threading.Thread(target=hasher, daemon=True)
+        for t in threads:
+            t.start()
+        hash_thread.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+            hash_thread.join()
+        except KeyboardInterrupt:
+            abort.set()
+            raise
+
+        if errors:
+            raise RuntimeError(
+                f"❌ Download failed: {errors[0]}\n"
+                f"   {len(done)}/{num_chunks} chunks saved\n"
+                "💡 Run the command again to resume from the saved chunks"
+            ) from errors[0]
+
+        return digest.hexdigest(), resumed
+
+    def _chunk_len(self, index: int, size: int) -> int:
+        return min(self.chunk_size, size - index * self.chunk_size)
+
+    def _load_state(self, dest: Path, size: int) -> set:
+        try:
+            state = json.loads(_state_path(dest).read_text())
+        except (OSError, ValueError):
+            return set()
+        if state.get("size") != size or state.get("chunk_size") != self.chunk_size:
+            return set()
+        return set(state.get("done", []))
+
+    def _save_state(self, dest: Path, size: int, done: set):
+        state = {"size": size, "chunk_size": self.chunk_size, "done": sorted(done)}
+        tmp = _state_path(dest).with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, _state_path(dest))
+
+
+def _part_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part")
+
+
+def _state_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part.json")
+
+
+def _preallocate(path: Path, size: int):
+    """Create a file of the final size so chunks can be written in place"""
+    with open(path, "wb") as f:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
@@ -0,0 +1,118 @@
+"""LRU cache of LoRA adapters loaded on one resident base model"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from ..config.models import LoraOptions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadedAdapter:
+    """An adapter resident on the base model"""
+    name: str
+    path: str
+    handle: Any
+    size_bytes: int
+    load_sec: float
+    uses: int = 0
+    last_used: float = 0.0
+
+
+class AdapterCache:
+    """
+    Loads adapters by name on first use and keeps at most
+    `options.max_loaded` of them, evicting the least recently used.
+
+    The runtime supplies `load(name, path) -> handle` and
+    `unload(name, handle)`. A new adapter is loaded before the LRU one is
+    evicted, so the base model never runs with zero adapters mid-swap.
+    """
+
+    def __init__(self, options: LoraOptions, load: Callable[[str, str], Any], unload: Callable[[str, Any], None]):
+        self.options = options
+        self._load = load
+        self._unload = unload
+        self._loaded: "OrderedDict[str, LoadedAdapter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self.options.adapters)
+
+    def get(self, name: str) -> LoadedAdapter:
+        with self._lock:
+            adapter = self._loaded.get(name)
+            if adapter is not None:
+                self.hits += 1
+                self._loaded.move_to_end(name)
+            else:
+                self.misses += 1
+                adapter = self._load_new(name)
+            adapter.uses += 1
+            adapter.last_used = time.time()
+            return adapter
+
+    def _load_new(self, name: str) -> LoadedAdapter:
+        if name not in self.options.adapters:
+            raise ValueError(
+                f"❌ Unknown adapter: '{name}'\n"
+                f"💡 Configured adapters: {', '.join(self.names) or 'none (add them under runtime.lora.adapters)'}"
+            )
+        path = Path(self.options.adapters[name]).expanduser()
+        if not path.exists():
+            raise FileNotFoundError(
+                f"❌ Adapter '{name}' not found at '{path}'\n"
+                "💡 Check runtime.lora.adapters in your config"
+            )
+        start = time.perf_counter()
+        handle = self._load(name, str(path))
+        adapter = LoadedAdapter(
+            name=name,
+            path=str(path),
+            handle=handle,
+            size_bytes=_size(path),
+            load_sec=time.perf_counter() - start,
+        )
+        self._loaded[name] = adapter
+        logger.info(f"Loaded adapter '{name}' in {adapter.load_sec:.2f}s ({adapter.size_bytes / 1024**2:.1f}MB)")
+        while len(self._loaded) > self.options.max_loaded:
+            old_name, old = self._loaded.popitem(last=False)
+            self._unload(old_name, old.handle)
+            self.evictions += 1
+            logger.info(f"Evicted adapter '{old_name}'")
+        return adapter
+
+    def clear(self):
+        with self._lock:
+            while self._loaded:
+                name, adapter = self._loaded.popitem(last=False)
+                self._unload(name, adapter.handle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "configured": len(self.options.adapters),
+                "max_loaded": self.options.max_loaded,
+                "loaded": [
+                    {"name": a.name, "size_mb": a.size_bytes / 1024**2, "load_sec": a.load_sec, "uses": a.uses}
+                    for a in reversed(self._loaded.values())
+                ],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
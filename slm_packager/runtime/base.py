@@ -1,11 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Iterator, Union, Dict, Any
+from typing import Iterator, Union, Dict, Any, List, Optional
 from ..config.models import SLMConfig, GenerationParams
+from .cpu import CpuPlacement, resolve_placement, apply_placement
 
 class BaseRuntime(ABC):
     def __init__(self, config: SLMConfig):
         self.config = config
         self.model = None
+        self._placement = None
 
     @abstractmethod
     def load(self):
@@ -22,6 +24,93 @@ class BaseRuntime(ABC):
         """Unload the model and free resources."""
         pass
 
+    def tokenize(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        """Convert text to token ids using the loaded model's tokenizer."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support tokenization"
+        )
+
+    def tokenize_batch(self, texts: List[str], add_special_tokens: bool = True) -> List[List[int]]:
+        """Tokenize several texts; backends with batch tokenizers override this."""
+        return [self.tokenize(text, add_special_tokens=add_special_tokens) for text in texts]
+
+    def detokenize(self, tokens: List[int]) -> str:
+        """Convert token ids back to text."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support detokenization"
+        )
+
+    def detokenize_batch(self, sequences: List[List[int]]) -> List[str]:
+        """Detokenize several token sequences."""
+        return [self.detokenize(tokens) for tokens in sequences]
+
+    @property
+    def vocab_size(self) -> Optional[int]:
+        """Number of token ids the loaded tokenizer knows (None if unknown)"""
+        return None
+
+    def _check_token_ids(self, sequences: List[List[int]]):
+        """Reject ids outside the vocabulary before they reach native decoding code"""
+        size = self.vocab_size
+        if size is None:
+            return
+        for tokens in sequences:
+            for token in tokens:
+                if not 0 <= token < size:
+                    raise ValueError(f"Token id {token} is outside the vocabulary [0, {size})")
+
+    def count_tokens(self, text: str, add_special_tokens: bool = True) -> int:
+        """
+        Count tokens in text.
+
+        Falls back to a rough 4-characters-per-token estimate when the
+        runtime has no tokenizer available.
+        """
+        if self.is_loaded:
+            try:
+                return len(self.tokenize(text, add_special_tokens=add_special_tokens))
+            except NotImplementedError:
+                pass
+        return max(1, len(text) // 4) if text else 0
+
+    def score_tokens(self, sequences: List[List[int]]) -> List[List[float]]:
+        """
+        Compute token log-likelihoods for a batch of token sequences.
+
+        For each sequence of n tokens, returns n - 1 natural-log
+        probabilities: log p(token[i] | token[:i]) for i in 1..n-1.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support token scoring"
+        )
+
+    @property
+    def cpu_placement(self) -> CpuPlacement:
+        """Threads and CPU affinity resolved from the runtime config"""
+        if self._placement is None:
+            self._placement = resolve_placement(self.config.runtime)
+        return self._placement
+
+    def _apply_cpu_placement(self) -> CpuPlacement:
+        """Pin the process and size thread pools; call at the start of load()"""
+        placement = self.cpu_placement
+        apply_placement(placement)
+        return placement
+
+    @property
+    def max_concurrency(self) -> int:
+        """Requests that may call generate() at the same time"""
+        return 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime load and utilization counters (empty if not tracked)"""
+        return {}
+
+    @property
+    def context_length(self) -> int:
+        """Maximum number of tokens the loaded model can attend to"""
+        return self.config.runtime.context_size
+
     @property
     def is_loaded(self) -> bool:
         return self.model is not None
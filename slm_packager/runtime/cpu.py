@@ -0,0 +1,196 @@
+"""CPU topology detection and thread / core placement shared by all runtimes"""
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import psutil
+
+from ..config.models import RuntimeConfig
+
+logger = logging.getLogger(__name__)
+
+_SYSFS_CPU = Path("/sys/devices/system/cpu")
+_SYSFS_NODE = Path("/sys/devices/system/node")
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """Parse Linux cpulist syntax such as '0-3,8,10-11'"""
+    cpus: Set[int] = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+@dataclass
+class CpuTopology:
+    """Logical CPUs grouped by physical core and NUMA node"""
+    # logical cpu -> (package, core) identifying its physical core
+    cores: Dict[int, tuple]
+    # NUMA node -> logical cpus
+    nodes: Dict[int, List[int]]
+
+    @classmethod
+    def detect(cls) -> "CpuTopology":
+        logical = _available_cpus()
+        cores = {}
+        for cpu in logical:
+            topology = _SYSFS_CPU / f"cpu{cpu}" / "topology"
+            try:
+                package = int((topology / "physical_package_id").read_text())
+                core = int((topology / "core_id").read_text())
+                cores[cpu] = (package, core)
+            except (OSError, ValueError):
+                cores[cpu] = None
+
+        if any(v is None for v in cores.values()):
+            # No sysfs (macOS, containers): assume SMT siblings are spread
+            # evenly, as psutil's physical count suggests
+            physical = psutil.cpu_count(logical=False) or len(logical)
+            per_core = max(1, len(logical) // physical)
+            cores = {cpu: (0, i // per_core) for i, cpu in enumerate(logical)}
+
+        nodes = {}
+        for node_dir in sorted(_SYSFS_NODE.glob("node[0-9]*")) if _SYSFS_NODE.exists() else []:
+            try:
+                nodes[int(node_dir.name[4:])] = parse_cpu_list((node_dir / "cpulist").read_text().strip())
+            except (OSError, ValueError):
+                continue
+        if not nodes:
+            nodes = {0: list(logical)}
+        return cls(cores=cores, nodes=nodes)
+
+    @property
+    def logical_cpus(self) -> List[int]:
+        return sorted(self.cores)
+
+    def physical_cores(self, cpus: Optional[List[int]] = None) -> int:
+        """Number of distinct physical cores among cpus (default: all)"""
+        cpus = self.logical_cpus if cpus is None else cpus
+        return len({self.cores[c] for c in cpus if c in self.cores}) or len(cpus)
+
+    def one_per_core(self, cpus: List[int]) -> List[int]:
+        """First logical cpu of every physical core, in cpu order"""
+        seen, picked = set(), []
+        for cpu in sorted(cpus):
+            core = self.cores.get(cpu)
+            if core not in seen:
+                seen.add(core)
+                picked.append(cpu)
+        return picked
+
+
+@dataclass
+class CpuPlacement:
+    """Resolved threads and CPU affinity for one runtime"""
+    threads: int
+    inter_op_threads: int
+    cpus: Optional[List[int]] = None
+
+    def describe(self) -> str:
+        where = f" on cpus {_format_cpu_list(self.cpus)}" if self.cpus else ""
+        return f"{self.threads} threads ({self.inter_op_threads} inter-op){where}"
+
+
+def resolve_placement(runtime: RuntimeConfig, topology: Optional[CpuTopology] = None) -> CpuPlacement:
+    """
+    Turn `threads`, `cpu.cpu_set` and `cpu.numa_node` into concrete values.
+
+    `threads: auto` uses one thread per physical core in the allowed set:
+    llama.cpp and ONNX kernels are memory-bandwidth bound, so SMT siblings
+    add contention rather than throughput.
+    """
+    topology = topology or CpuTopology.detect()
+    options = runtime.cpu
+    allowed = topology.logical_cpus
+    restricted = False
+
+    if options.numa_node is not None:
+        if options.numa_node not in topology.nodes:
+            raise ValueError(
+                f"❌ NUMA node {options.numa_node} not found\n"
+                f"💡 Available nodes: {', '.join(str(n) for n in sorted(topology.nodes))}"
+            )
+        allowed = [c for c in allowed if c in set(topology.nodes[options.numa_node])]
+        restricted = True
+    if options.cpu_set:
+        requested = parse_cpu_list(options.cpu_set)
+        allowed = [c for c in allowed if c in set(requested)]
+        restricted = True
+    if not allowed:
+        raise ValueError(
+            f"❌ No usable CPUs for cpu_set '{options.cpu_set}' / numa_node {options.numa_node}\n"
+            f"💡 This process may use cpus {_format_cpu_list(topology.logical_cpus)}"
+        )
+
+    physical = topology.physical_cores(allowed)
+    if runtime.threads == "auto":
+        threads = physical
+    else:
+        threads = runtime.threads
+        if threads > len(allowed):
+            logger.warning(
+                f"threads={threads} exceeds the {len(allowed)} logical CPUs available; "
+                "threads will time-share cores"
+            )
+    if restricted and runtime.threads == "auto":
+        # Keep SMT siblings free for other processes on the same cores
+        allowed = topology.one_per_core(allowed)
+    # Decoding is sequential; extra inter-op threads only oversubscribe
+    inter_op = options.inter_op_threads or 1
+    return CpuPlacement(threads=threads, inter_op_threads=inter_op, cpus=allowed if restricted else None)
+
+
+def apply_placement(placement: CpuPlacement):
+    """
+    Pin this process to the placement's CPUs (Linux) and size torch's
+    thread pools if torch is already imported.
+
+    Affinity is process-wide, so run one runtime per process when pinning
+    different models to different cores. Memory follows the pinned node
+    through first-touch allocation.
+    """
+    if placement.cpus is not None:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, placement.cpus)
+        else:
+            logger.warning("CPU pinning is not supported on this platform; ignoring cpu_set/numa_node")
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(placement.threads)
+        try:
+            torch.set_num_interop_threads(placement.inter_op_threads)
+        except RuntimeError:
+            # Only settable before torch starts any inter-op work
+            logger.debug("torch inter-op threads already initialized; keeping the current pool")
+    logger.info(f"CPU placement: {placement.describe()}")
+
+
+def _available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _format_cpu_list(cpus: List[int]) -> str:
+    ranges, start, prev = [], None, None
+    for cpu in sorted(cpus):
+        if start is None:
+            start = prev = cpu
+        elif cpu == prev + 1:
+            prev = cpu
+        else:
+            ranges.append(f"{start}-{prev}" if start != prev else str(start))
+            start = prev = cpu
+    if start is not None:
+        ranges.append(f"{start}-{prev}" if start != prev else str(start))
+    return ",".join(ranges)
@@ -0,0 +1,142 @@
+"""Minimal reader for GGUF file metadata"""
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+GGUF_MAGIC = b"GGUF"
+
+# Metadata value types from the GGUF specification
+_SCALARS = {
+    0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i",
+    6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d",
+}
+_STRING = 8
+_ARRAY = 9
+
+
+class GGUFMetadata:
+    """
+    Key/value metadata from a GGUF header.
+
+    Only the header is read; tensor data is never touched. Arrays (such as
+    the tokenizer vocabulary) are skipped and only their length is kept.
+    """
+
+    def __init__(self, values: Dict[str, Any], version: int, tensor_count: int):
+        self.values = values
+        self.version = version
+        self.tensor_count = tensor_count
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
+    @property
+    def architecture(self) -> Optional[str]:
+        return self.values.get("general.architecture")
+
+    def arch_value(self, suffix: str, default: Any = None) -> Any:
+        """Architecture-scoped key, e.g. arch_value('context_length')"""
+        return self.values.get(f"{self.architecture}.{suffix}", default)
+
+    @property
+    def context_length(self) -> Optional[int]:
+        return self.arch_value("context_length")
+
+    @property
+    def num_layers(self) -> Optional[int]:
+        return self.arch_value("block_count")
+
+    @property
+    def num_heads(self) -> Optional[int]:
+        return self.arch_value("attention.head_count")
+
+    @property
+    def num_kv_heads(self) -> Optional[int]:
+        return self.arch_value("attention.head_count_kv", self.num_heads)
+
+    @property
+    def head_dim(self) -> Optional[int]:
+        explicit = self.arch_value("attention.key_length")
+        if explicit:
+            return explicit
+        embedding = self.arch_value("embedding_length")
+        if embedding and self.num_heads:
+            return embedding // self.num_heads
+        return None
+
+
+def read_metadata(path: Union[str, Path]) -> GGUFMetadata:
+    """Parse the metadata section of a GGUF file"""
+    with open(path, "rb") as f:
+        if f.read(4) != GGUF_MAGIC:
+            raise ValueError(f"Not a GGUF file: '{path}'")
+        (version,) = struct.unpack("<I", f.read(4))
+        if version == 1:
+            # v1 used 32-bit counts and lengths
+            count_fmt = "<I"
+        elif version in (2, 3):
+            count_fmt = "<Q"
+        else:
+            raise ValueError(f"Unsupported GGUF version {version}: '{path}'")
+        reader = _Reader(f, count_fmt)
+        tensor_count = reader.count()
+        kv_count = reader.count()
+        values = {}
+        for _ in range(kv_count):
+            key = reader.string()
+            (value_type,) = struct.unpack("<I", f.read(4))
+            values[key] = reader.value(value_type)
+        return GGUFMetadata(values, version, tensor_count)
+
+
+class _Reader:
+    def __init__(self, f, count_fmt: str):
+        self.f = f
+        self.count_fmt = count_fmt
+        self.count_size = struct.calcsize(count_fmt)
+
+    def count(self) -> int:
+        return struct.unpack(self.count_fmt, self.f.read(self.count_size))[0]
+
+    def string(self) -> str:
+        return self.f.read(self.count()).decode("utf-8", errors="replace")
+
+    def value(self, value_type: int) -> Any:
+        if value_type in _SCALARS:
+            fmt = _SCALARS[value_type]
+            return struct.unpack(fmt, self.f.read(struct.calcsize(fmt)))[0]
+        if value_type == _STRING:
+            return self.string()
+        if value_type == _ARRAY:
+            (item_type,) = struct.unpack("<I", self.f.read(4))
+            length = self.count()
+            self._skip_array(item_type, length)
+            return _ArrayInfo(item_type, length)
+        raise ValueError(f"Unknown GGUF metadata type {value_type}")
+
+    def _skip_array(self, item_type: int, length: int):
+        if item_type in _SCALARS:
+            self.f.seek(struct.calcsize(_SCALARS[item_type]) * length, 1)
+        elif item_type == _STRING:
+            for _ in range(length):
+                self.f.seek(self.count(), 1)
+        elif item_type == _ARRAY:
+            for _ in range(length):
+                (inner,) = struct.unpack("<I", self.f.read(4))
+                self._skip_array(inner, self.count())
+        else:
+            raise ValueError(f"Unknown GGUF array item type {item_type}")
+
+
+class _ArrayInfo:
+    """Placeholder for a skipped array value"""
+
+    def __init__(self, item_type: int, length: int):
+        self.item_type = item_type
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __repr__(self) -> str:
+        return f"<array of {self.length}>"
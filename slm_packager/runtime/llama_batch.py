@@ -0,0 +1,362 @@
+"""Multi-slot batched decoding for llama.cpp"""
+import codecs
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import llama_cpp
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+
+from ..config.models import GenerationParams, LlamaCppOptions
+from .llama_tuning import GGML_TYPES
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class _Request:
+    tokens: List[int]
+    params: GenerationParams
+    output: "queue.Queue" = field(default_factory=queue.Queue)
+    cancelled: bool = False
+    # The submitting thread's profiler; the engine thread records into it
+    profiler: Optional[profiling.Profiler] = None
+
+
+@dataclass
+class _Slot:
+    """One sequence in the shared context; its KV cells are tagged with seq id `index`"""
+    index: int
+    request: Optional[_Request] = None
+    pending: List[int] = field(default_factory=list)
+    n_past: int = 0
+    generated: int = 0
+    held: str = ""
+    decoder: Any = None
+    rng: Any = None
+
+    def start(self, request: _Request):
+        self.request = request
+        self.pending = list(request.tokens)
+        self.n_past = 0
+        self.generated = 0
+        self.held = ""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.rng = np.random.default_rng()
+
+
+class BatchedEngine:
+    """
+    Serves many sequences from one llama.cpp context.
+
+    Each of `slots` sequences owns `context_size` tokens of a shared KV
+    cache (slots × context_size cells, told apart by sequence id). A
+    background thread admits waiting requests into free slots, then on
+    every step submits one llama_decode batch holding the next token of
+    each decoding slot plus as much pending prompt as n_batch allows.
+    Slots are cleared and handed to the next request as soon as a
+    sequence finishes or its consumer goes away.
+
+    The weights are shared with `llama` (a loaded llama_cpp.Llama), which
+    is also used for tokenization.
+    """
+
+    def __init__(self, llama, slots: int, context_size: int, threads: int, options: LlamaCppOptions):
+        self.llama = llama
+        self.context_size = context_size
+        self.n_batch = options.n_batch
+        self._n_vocab = llama.n_vocab()
+        self._end_tokens = _end_tokens(llama)
+        self._ctx = _new_context(llama.model, slots, context_size, threads, options)
+        self._batch = llama_cpp.llama_batch_init(self.n_batch, 0, 1)
+        self._slots = [_Slot(i) for i in range(slots)]
+        self._waiting: List[_Request] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._steps = 0
+        self._tokens_generated = 0
+        self._requests = 0
+        self._busy_sec = 0.0
+        self._started = time.perf_counter()
+        self.threads = threads
+        self._thread = threading.Thread(target=self._loop, name="llama-batch", daemon=True)
+        self._thread.start()
+        logger.info(f"Batched engine ready: {slots} slots × {context_size} tokens")
+
+    @property
+    def slots(self) -> int:
+        return len(self._slots)
+
+    def generate(self, tokens: List[int], params: GenerationParams) -> Iterator[str]:
+        """Queue a prompt and yield text as its slot produces it"""
+        if not tokens:
+            raise ValueError("Cannot generate from an empty prompt")
+        if len(tokens) + params.max_tokens > self.context_size:
+            raise ValueError(
+                f"Prompt ({len(tokens)} tokens) + max_tokens ({params.max_tokens}) "
+                f"exceeds the {self.context_size}-token context of a slot"
+            )
+        request = _Request(tokens=list(tokens), params=params, profiler=profiling.current())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Batched engine is closed")
+            self._waiting.append(request)
+            self._cond.notify()
+        return self._drain(request)
+
+    def _drain(self, request: _Request) -> Iterator[str]:
+        try:
+            while True:
+                item = request.output.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Consumer stopped early (e.g. client disconnected): free the slot
+            request.cancelled = True
+
+    def load(self) -> int:
+        """Requests running or queued on this engine"""
+        with self._cond:
+            return sum(1 for s in self._slots if s.request is not None) + len(self._waiting)
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.perf_counter() - self._started
+        with self._cond:
+            return {
+                "slots": len(self._slots),
+                "threads": self.threads,
+                "active": sum(1 for s in self._slots if s.request is not None),
+                "waiting": len(self._waiting),
+                "requests": self._requests,
+                "steps": self._steps,
+                "tokens_generated": self._tokens_generated,
+                # Share of wall time spent decoding
+                "utilization": self._busy_sec / uptime if uptime > 0 else 0.0,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        llama_cpp.llama_batch_free(self._batch)
+        llama_cpp.llama_free(self._ctx)
+        self._ctx = None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._waiting and not self._busy():
+                    self._cond.wait()
+                if self._closed:
+                    break
+                self._admit()
+            start = time.perf_counter()
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Batched decode failed: {e}")
+                for slot in self._slots:
+                    if slot.request is not None:
+                        self._release(slot, RuntimeError(f"Error during batched decoding\n   {e}"))
+            self._busy_sec += time.perf_counter() - start
+
+        error = RuntimeError("Batched engine was closed")
+        for slot in self._slots:
+            if slot.request is not None:
+                self._release(slot, error)
+        for request in self._waiting:
+            request.output.put(error)
+        self._waiting.clear()
+
+    def _busy(self) -> bool:
+        return any(s.request is not None for s in self._slots)
+
+    def _admit(self):
+        free = [s for s in self._slots if s.request is None]
+        while free and self._waiting:
+            request = self._waiting.pop(0)
+            if request.cancelled:
+                continue
+            slot = free.pop(0)
+            _seq_rm(self._ctx, slot.index)
+            slot.start(request)
+            self._requests += 1
+
+    def _step(self):
+        for slot in self._slots:
+            if slot.request is not None and slot.request.cancelled:
+                self._release(slot)
+        active = [s for s in self._slots if s.request is not None]
+        if not active:
+            return
+
+        # Decoding slots first so long prompts never stall token streams
+        active.sort(key=lambda s: len(s.pending) > 1)
+        batch, n, sampled, included = self._batch, 0, [], []
+        for slot in active:
+            take = min(len(slot.pending), self.n_batch - n)
+            if take <= 0:
+                break
+            included.append((slot, take, slot.generated == 0))
+            for i in range(take):
+                batch.token[n] = slot.pending[i]
+                batch.pos[n] = slot.n_past + i
+                batch.n_seq_id[n] = 1
+                batch.seq_id[n][0] = slot.index
+                batch.logits[n] = take == len(slot.pending) and i == take - 1
+                n += 1
+            if take == len(slot.pending):
+                sampled.append((slot, n - 1))
+            slot.pending = slot.pending[take:]
+            slot.n_past += take
+        batch.n_tokens = n
+
+        start = time.perf_counter_ns()
+        status = llama_cpp.llama_decode(self._ctx, batch)
+        if status != 0:
+            raise RuntimeError(f"llama_decode returned {status} (KV cache full?)")
+        self._steps += 1
+        end = time.perf_counter_ns()
+        for slot, take, prompt in included:
+            profiler = slot.request.profiler
+            if profiler is not None:
+                # Shown per slot; every slot in the step shares the same decode call
+                profiler.record("prefill" if prompt else "decode", start, end,
+                                args={"tokens": take, "batch_tokens": n},
+                                tid=profiler.lane(f"llama slot {slot.index}"))
+
+        for slot, position in sampled:
+            profiler = slot.request.profiler
+            mark = time.perf_counter_ns()
+            logits = np.ctypeslib.as_array(
+                llama_cpp.llama_get_logits_ith(self._ctx, position), shape=(self._n_vocab,)
+            )
+            token = _sample(logits, slot.request.params, slot.rng)
+            slot.generated += 1
+            self._tokens_generated += 1
+            if token in self._end_tokens:
+                self._release(slot)
+                continue
+            sampled_at = time.perf_counter_ns()
+            text = slot.decoder.decode(self.llama.detokenize([token]))
+            if profiler is not None:
+                lane = profiler.lane(f"llama slot {slot.index}")
+                profiler.record("sample", mark, sampled_at, tid=lane)
+                profiler.record("detokenize", sampled_at, time.perf_counter_ns(), tid=lane)
+            if self._emit(slot, text) or slot.generated >= slot.request.params.max_tokens:
+                self._release(slot)
+            else:
+                slot.pending = [token]
+
+    def _emit(self, slot: _Slot, text: str) -> bool:
+        """Send text to the consumer, holding back a possible stop-string prefix; True on stop"""
+        stop = slot.request.params.stop
+        if not stop:
+            if text:
+                slot.request.output.put(text)
+            return False
+        held = slot.held + text
+        for s in stop:
+            cut = held.find(s)
+            if cut != -1:
+                if cut:
+                    slot.request.output.put(held[:cut])
+                slot.held = ""
+                return True
+        keep = max(len(s) for s in stop) - 1
+        ready = held[:len(held) - keep] if keep else held
+        if ready:
+            slot.request.output.put(ready)
+        slot.held = held[len(ready):]
+        return False
+
+    def _release(self, slot: _Slot, error: Optional[BaseException] = None):
+        request = slot.request
+        if slot.held and error is None:
+            request.output.put(slot.held)
+        request.output.put(error if error is not None else _DONE)
+        _seq_rm(self._ctx, slot.index)
+        slot.request = None
+        slot.pending = []
+
+
+def _sample(logits: "np.ndarray", params: GenerationParams, rng) -> int:
+    """Temperature / top-k / top-p sampling; greedy at temperature 0"""
+    if params.temperature <= 0:
+        return int(np.argmax(logits))
+    scores = logits.astype(np.float64) / params.temperature
+    candidates = np.arange(len(scores))
+    if 0 < params.top_k < len(scores):
+        candidates = np.argpartition(-scores, params.top_k)[:params.top_k]
+    order = candidates[np.argsort(-scores[candidates])]
+    probs = np.exp(scores[order] - scores[order[0]])
+    probs /= probs.sum()
+    if params.top_p < 1.0:
+        cutoff = int(np.searchsorted(np.cumsum(probs), params.top_p)) + 1
+        order, probs = order[:cutoff], probs[:cutoff] / probs[:cutoff].sum()
+    return int(order[rng.choice(len(order), p=probs)])
+
+
+def _end_tokens(llama) -> set:
+    tokens = {llama.token_eos()}
+    token_eot = getattr(getattr(llama, "_model", None), "token_eot", None)
+    if token_eot is not None and token_eot() >= 0:
+        tokens.add(token_eot())
+    return tokens
+
+
+def _new_context(model, slots: int, context_size: int, threads: int, options: LlamaCppOptions):
+    params = llama_cpp.llama_context_default_params()
+    values = {
+        "n_ctx": slots * context_size,
+        "n_seq_max": slots,
+        "n_batch": options.n_batch,
+        "n_ubatch": options.n_ubatch,
+        "n_threads": threads,
+        "n_threads_batch": options.n_threads_batch or threads,
+        "type_k": GGML_TYPES[options.type_k],
+        "type_v": GGML_TYPES[options.type_v],
+        "flash_attn": options.flash_attn,
+    }
+    if options.rope_freq_scale:
+        values["rope_freq_scale"] = options.rope_freq_scale
+    # Field names differ between llama.cpp versions; set what this build has
+    available = {name for name, _ in params._fields_}
+    for name, value in values.items():
+        if name in available:
+            setattr(params, name, value)
+    new_context = getattr(llama_cpp, "llama_init_from_model", None) or llama_cpp.llama_new_context_with_model
+    ctx = new_context(model, params)
+    if not ctx:
+        raise RuntimeError(
+            f"Failed to create a {slots}-slot llama.cpp context ({slots * context_size} tokens)\n"
+            "Suggestions:\n"
+            "   - Reduce parallel_slots or context_size\n"
+            "   - Use a quantized KV cache (preset: low-memory)"
+        )
+    return ctx
+
+
+def _seq_rm(ctx, seq_id: int):
+    """Drop all KV cells of one sequence (API name varies by llama.cpp version)"""
+    if hasattr(llama_cpp, "llama_memory_seq_rm"):
+        llama_cpp.llama_memory_seq_rm(llama_cpp.llama_get_memory(ctx), seq_id, -1, -1)
+    elif hasattr(llama_cpp, "llama_kv_self_seq_rm"):
+        llama_cpp.llama_kv_self_seq_rm(ctx, seq_id, -1, -1)
+    else:
+        llama_cpp.llama_kv_cache_seq_rm(ctx, seq_id, -1, -1)
@@ -1,21 +1,50 @@
-from typing import Iterator, Union
+from typing import Iterator, Union, List, Dict, Any, Optional
 import logging
 import sys
+import time
 from pathlib import Path
 
+import numpy as np
+
 try:
+    import llama_cpp
     from llama_cpp import Llama
     LLAMA_CPP_AVAILABLE = True
 except ImportError as e:
     LLAMA_CPP_AVAILABLE = False
     IMPORT_ERROR = str(e)
 
+try:
+    from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+except ImportError:
+    LlamaPromptLookupDecoding = None
+
 from .base import BaseRuntime
+from .warmup import prefetch, check_mlock_limit
+from .gguf import read_metadata
+from .llama_tuning import effective_options, validate_options, llama_kwargs
+from .llama_batch import BatchedEngine
+from .llama_pool import ContextPool
+from .adapters import AdapterCache
+from .speculative import SpeculationStats, CountingDraft
+from ..bundle.reader import is_bundle, open_bundle
+from . import profiling
 from ..config.models import SLMConfig, GenerationParams
 
 logger = logging.getLogger(__name__)
 
+# Context of the tokenizer-only Llama when a batched engine or pool serves requests
+_TOKENIZER_CONTEXT = 256
+
 class LlamaCppRuntime(BaseRuntime):
+    def __init__(self, config: SLMConfig):
+        super().__init__(config)
+        self.engine = None
+        self.adapters = AdapterCache(config.runtime.lora, self._load_adapter, self._unload_adapter)
+        self._active_adapter = None
+        self.draft = None
+        self.speculation = SpeculationStats()
+
     def load(self):
         # Check for llama-cpp-python dependency
         if not LLAMA_CPP_AVAILABLE:
@@ -58,8 +87,17 @@ class LlamaCppRuntime(BaseRuntime):
                 "   For HuggingFace models, use pytorch format and transformers runtime"
             )
         
+        if is_bundle(model_path):
+            primary = open_bundle(model_path).primary
+            if primary is None or primary.offset != 0 or not primary.name.endswith(".gguf"):
+                raise ValueError(
+                    f"Bundle doesn't hold a GGUF model: '{self.config.model.path}'\n"
+                    "Package GGUF models with the llama_cpp runtime:\n"
+                    "   slm package config.yaml -o model.slmpkg"
+                )
+            # The GGUF starts at offset 0, so llama.cpp maps the bundle as-is
         # Check file extension
-        if not str(model_path).endswith('.gguf'):
+        elif not str(model_path).endswith('.gguf'):
             raise ValueError(
                 f"File doesn't appear to be a GGUF model: '{self.config.model.path}'\n"
                 "GGUF models must have .gguf extension\n"
@@ -68,19 +106,73 @@ class LlamaCppRuntime(BaseRuntime):
                 "   - For ONNX models, use 'onnx' runtime instead"
             )
         
+        placement = self._apply_cpu_placement()
+        options = effective_options(self.config.runtime.llama_cpp)
+        self.metadata = read_metadata(model_path)
+        for warning in validate_options(options, self.metadata, self.config.runtime.context_size):
+            logger.warning(warning)
+        self.options = options
+        if options.speculative and LlamaPromptLookupDecoding is None:
+            raise ImportError(
+                "Speculative decoding needs a newer llama-cpp-python\n"
+                "Upgrade it with:\n"
+                "   pip install -U llama-cpp-python"
+            )
+        
         try:
             logger.info(f"Loading GGUF model from '{self.config.model.path}'")
             logger.debug(f"Context size: {self.config.runtime.context_size}")
             logger.debug(f"GPU layers: {self.config.runtime.gpu_layers}")
-            logger.debug(f"Threads: {self.config.runtime.threads}")
+            logger.debug(f"Threads: {placement.threads}")
+            
+            # Fault weights in ahead of the first request instead of during it
+            if options.prefetch != "none":
+                prefetch(model_path, mode=options.prefetch)
+            if options.use_mlock:
+                check_mlock_limit(model_path.stat().st_size)
             
+            # With an engine, the Llama only tokenizes and holds the weights;
+            # a full context here would be an idle KV cache next to the engine's
+            uses_engine = options.pool_size > 1 or options.parallel_slots > 1
+            draft_kwargs = {}
+            if options.speculative and not uses_engine:
+                # Swapped in per request; llama.cpp keeps all logits when a draft model is set
+                self.draft = CountingDraft(LlamaPromptLookupDecoding())
+                draft_kwargs["draft_model"] = self.draft
             self.model = Llama(
                 model_path=str(model_path),
-                n_ctx=self.config.runtime.context_size,
+                n_ctx=_TOKENIZER_CONTEXT if uses_engine else self.config.runtime.context_size,
                 n_gpu_layers=self.config.runtime.gpu_layers,
-                n_threads=self.config.runtime.threads,
-                verbose=False
+                n_threads=placement.threads,
+                logits_all=options.logits_all and not uses_engine,
+                use_mmap=options.use_mmap,
+                use_mlock=options.use_mlock,
+                verbose=False,
+                **llama_kwargs(options),
+                **draft_kwargs
             )
+            self.model.draft_model = None
+            
+            if options.pool_size > 1:
+                self.engine = ContextPool(
+                    self.model,
+                    size=options.pool_size,
+                    context_size=self.config.runtime.context_size,
+                    threads=placement.threads,
+                    options=options,
+                    slots_per_context=options.parallel_slots,
+                )
+            elif options.parallel_slots > 1:
+                self.engine = BatchedEngine(
+                    self.model,
+                    slots=options.parallel_slots,
+                    context_size=self.config.runtime.context_size,
+                    threads=placement.threads,
+                    options=options,
+                )
+            
+            if options.warmup_tokens:
+                self.warm_up(options.warmup_tokens)
             
             logger.info("Model loaded successfully")
             
@@ -133,21 +225,39 @@ class LlamaCppRuntime(BaseRuntime):
                 "If using CLI, this is a bug - please report it."
             )
 
+        if self.engine is not None:
+            return self._generate_batched(prompt, params)
+        self._select_adapter(params.adapter)
+        self._select_draft(params)
+
+        profiled = profiling.current() is not None
         try:
+            prompt_input = self._fit_prompt(prompt, params.max_tokens)
+            if profiled and isinstance(prompt_input, str):
+                # Tokenize up front so it shows as its own phase
+                with profiling.span("tokenize"):
+                    prompt_input = self.model.tokenize(prompt_input.encode("utf-8"))
             output = self.model(
-                prompt,
+                prompt_input,
                 max_tokens=params.max_tokens,
                 temperature=params.temperature,
                 top_p=params.top_p,
                 top_k=params.top_k,
                 stop=params.stop,
-                stream=params.stream
+                # Profiling times each token, which needs the streaming path
+                stream=params.stream or profiled
             )
 
+            if profiled:
+                output = profiling.timed_iter(output)
             if params.stream:
                 return self._stream_generator(output)
+            elif profiled:
+                text = "".join(chunk["choices"][0]["text"] for chunk in output)
             else:
-                return output["choices"][0]["text"]
+                text = output["choices"][0]["text"]
+            self._record_speculation()
+            return text
                 
         except KeyError as e:
             raise RuntimeError(
@@ -175,17 +285,217 @@ class LlamaCppRuntime(BaseRuntime):
                     "Check your generation parameters in the config"
                 ) from e
 
+    def _generate_batched(self, prompt: str, params: GenerationParams) -> Union[str, Iterator[str]]:
+        """Generate through a slot of the batched engine"""
+        if params.speculative:
+            raise ValueError(
+                "Speculative decoding is not supported with parallel_slots or pool_size above 1\n"
+                "Batched slots already share each forward pass; drop speculative from the request"
+            )
+        if params.adapter is not None:
+            raise ValueError(
+                "LoRA adapters are not supported with parallel_slots or pool_size above 1\n"
+                "Serve adapters from a single-context instance (parallel_slots: 1, pool_size: 1)"
+            )
+        tokens = self._fit_prompt(prompt, params.max_tokens)
+        if isinstance(tokens, str):
+            with profiling.span("tokenize"):
+                tokens = self.model.tokenize(tokens.encode("utf-8"))
+        stream = self.engine.generate(tokens, params)
+        if params.stream:
+            return stream
+        return "".join(stream)
+
+    def _fit_prompt(self, prompt: str, max_tokens: int) -> Union[str, List[int]]:
+        """
+        With overflow: shift, drop the oldest prompt tokens (after the
+        first n_keep) so prompt + max_tokens fits in the context.
+        """
+        if self.options.overflow != "shift":
+            return prompt
+        with profiling.span("tokenize"):
+            tokens = self.model.tokenize(prompt.encode("utf-8"))
+        budget = self.context_length - max_tokens
+        if len(tokens) <= budget:
+            return prompt
+        keep = self.options.n_keep
+        if budget <= keep:
+            raise ValueError(
+                f"max_tokens ({max_tokens}) leaves no room for the prompt in a "
+                f"{self.context_length}-token context with n_keep {keep}"
+            )
+        logger.info(f"Prompt of {len(tokens)} tokens shifted to {budget} (kept first {keep})")
+        return tokens[:keep] + tokens[len(tokens) - (budget - keep):]
+
+    def _select_adapter(self, name):
+        """Apply a LoRA adapter (or none) to the context before generating"""
+        adapter = self.adapters.get(name) if name is not None else None
+        if name == self._active_adapter:
+            return
+        ctx = self.model.ctx
+        _lora_fn("llama_clear_adapter_lora", "llama_lora_adapter_clear")(ctx)
+        if adapter is not None:
+            status = _lora_fn("llama_set_adapter_lora", "llama_lora_adapter_set")(ctx, adapter.handle, self.adapters.options.scale)
+            if status != 0:
+                self._active_adapter = None
+                raise RuntimeError(f"Failed to apply adapter '{name}' (status {status})")
+        self._active_adapter = name
+        # Cached KV from the previous adapter would be reused for a matching prefix
+        self.model.reset()
+
+    def _select_draft(self, params: GenerationParams):
+        """Turn prompt-lookup drafting on or off for this request"""
+        if not params.speculative:
+            self.model.draft_model = None
+            return
+        if self.draft is None:
+            raise ValueError(
+                "Speculative decoding is not enabled for this model\n"
+                "Set this in your config:\n"
+                "   runtime:\n"
+                "     llama_cpp:\n"
+                "       speculative: true"
+            )
+        self.draft.draft.num_pred_tokens = params.draft_tokens
+        self.draft.begin()
+        self.model.draft_model = self.draft
+
+    def _record_speculation(self):
+        if self.model.draft_model is not None and self.draft.steps:
+            self.speculation.record(self.draft.tokens, self.draft.steps)
+
+    def _load_adapter(self, name: str, path: str):
+        handle = _lora_fn("llama_adapter_lora_init", "llama_lora_adapter_init")(self.model.model, path.encode("utf-8"))
+        if not handle:
+            raise ValueError(
+                f"Could not load LoRA adapter '{name}' from '{path}'\n"
+                "llama_cpp adapters must be GGUF LoRA files converted for this base model"
+            )
+        return handle
+
+    def _unload_adapter(self, name: str, handle):
+        if name == self._active_adapter:
+            _lora_fn("llama_clear_adapter_lora", "llama_lora_adapter_clear")(self.model.ctx)
+            self._active_adapter = None
+            self.model.reset()
+        free = getattr(llama_cpp, "llama_adapter_lora_free", None) or getattr(llama_cpp, "llama_lora_adapter_free", None)
+        if free is not None:
+            free(handle)
+
+    def tokenize(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        return self.model.tokenize(text.encode("utf-8"), add_bos=add_special_tokens)
+
+    def detokenize(self, tokens: List[int]) -> str:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        # llama.cpp indexes its vocab unchecked; a bad id can abort the process
+        self._check_token_ids([tokens])
+        return self.model.detokenize(tokens).decode("utf-8", errors="replace")
+
+    @property
+    def vocab_size(self) -> Optional[int]:
+        return self.model.n_vocab() if self.is_loaded else None
+
+    def score_tokens(self, sequences: List[List[int]]) -> List[List[float]]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        if self.engine is not None:
+            raise RuntimeError(
+                "Token scoring needs a single context\n"
+                "Set parallel_slots: 1 and pool_size: 1 under runtime.llama_cpp"
+            )
+        if not self.config.runtime.llama_cpp.logits_all:
+            raise RuntimeError(
+                "Token scoring needs logits for every position\n"
+                "Set this in your config:\n"
+                "   runtime:\n"
+                "     llama_cpp:\n"
+                "       logits_all: true"
+            )
+
+        results = []
+        for tokens in sequences:
+            if len(tokens) > self.context_length:
+                raise ValueError(
+                    f"Sequence of {len(tokens)} tokens exceeds context size {self.context_length}"
+                )
+            self.model.reset()
+            self.model.eval(tokens)
+            logits = np.asarray(self.model.scores[:len(tokens) - 1], dtype=np.float32)
+            results.append(_target_logprobs(logits, tokens[1:]))
+        self.model.reset()
+        return results
+
+    def warm_up(self, max_tokens: int = 8, prompt: str = "Hello"):
+        """
+        Run a short greedy generation so compute buffers are allocated and
+        the weights touched by decoding are resident before real traffic.
+        """
+        start = time.perf_counter()
+        if self.engine is not None:
+            tokens = self.model.tokenize(prompt.encode("utf-8"))
+            for _ in self.engine.generate(tokens, GenerationParams(max_tokens=max_tokens, temperature=0.0)):
+                pass
+        else:
+            self.model(prompt, max_tokens=max_tokens, temperature=0.0)
+            self.model.reset()
+        logger.info(f"Warm-up generation took {time.perf_counter() - start:.2f}s")
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.engine.slots if self.engine is not None else 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.engine.stats() if self.engine is not None else {}
+        if self.adapters.options.adapters:
+            stats["adapters"] = self.adapters.stats()
+        if self.draft is not None:
+            stats["speculative"] = self.speculation.stats()
+        return stats
+
+    @property
+    def context_length(self) -> int:
+        # Engine slots get context_size each; the Llama's own context is tokenizer-sized
+        if self.is_loaded and self.engine is None:
+            return self.model.n_ctx()
+        return self.config.runtime.context_size
+
     def _stream_generator(self, output_stream) -> Iterator[str]:
         try:
             for chunk in output_stream:
                 text = chunk["choices"][0]["text"]
                 yield text
+            self._record_speculation()
         except Exception as e:
             logger.error(f"Stream error: {str(e)}")
             yield f"\nStream error: {str(e)}\n"
 
     def unload(self):
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
         if self.model:
+            self.adapters.clear()
             del self.model
             self.model = None
             logger.info("Model unloaded")
+
+def _lora_fn(*names):
+    """Look up a LoRA function under its current or older llama.cpp name"""
+    for name in names:
+        fn = getattr(llama_cpp, name, None)
+        if fn is not None:
+            return fn
+    raise RuntimeError(
+        "This llama-cpp-python build has no LoRA adapter API\n"
+        "Upgrade it: pip install -U llama-cpp-python"
+    )
+
+def _target_logprobs(logits: "np.ndarray", targets: List[int]) -> List[float]:
+    """Log-softmax each row of logits and pick the target token's value"""
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    log_norm = np.log(np.exp(shifted).sum(axis=-1))
+    picked = shifted[np.arange(len(targets)), targets]
+    return (picked - log_norm).tolist()
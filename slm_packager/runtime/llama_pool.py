@@ -0,0 +1,76 @@
+"""Pool of llama.cpp contexts over one set of memory-mapped weights"""
+import logging
+import threading
+from typing import Any, Dict, Iterator, List
+
+from ..config.models import GenerationParams, LlamaCppOptions
+from .llama_batch import BatchedEngine
+
+logger = logging.getLogger(__name__)
+
+
+class ContextPool:
+    """
+    Independent llama.cpp contexts sharing one loaded model.
+
+    Every context has its own KV cache, decode thread and share of the
+    compute threads, but all of them read the same weights (the mmap'd
+    GGUF held by `llama`), so each extra context costs KV cache and
+    compute buffers only. A request goes to the context with the fewest
+    running and queued requests.
+
+    Contexts are single-slot engines unless `slots_per_context` is
+    raised, in which case each one also batches internally.
+    """
+
+    def __init__(
+        self,
+        llama,
+        size: int,
+        context_size: int,
+        threads: int,
+        options: LlamaCppOptions,
+        slots_per_context: int = 1,
+    ):
+        if size > threads:
+            logger.warning(
+                f"pool_size {size} exceeds threads ({threads}); contexts will time-share cores"
+            )
+        # Split threads so contexts decoding together don't oversubscribe cores
+        shares = [threads // size + (1 if i < threads % size else 0) for i in range(size)]
+        self.contexts: List[BatchedEngine] = []
+        try:
+            for share in shares:
+                self.contexts.append(
+                    BatchedEngine(llama, slots_per_context, context_size, max(1, share), options)
+                )
+        except Exception:
+            self.close()
+            raise
+        self._lock = threading.Lock()
+        logger.info(f"Context pool ready: {size} contexts, threads {shares}")
+
+    @property
+    def slots(self) -> int:
+        return sum(c.slots for c in self.contexts)
+
+    def generate(self, tokens: List[int], params: GenerationParams) -> Iterator[str]:
+        with self._lock:
+            # Ties go to the lowest index so a lightly loaded pool reuses warm contexts
+            context = min(self.contexts, key=lambda c: c.load() / c.slots)
+            return context.generate(tokens, params)
+
+    def stats(self) -> Dict[str, Any]:
+        contexts = [dict(c.stats(), index=i) for i, c in enumerate(self.contexts)]
+        return {
+            "slots": self.slots,
+            "active": sum(c["active"] for c in contexts),
+            "waiting": sum(c["waiting"] for c in contexts),
+            "tokens_generated": sum(c["tokens_generated"] for c in contexts),
+            "contexts": contexts,
+        }
+
+    def close(self):
+        for context in self.contexts:
+            context.close()
+        self.contexts = []
@@ -0,0 +1,116 @@
+"""Performance presets and validation for llama.cpp load options"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from ..config.models import LlamaCppOptions
+from .gguf import GGUFMetadata
+
+logger = logging.getLogger(__name__)
+
+# Values a preset fills in for options the config leaves unset (null)
+PRESETS: Dict[str, Dict[str, Any]] = {
+    # Quantized KV cache and small physical batches: lowest resident memory
+    "low-memory": {"type_k": "q8_0", "type_v": "q8_0", "flash_attn": True, "n_batch": 256, "n_ubatch": 128},
+    "balanced": {"type_k": "f16", "type_v": "f16", "flash_attn": False, "n_batch": 512, "n_ubatch": 512},
+    # Large logical batches for fast prompt processing
+    "throughput": {"type_k": "f16", "type_v": "f16", "flash_attn": True, "n_batch": 2048, "n_ubatch": 512},
+}
+
+# ggml_type ids accepted by llama-cpp-python's type_k / type_v
+GGML_TYPES = {"f32": 0, "f16": 1, "q4_0": 2, "q4_1": 3, "q5_0": 6, "q5_1": 7, "q8_0": 8}
+
+# (block size, bytes per block)
+_TYPE_LAYOUT = {
+    "f32": (1, 4), "f16": (1, 2), "q8_0": (32, 34), "q5_1": (32, 24),
+    "q5_0": (32, 22), "q4_1": (32, 20), "q4_0": (32, 18),
+}
+
+
+# Used for unset options when no preset is selected
+DEFAULT_PRESET = "balanced"
+
+
+def effective_options(options: LlamaCppOptions) -> LlamaCppOptions:
+    """
+    Resolve unset (None) performance options from the selected preset, or
+    the defaults without one. Set values always win, so a config saved
+    with every field written out keeps its preset.
+    """
+    preset = PRESETS[options.preset or DEFAULT_PRESET]
+    updates = {k: v for k, v in preset.items() if getattr(options, k) is None}
+    return options.model_copy(update=updates)
+
+
+def validate_options(
+    options: LlamaCppOptions,
+    metadata: Optional[GGUFMetadata],
+    context_size: int,
+) -> List[str]:
+    """
+    Check options against each other and the model's GGUF metadata.
+
+    Raises ValueError for combinations llama.cpp rejects; returns warnings
+    for ones that load but degrade quality or waste memory.
+    """
+    errors, warnings = [], []
+
+    if options.n_ubatch > options.n_batch:
+        errors.append(f"n_ubatch ({options.n_ubatch}) cannot exceed n_batch ({options.n_batch})")
+    if options.type_v not in ("f16", "f32") and not options.flash_attn:
+        errors.append(f"a quantized value cache (type_v: {options.type_v}) requires flash_attn: true")
+    if options.overflow == "shift" and options.n_keep >= context_size:
+        errors.append(f"n_keep ({options.n_keep}) must be smaller than context_size ({context_size})")
+
+    if metadata is not None:
+        head_dim = metadata.head_dim
+        for name in ("type_k", "type_v"):
+            block = _TYPE_LAYOUT[getattr(options, name)][0]
+            if head_dim and head_dim % block:
+                errors.append(
+                    f"{name}: {getattr(options, name)} needs a head dimension divisible by {block} "
+                    f"(this model has {head_dim})"
+                )
+        trained = metadata.context_length
+        if trained and context_size > trained and options.rope_freq_scale is None:
+            warnings.append(
+                f"context_size {context_size} exceeds the {trained} tokens this model was trained on; "
+                f"output degrades past that unless rope_freq_scale is set (e.g. {trained / context_size:.2f})"
+            )
+
+    if errors:
+        preset = f" (preset '{options.preset}')" if options.preset else ""
+        raise ValueError(
+            f"❌ Invalid llama.cpp options{preset}:\n"
+            + "\n".join(f"   • {e}" for e in errors)
+            + "\n💡 Adjust runtime.llama_cpp in your config or choose another preset"
+        )
+    return warnings
+
+
+def kv_cache_bytes(options: LlamaCppOptions, metadata: GGUFMetadata, context_size: int) -> Optional[int]:
+    """Estimated KV cache size for the given options, or None if unknown"""
+    layers, kv_heads, head_dim = metadata.num_layers, metadata.num_kv_heads, metadata.head_dim
+    if not (layers and kv_heads and head_dim):
+        return None
+    elements = layers * context_size * kv_heads * head_dim
+    total = 0
+    for type_name in (options.type_k, options.type_v):
+        block, block_bytes = _TYPE_LAYOUT[type_name]
+        total += elements * block_bytes // block
+    return total
+
+
+def llama_kwargs(options: LlamaCppOptions) -> Dict[str, Any]:
+    """Keyword arguments for llama_cpp.Llama from resolved options"""
+    kwargs = {
+        "n_batch": options.n_batch,
+        "n_ubatch": options.n_ubatch,
+        "type_k": GGML_TYPES[options.type_k],
+        "type_v": GGML_TYPES[options.type_v],
+        "flash_attn": options.flash_attn,
+    }
+    if options.n_threads_batch:
+        kwargs["n_threads_batch"] = options.n_threads_batch
+    if options.rope_freq_scale:
+        kwargs["rope_freq_scale"] = options.rope_freq_scale
+    return kwargs
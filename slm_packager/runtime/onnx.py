@@ -1,5 +1,8 @@
-from typing import Iterator, Union
+from typing import Iterator, Union, List, Optional
+import hashlib
+import json
 import logging
+import os
 import numpy as np
 from pathlib import Path
 
@@ -12,6 +15,7 @@ except ImportError as e:
     IMPORT_ERROR = str(e)
 
 from .base import BaseRuntime
+from . import profiling
 from ..config.models import SLMConfig, GenerationParams
 
 logger = logging.getLogger(__name__)
@@ -30,11 +34,6 @@ class OnnxRuntime(BaseRuntime):
                 f"\n   Error details: {IMPORT_ERROR}"
             )
         
-        logger.warning("ONNX runtime support is currently limited in v0.1")
-        logger.warning("- Generation uses simplified loop without KV-cache")
-        logger.warning("- Performance may be slower than expected")
-        logger.warning("- This is a known limitation being improved")
-        
         model_path = Path(self.config.model.path)
         
         # Check if model file exists
@@ -56,12 +55,17 @@ class OnnxRuntime(BaseRuntime):
                 "   - For GGUF models, use 'llama_cpp' runtime"
             )
         
+        self._apply_cpu_placement()
         try:
-            logger.info(f"Loading tokenizer for '{self.config.model.name}'")
+            # Prefer tokenizer files saved next to the model (slm export),
+            # otherwise treat model.name as a HuggingFace repo ID
+            tokenizer_source = self.config.model.name
+            if any((model_path.parent / name).exists() for name in ("tokenizer.json", "tokenizer_config.json")):
+                tokenizer_source = str(model_path.parent)
+            logger.info(f"Loading tokenizer from '{tokenizer_source}'")
             
-            # Try to load tokenizer from model name (assumed to be HF repo ID)
             self.tokenizer = AutoTokenizer.from_pretrained(
-                self.config.model.name,
+                tokenizer_source,
                 trust_remote_code=True
             )
             
@@ -80,21 +84,21 @@ class OnnxRuntime(BaseRuntime):
         try:
             logger.info(f"Loading ONNX model from '{self.config.model.path}'")
             
-            sess_options = ort.SessionOptions()
-            if self.config.runtime.threads > 0:
-                sess_options.intra_op_num_threads = self.config.runtime.threads
-                
-            providers = ["CPUExecutionProvider"]
-            if self.config.runtime.device == "cuda":
-                providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
-                
-            self.session = ort.InferenceSession(
-                str(model_path),
-                sess_options,
-                providers=providers
-            )
+            self.session = self._create_session(model_path)
             self.model = self.session
             
+            # Map each past input to the present output that feeds it next step
+            output_names = {meta.name for meta in self.session.get_outputs()}
+            self._past_inputs = {}
+            for meta in self.session.get_inputs():
+                if meta.name.startswith("past_key_values."):
+                    present = meta.name.replace("past_key_values.", "present.", 1)
+                    if present in output_names:
+                        self._past_inputs[meta.name] = present
+            if not self._past_inputs:
+                logger.warning("ONNX graph has no KV-cache inputs; generation recomputes the full sequence each step")
+                logger.warning("Export with 'slm export <config> --format onnx' for cached decoding")
+            
             logger.info("ONNX model loaded")
             
         except Exception as e:
@@ -116,46 +120,220 @@ class OnnxRuntime(BaseRuntime):
                     "   - Ensure the model is compatible with onnxruntime"
                 ) from e
 
+    def _providers(self) -> List[str]:
+        if self.config.runtime.device == "cuda":
+            return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+        return ["CPUExecutionProvider"]
+
+    def _session_options(self) -> "ort.SessionOptions":
+        options = self.config.runtime.onnx
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = self.cpu_placement.threads
+        inter_op_threads = options.inter_op_threads or self.config.runtime.cpu.inter_op_threads
+        if inter_op_threads:
+            sess_options.inter_op_num_threads = inter_op_threads
+        sess_options.graph_optimization_level = _OPTIMIZATION_LEVELS[options.graph_optimization_level]
+        sess_options.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL if options.execution_mode == "parallel"
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        sess_options.enable_cpu_mem_arena = options.enable_cpu_mem_arena
+        sess_options.enable_mem_pattern = options.enable_mem_pattern
+        return sess_options
+
+    def _create_session(self, model_path: Path) -> "ort.InferenceSession":
+        """
+        Create an inference session, reusing a previously optimized graph.
+
+        On the first start the optimized graph is saved to the cache; later
+        starts load it with optimization disabled, skipping that work.
+        """
+        sess_options = self._session_options()
+        providers = self._providers()
+        cached = self._optimized_graph_path(model_path, providers)
+
+        if cached is None:
+            return ort.InferenceSession(str(model_path), sess_options, providers=providers)
+
+        if cached.exists():
+            logger.info(f"Loading pre-optimized ONNX graph from cache: {cached.name}")
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                return ort.InferenceSession(str(cached), sess_options, providers=providers)
+            except Exception as e:
+                logger.warning(f"Cached ONNX graph unusable ({e}); re-optimizing")
+                cached.unlink(missing_ok=True)
+                sess_options = self._session_options()
+
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        partial = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+        sess_options.optimized_model_filepath = str(partial)
+        if _model_size(model_path) > _EXTERNAL_DATA_THRESHOLD:
+            # Protobuf caps a single file at 2GB; keep weights alongside
+            sess_options.add_session_config_entry(
+                "session.optimized_model_external_initializers_file_name", f"{cached.name}.data"
+            )
+        session = ort.InferenceSession(str(model_path), sess_options, providers=providers)
+        if partial.exists():
+            os.replace(partial, cached)
+            logger.info(f"Saved optimized ONNX graph to cache: {cached.name}")
+        return session
+
+    def _optimized_graph_path(self, model_path: Path, providers: List[str]) -> Optional[Path]:
+        """Cache location keyed by model hash, ORT version, options and providers"""
+        options = self.config.runtime.onnx
+        if not options.cache_optimized_graph or options.graph_optimization_level == "disable":
+            return None
+
+        cache_dir = Path(options.cache_dir) if options.cache_dir else Path.home() / ".slm" / "cache" / "onnx"
+        key_data = {
+            "model": _model_digest(model_path, cache_dir),
+            "ort": ort.__version__,
+            "providers": providers,
+            "level": options.graph_optimization_level,
+            "threads": self.cpu_placement.threads,
+        }
+        key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:24]
+        return cache_dir / f"{model_path.stem}-{key}.onnx"
+
     def generate(self, prompt: str, params: GenerationParams) -> Union[str, Iterator[str]]:
         if not self.is_loaded:
             raise RuntimeError(
                 "Model is not loaded. Call runtime.load() first.\n"
                 "If using CLI, this is a bug - please report it."
             )
+        if params.adapter is not None:
+            raise ValueError(
+                "LoRA adapters are not supported by the ONNX runtime\n"
+                "Serve adapters with the transformers or llama_cpp runtime, or drop adapter from the request"
+            )
+        if params.speculative:
+            raise ValueError(
+                "Speculative decoding is not supported by the ONNX runtime\n"
+                "Use the transformers or llama_cpp runtime, or drop speculative from the request"
+            )
 
         try:
-            # Encode prompt
-            input_ids = self.tokenizer.encode(prompt, return_tensors="np")
-            
-            # IMPORTANT NOTE: This is a placeholder implementation
-            # Full ONNX generation requires complex KV-cache management
-            # This is mentioned in the README as a known limitation
-            
-            warning_msg = (
-                f"\nWarning: ONNX generation not fully implemented in v0.1\n"
-                f"   Input prompt: \"{prompt}\"\n"
-                f"   Model: {self.config.model.name}\n"
-                f"\n"
-                f"   This runtime needs:\n"
-                f"   - Proper KV-cache implementation\n"
-                f"   - Full generation loop with sampling\n"
-                f"\n"
-                f"   For now, use 'transformers' runtime for full generation capability.\n"
-                f"   See README for known limitations.\n"
-            )
-            
-            logger.warning("ONNX generation attempted - returning placeholder")
-            return warning_msg
-            
+            with profiling.span("tokenize"):
+                prompt_ids = self.tokenizer.encode(prompt)
+            if params.stream:
+                return self._stream_generator(prompt_ids, params)
+            return "".join(self._stream_generator(prompt_ids, params))
         except Exception as e:
             raise RuntimeError(
                 f"Error during ONNX generation\n"
                 f"   {type(e).__name__}: {str(e)}\n"
-                "ONNX runtime is currently experimental\n"
-                "   - Consider using 'transformers' runtime for now\n"
-                "   - See README for current limitations"
+                "Check your generation parameters in the config"
             ) from e
 
+    def _stream_generator(self, prompt_ids: List[int], params: GenerationParams) -> Iterator[str]:
+        """Decode tokens and yield text as soon as it is stable"""
+        generated: List[int] = []
+        emitted = ""
+        for token in self._decode_tokens(prompt_ids, params):
+            generated.append(token)
+            with profiling.span("detokenize"):
+                text = self.tokenizer.decode(generated, skip_special_tokens=True)
+            # Hold back partial multi-byte characters
+            if text.endswith("\ufffd"):
+                continue
+            for stop in params.stop:
+                idx = text.find(stop, max(0, len(emitted) - len(stop)))
+                if idx != -1:
+                    if idx > len(emitted):
+                        yield text[len(emitted):idx]
+                    return
+            if len(text) > len(emitted):
+                yield text[len(emitted):]
+                emitted = text
+
+    def _decode_tokens(self, prompt_ids: List[int], params: GenerationParams) -> Iterator[int]:
+        """Autoregressive loop, reusing the KV cache when the graph has one"""
+        rng = np.random.default_rng()
+        eos = self.tokenizer.eos_token_id
+        sequence = list(prompt_ids)
+        step_ids = list(prompt_ids)
+        past = None
+        input_metas = self.session.get_inputs()
+        output_names = [meta.name for meta in self.session.get_outputs()]
+
+        for _ in range(params.max_tokens):
+            if len(sequence) >= self.context_length:
+                logger.warning("Context size reached; stopping generation")
+                return
+
+            if self._past_inputs:
+                feeds = build_feeds(input_metas, np.asarray([step_ids], dtype=np.int64))
+                past_len = len(sequence) - len(step_ids)
+                if "attention_mask" in feeds:
+                    feeds["attention_mask"] = np.ones((1, len(sequence)), dtype=np.int64)
+                if "position_ids" in feeds:
+                    feeds["position_ids"] = np.arange(past_len, len(sequence), dtype=np.int64)[None, :]
+                if past is not None:
+                    feeds.update(past)
+            else:
+                feeds = build_feeds(input_metas, np.asarray([sequence], dtype=np.int64))
+
+            with profiling.span("prefill" if len(sequence) == len(prompt_ids) else "decode", tokens=len(step_ids)):
+                outputs = dict(zip(output_names, self.session.run(output_names, feeds)))
+            if self._past_inputs:
+                past = {name: outputs[present] for name, present in self._past_inputs.items()}
+
+            with profiling.span("sample"):
+                token = sample_token(outputs["logits"][0, -1], params, rng)
+            if token == eos:
+                return
+            yield token
+            sequence.append(token)
+            step_ids = [token]
+
+    def tokenize(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        return self.tokenizer.encode(text, add_special_tokens=add_special_tokens)
+
+    def tokenize_batch(self, texts: List[str], add_special_tokens: bool = True) -> List[List[int]]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        # Fast tokenizers encode a list in parallel
+        return self.tokenizer(texts, add_special_tokens=add_special_tokens)["input_ids"]
+
+    def detokenize(self, tokens: List[int]) -> str:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        self._check_token_ids([tokens])
+        return self.tokenizer.decode(tokens, skip_special_tokens=True)
+
+    def detokenize_batch(self, sequences: List[List[int]]) -> List[str]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+        self._check_token_ids(sequences)
+        return self.tokenizer.batch_decode(sequences, skip_special_tokens=True)
+
+    @property
+    def vocab_size(self) -> Optional[int]:
+        tokenizer = getattr(self, "tokenizer", None)
+        return len(tokenizer) if tokenizer is not None else None
+
+    def score_tokens(self, sequences: List[List[int]]) -> List[List[float]]:
+        if not self.is_loaded:
+            raise RuntimeError("Model is not loaded. Call runtime.load() first.")
+
+        results = []
+        for tokens in sequences:
+            input_ids = np.asarray([tokens], dtype=np.int64)
+            logits = self._forward_logits(input_ids)[0, :len(tokens) - 1].astype(np.float32)
+            shifted = logits - logits.max(axis=-1, keepdims=True)
+            log_norm = np.log(np.exp(shifted).sum(axis=-1))
+            picked = shifted[np.arange(len(tokens) - 1), tokens[1:]]
+            results.append((picked - log_norm).tolist())
+        return results
+
+    def _forward_logits(self, input_ids: "np.ndarray") -> "np.ndarray":
+        """Run one full forward pass and return logits [batch, seq, vocab]"""
+        feeds = build_feeds(self.session.get_inputs(), input_ids)
+        return self.session.run(["logits"], feeds)[0]
+
     def unload(self):
         if self.session:
             self.session = None
@@ -164,3 +342,115 @@ class OnnxRuntime(BaseRuntime):
         if self.tokenizer:
             self.tokenizer = None
         logger.info("ONNX model unloaded")
+
+def sample_token(logits: "np.ndarray", params: GenerationParams, rng) -> int:
+    """Pick the next token with temperature, top-k and top-p sampling"""
+    logits = logits.astype(np.float64)
+    if params.temperature == 0:
+        return int(np.argmax(logits))
+
+    logits = logits / params.temperature
+    if 0 < params.top_k < logits.shape[-1]:
+        cutoff = np.partition(logits, -params.top_k)[-params.top_k]
+        logits = np.where(logits < cutoff, -np.inf, logits)
+
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+
+    if params.top_p < 1.0:
+        order = np.argsort(-probs)
+        cumulative = np.cumsum(probs[order])
+        keep = order[:int(np.searchsorted(cumulative, params.top_p)) + 1]
+        mask = np.zeros_like(probs)
+        mask[keep] = probs[keep]
+        probs = mask / mask.sum()
+
+    return int(rng.choice(len(probs), p=probs))
+
+_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+} if ONNX_AVAILABLE else {}
+
+_EXTERNAL_DATA_THRESHOLD = 1536 * 1024 * 1024
+
+def _model_size(model_path: Path) -> int:
+    """Graph file plus any external weight files next to it"""
+    size = model_path.stat().st_size
+    for data_file in model_path.parent.glob(f"{model_path.name}.data"):
+        size += data_file.stat().st_size
+    return size
+
+def _model_digest(model_path: Path, cache_dir: Path) -> str:
+    """
+    SHA-256 of the model graph, memoized by path, size and mtime so
+    unchanged models are not rehashed on every start.
+    """
+    stat = model_path.stat()
+    fingerprint = f"{_model_size(model_path)}:{stat.st_mtime_ns}"
+    index_path = cache_dir / "digests.json"
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        index = {}
+
+    entry = index.get(str(model_path.resolve()))
+    if entry and entry.get("fingerprint") == fingerprint:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    # External weights are covered by size+mtime rather than rehashed
+    sha = f"{digest.hexdigest()}:{fingerprint}" if _model_size(model_path) != stat.st_size else digest.hexdigest()
+
+    index[str(model_path.resolve())] = {"fingerprint": fingerprint, "sha256": sha}
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_name(f"digests.json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, indent=2))
+        os.replace(tmp, index_path)
+    except OSError as e:
+        logger.debug(f"Could not update digest index: {e}")
+    return sha
+
+_ORT_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+}
+
+def build_feeds(input_metas, input_ids: "np.ndarray") -> dict:
+    """
+    Build session inputs for a full forward pass over input_ids.
+
+    Handles the usual decoder inputs (attention mask, position ids) and
+    feeds zero-length past key/values to graphs exported with a KV cache.
+    """
+    batch, seq_len = input_ids.shape
+    feeds = {}
+    for meta in input_metas:
+        if meta.name == "input_ids":
+            feeds[meta.name] = input_ids
+        elif meta.name == "attention_mask":
+            feeds[meta.name] = np.ones((batch, seq_len), dtype=np.int64)
+        elif meta.name == "position_ids":
+            feeds[meta.name] = np.arange(seq_len, dtype=np.int64)[None, :].repeat(batch, axis=0)
+        elif meta.name.startswith("past"):
+            feeds[meta.name] = _empty_past(meta, batch)
+        else:
+            raise RuntimeError(f"Unsupported ONNX model input: '{meta.name}'")
+    return feeds
+
+def _empty_past(meta, batch: int) -> "np.ndarray":
+    """Zero-length past key/value tensor matching an input's declared shape"""
+    shape = []
+    for i, dim in enumerate(meta.shape):
+        if isinstance(dim, int):
+            shape.append(dim)
+        else:
+            # Symbolic dims: first is batch, the others are the past length
+            shape.append(batch if i == 0 else 0)
+    return np.zeros(shape, dtype=_ORT_DTYPES.get(meta.type, np.float32))
@@ -0,0 +1,171 @@
+"""Span tracing for runtime hot paths, written as Chrome trace-event JSON"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# Synthetic thread ids for lanes; real thread idents are pointer-sized and never this small
+_LANE_BASE = 1_000_000
+
+_current: ContextVar[Optional["Profiler"]] = ContextVar("slm_profiler", default=None)
+
+
+class Profiler:
+    """
+    Collects timed spans (nanosecond perf_counter timestamps).
+
+    Spans are only recorded while the profiler is active in the current
+    context (see `activate`), so the cost elsewhere is one ContextVar
+    lookup per span. `sample_rate` lets a server profile a fraction of
+    requests; `max_events` bounds memory on long runs.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_events: int = 500_000):
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError(f"❌ Profile sample rate must be in (0, 1], got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[tuple] = []
+        self._lanes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def sampled(self) -> bool:
+        """Whether the next request should be profiled"""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @contextmanager
+    def activate(self):
+        """Record spans from code running in this context"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def span(self, name: str, cat: str = "runtime", **args) -> "_Span":
+        return _Span(self, name, cat, args)
+
+    def record(self, name: str, start_ns: int, end_ns: int, cat: str = "runtime",
+               args: Optional[Dict[str, Any]] = None, tid: Optional[int] = None):
+        """Add a finished span; tid defaults to the calling thread"""
+        if len(self._events) >= self.max_events:
+            self.dropped += 1
+            return
+        # list.append is atomic, so spans from worker threads need no lock
+        self._events.append((name, cat, start_ns, end_ns - start_ns, tid or threading.get_ident(), args))
+
+    def lane(self, name: str) -> int:
+        """Stable synthetic thread id for spans that are not tied to a thread (e.g. a batch slot)"""
+        with self._lock:
+            if name not in self._lanes:
+                self._lanes[name] = _LANE_BASE + len(self._lanes)
+            return self._lanes[name]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Total and mean milliseconds per span name"""
+        totals: Dict[str, List[float]] = {}
+        for name, _, _, duration, _, _ in list(self._events):
+            totals.setdefault(name, []).append(duration / 1e6)
+        return {
+            name: {"count": len(d), "total_ms": sum(d), "mean_ms": sum(d) / len(d)}
+            for name, d in sorted(totals.items(), key=lambda kv: -sum(kv[1]))
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for name, tid in self._lanes.items()
+        ]
+        for name, cat, start, duration, tid, args in list(self._events):
+            event = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": start / 1000, "dur": duration / 1000}
+            if args:
+                event["args"] = args
+            events.append(event)
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ns",
+            "otherData": {"sample_rate": self.sample_rate, "dropped_events": self.dropped},
+        }
+
+    def write(self, path: Union[str, Path]) -> Path:
+        """Save the trace; open it in chrome://tracing or ui.perfetto.dev"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        os.replace(tmp, path)
+        return path
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "cat", "args", "start")
+
+    def __init__(self, profiler: Profiler, name: str, cat: str, args: Dict[str, Any]):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns(), self.cat, self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def current() -> Optional[Profiler]:
+    """The profiler active in this context, if any"""
+    return _current.get()
+
+
+def span(name: str, cat: str = "runtime", **args):
+    """Time a block under the active profiler; a no-op when none is active"""
+    profiler = _current.get()
+    if profiler is None:
+        return _NULL_SPAN
+    return profiler.span(name, cat, **args)
+
+
+def timed_iter(iterator, first: str = "prefill", rest: str = "decode") -> Iterator[Any]:
+    """
+    Yield from iterator, recording the wait for the first item as `first`
+    and for every later item as `rest`. Only the time spent inside next()
+    counts, not the consumer's work between items.
+    """
+    profiler = _current.get()
+    iterator = iter(iterator)
+    name = first
+    while True:
+        start = time.perf_counter_ns()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        if profiler is not None:
+            profiler.record(name, start, time.perf_counter_ns())
+        name = rest
+        yield item
@@ -0,0 +1,96 @@
+"""Bookkeeping for prompt-lookup speculative decoding"""
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+
+# Built-in copy-heavy prompt for `slm benchmark --speculative`
+COPY_PROMPT = '''Here is a Python function:
+
+def summarize(orders):
+    total = 0
+    count = 0
+    for order in orders:
+        if order.status == "paid":
+            total += order.amount
+            count += 1
+    average = total / count if count else 0.0
+    return {"total": total, "count": count, "average": average}
+
+Rewrite the function above exactly as it is, but rename the variable `total` to `revenue`:
+
+'''
+
+
+class SpeculationStats:
+    """
+    Tokens produced per forward pass of the model while speculating.
+
+    Each verification step yields the accepted draft tokens plus one token
+    from the model itself, so `tokens_per_step - 1` is the mean number of
+    draft tokens accepted per step.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.steps = 0
+
+    def record(self, tokens: int, steps: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+            self.steps += steps
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_step = self.tokens / self.steps if self.steps else 0.0
+            return {
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "steps": self.steps,
+                "tokens_per_step": per_step,
+                "accepted_per_step": max(per_step - 1.0, 0.0),
+            }
+
+
+class CountingDraft:
+    """
+    Wraps a llama-cpp-python draft model and counts verification steps.
+
+    The draft is called once per step with every token so far, so the
+    growth of its input between calls is what each step produced.
+    """
+
+    def __init__(self, draft):
+        self.draft = draft
+        self.steps = 0
+        self.tokens = 0
+        self._last = None
+
+    def begin(self):
+        self.steps = 0
+        self.tokens = 0
+        self._last = None
+
+    def __call__(self, input_ids, **kwargs):
+        if self._last is not None:
+            self.steps += 1
+            self.tokens += len(input_ids) - self._last
+        self._last = len(input_ids)
+        return self.draft(input_ids, **kwargs)
+
+
+@contextmanager
+def counting_forwards(module):
+    """Count forward calls of a torch module inside the block"""
+    calls = [0]
+
+    def hook(*_):
+        calls[0] += 1
+
+    handle = module.register_forward_hook(hook)
+    try:
+        yield calls
+    finally:
+        handle.remove()
@@ -1,8 +1,10 @@
-from typing import Iterator, Union
+from typing import Iterator, Union, List, Dict, Any, Optional
+from contextlib import nullcontext
+from pathlib import Path
 import sys
 
 try:
-    from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
     import torch
     TRANSFORMERS_AVAILABLE = True
 except ImportError as e:
@@ -15,11 +17,27 @@ try:
 except ImportError:
     ACCELERATE_AVAILABLE = False
 
+try:
+    from peft import PeftModel
+    PEFT_AVAILABLE = True
+except ImportError:
+    PEFT_AVAILABLE = False
+
 from threading import Thread
 from .base import BaseRuntime
+from .adapters import AdapterCache
+from .speculative import SpeculationStats, counting_forwards
+from ..bundle.reader import is_bundle, open_bundle
+from . import profiling
 from ..config.models import SLMConfig, GenerationParams
 
 class TransformersRuntime(BaseRuntime):
+    def __init__(self, config: SLMConfig):
+        super().__init__(config)
+        self.bundle = None
+        self.speculation = SpeculationStats()
+        self.adapters = AdapterCache(config.runtime.lora, self._load_adapter, self._unload_adapter)
+
     def load(self):
         # Check for required dependencies
         if not TRANSFORMERS_AVAILABLE:
@@ -36,24 +54,37 @@ class TransformersRuntime(BaseRuntime):
                 "   Or reinstall slm-packager: pip install -e ."
             )
         
+        # torch otherwise sizes its pools to every core on the host
+        placement = self._apply_cpu_placement()
+        
         try:
             device_map = "auto" if self.config.runtime.device == "cuda" else "cpu"
+            if is_bundle(self.config.model.path):
+                self._load_bundle()
+                print("✅ Model loaded successfully!")
+                return
+            # Local snapshots (slm pull) load without any hub lookups
+            local_only = Path(self.config.model.path).is_dir()
             
             print(f"📥 Loading tokenizer from '{self.config.model.path}'...")
             self.tokenizer = AutoTokenizer.from_pretrained(
                 self.config.model.path,
-                trust_remote_code=True
+                trust_remote_code=True,
+                local_files_only=local_only
             )
             
             print(f"📥 Loading model from '{self.config.model.path}'...")
             print(f"   Device: {device_map}")
+            if device_map == "cpu":
+                print(f"   CPU: {placement.describe()}")
             print(f"   This may take a while for large models...")
             
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.config.model.path,
                 device_map=device_map,
                 torch_dtype="auto",
-                trust_remote_code=True
+                trust_remote_code=True,
+                local_files_only=local_only
             )
             
             print("✅ Model loaded successfully!")
@@ -102,6 +133,33 @@ class TransformersRuntime(BaseRuntime):
                 "   - Ensuring sufficient RAM (need ~4GB+ for small models)"
             ) from e
 
+    def _load_bundle(self):
+        """Tokenizer from the bundle's metadata; weights mapped straight from the bundle"""
+        self.bundle = open_bundle(self.config.model.path)
+        metadata_dir = self.bundle.extract_metadata()
+        
+        print(f"📥 Loading tokenizer from bundle '{self.config.model.path}'...")
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            metadata_dir, trust_remote_code=True, local_files_only=True
+        )
+        
+        print(f"📥 Mapping weights from bundle (no extraction)...")
+        model_config = AutoConfig.from_pretrained(metadata_dir, trust_remote_code=True, local_files_only=True)
+        # Parameters start on the meta device and are replaced by views of the mapping
+        with accelerate.init_empty_weights():
+            model = AutoModelForCausalLM.from_config(model_config, trust_remote_code=True)
+        model.load_state_dict(self.bundle.state_dict(), strict=False, assign=True)
+        model.tie_weights()
+        missing = [name for name, p in model.named_parameters() if p.is_meta]
+        if missing:
+            raise ValueError(
+                f"❌ Bundle is missing {len(missing)} weights, e.g. '{missing[0]}'\n"
+                "💡 Rebuild it from a complete model with slm package"
+            )
+        if self.config.runtime.device != "cpu":
+            model = model.to(self.config.runtime.device)
+        self.model = model.eval()
+
     def generate(self, prompt: str, params: GenerationParams) -> Union[str, Iterator[str]]:
         if not self.is_loaded:
             raise RuntimeError(
@@ -109,8 +167,10 @@ class TransformersRuntime(BaseRuntime):
                 "💡 If using CLI, this is a bug - please report it."
             )
 
+        adapter_scope = self._select_adapter(params.adapter)
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+            with profiling.span("tokenize"):
+                inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
             
             if params.stream:
                 streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True)
@@ -121,22 +181,30 @@ class TransformersRuntime(BaseRuntime):
                     temperature=params.temperature,
                     top_p=params.top_p,
                     top_k=params.top_k,
-                    do_sample=True
+                    do_sample=True,
+                    **self._speculation_kwargs(params)
                 )
-                thread = Thread(target=self.model.generate, kwargs=generation_kwargs)
+                def run():
+                    with adapter_scope:
+                        self._generate_counted(params, generation_kwargs)
+                thread = Thread(target=run)
                 thread.start()
                 
                 return self._stream_generator(streamer)
             else:
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=params.max_tokens,
-                    temperature=params.temperature,
-                    top_p=params.top_p,
-                    top_k=params.top_k,
-                    do_sample=True
-                )
-                return self.tokenizer.decode(outputs[0], skip_special_tokens=True)[len(prompt):]
+                # generate() runs prefill and decode in one call; stream to split them
+                with profiling.span("generate", max_new_tokens=params.max_tokens), adapter_scope:
+                    outputs = self._generate_counted(params, dict(
+                        **inputs,
+                        max_new_tokens=params.max_tokens,
+                        temperature=params.temperature,
+                        top_p=params.top_p,
+                        top_k=params.top_k,
+                        do_sample=True,
+                        **self._speculation_kwargs(params)
+                    ))
+                with profiling.span("detokenize"):
+                    return self.tokenizer.decode(outputs[0], skip_special_tokens=True)[len(prompt):]
         
         except torch.cuda.OutOfMemoryError as e:
             raise RuntimeError(
@@ -154,15 +222,136 @@ class TransformersRuntime(BaseRuntime):
                 "💡 Check your generation parameters in the config"
             ) from e
 
+    @staticmethod
+    def _speculation_kwargs(params: GenerationParams) -> Dict[str, Any]:
+        # generate() drafts from n-gram matches in the prompt and output when this is set
+        return {"prompt_lookup_num_tokens": params.draft_tokens} if params.speculative else {}
+
+    def _generate_counted(self, params: GenerationParams, kwargs: Dict[str, Any]):
+        """model.generate(), recording tokens per forward pass when speculating"""
+        if not params.speculative:
+            return self.model.generate(**kwargs)
+        # PeftModel.generate() calls the base model directly, bypassing its own forward
+        module = self.model.get_base_model() if PEFT_AVAILABLE and isinstance(self.model, PeftModel) else self.model
+        with counting_forwards(module) as calls:
+            outputs = self.model.generate(**kwargs)
+        self.speculation.record(outputs.shape[1] - kwargs["input_ids"].shape[1], calls[0])
+        return outputs
+
+    def _select_adapter(self, name):
+        """Activate a LoRA adapter; returns a context to run generation in"""
+        if name is not None:
+            self.adapters.get(name)
+            self.model.set_adapter(name)
+            return nullcontext()
+        if PEFT_AVAILABLE and isinstance(self.model, PeftModel):
+            # Base model requested while adapters are resident
+            return self.model.disable_adapter()
+        return nullcontext()
+
+    def _load_adapter(self, name: str, path: str):
+        if not PEFT_AVAILABLE:
+            raise ImportError(
+                "❌ LoRA adapters on the transformers runtime require the 'peft' package.\n"
+                "💡 Install it with: pip install peft"
+            )
+        if isinstance(self.model, PeftModel):
+            self.model.load_adapter(path, adapter_name=name)
+        else:
+            # First adapter wraps the resident base model; its weights are not copied
+            self.model = PeftModel.from_pretrained(self.model, path, adapter_name=name)
+        self.model.eval()
+        return name
+
+    def _unload_adapter(self, name: str, handle):
+        self.model.delete_adapter(name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"adapters": self.adapters.stats(), "speculative": self.speculation.stats()}
+
+    def tokenize(self, text: str, add_special_tokens: bool = True) -> List[int]:
+        if not self.is_loaded:
+            raise RuntimeError("❌ Model is not loaded. Call runtime.load() first.")
+        return self.tokenizer.encode(text, add_special_tokens=add_special_tokens)
+
+    def tokenize_batch(self, texts: List[str], add_special_tokens: bool = True) -> List[List[int]]:
+        if not self.is_loaded:
+            raise RuntimeError("❌ Model is not loaded. Call runtime.load() first.")
+        # Fast tokenizers encode a list in parallel
+        return self.tokenizer(texts, add_special_tokens=add_special_tokens)["input_ids"]
+
+    def detokenize(self, tokens: List[int]) -> str:
+        if not self.is_loaded:
+            raise RuntimeError("❌ Model is not loaded. Call runtime.load() first.")
+        self._check_token_ids([tokens])
+        return self.tokenizer.decode(tokens, skip_special_tokens=True)
+
+    def detokenize_batch(self, sequences: List[List[int]]) -> List[str]:
+        if not self.is_loaded:
+            raise RuntimeError("❌ Model is not loaded. Call runtime.load() first.")
+        self._check_token_ids(sequences)
+        return self.tokenizer.batch_decode(sequences, skip_special_tokens=True)
+
+    @property
+    def vocab_size(self) -> Optional[int]:
+        tokenizer = getattr(self, "tokenizer", None)
+        return len(tokenizer) if tokenizer is not None else None
+
+    def score_tokens(self, sequences: List[List[int]]) -> List[List[float]]:
+        if not self.is_loaded:
+            raise RuntimeError("❌ Model is not loaded. Call runtime.load() first.")
+
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id or 0
+        max_len = max(len(tokens) for tokens in sequences)
+
+        input_ids = torch.full((len(sequences), max_len), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), max_len), dtype=torch.long)
+        for i, tokens in enumerate(sequences):
+            input_ids[i, :len(tokens)] = torch.tensor(tokens, dtype=torch.long)
+            attention_mask[i, :len(tokens)] = 1
+
+        with torch.inference_mode():
+            logits = self.model(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device)
+            ).logits
+
+            results = []
+            # Row by row keeps the float32 log-softmax at one sequence's size
+            for i, tokens in enumerate(sequences):
+                n = len(tokens)
+                row = torch.log_softmax(logits[i, :n - 1].float(), dim=-1)
+                targets = input_ids[i, 1:n].to(row.device).unsqueeze(-1)
+                results.append(row.gather(-1, targets).squeeze(-1).tolist())
+        return results
+
+    @property
+    def context_length(self) -> int:
+        limit = self.config.runtime.context_size
+        if self.is_loaded:
+            model_config = self.model.config
+            for attr in ("max_position_embeddings", "n_positions", "seq_length"):
+                value = getattr(model_config, attr, None)
+                if isinstance(value, int) and value > 0:
+                    return min(limit, value)
+        return limit
+
     def _stream_generator(self, streamer) -> Iterator[str]:
-        for new_text in streamer:
+        # The streamer detokenizes on the generation thread, so its time is part of each step
+        for new_text in profiling.timed_iter(streamer):
             yield new_text
 
     def unload(self):
         if self.model:
+            self.adapters = AdapterCache(self.config.runtime.lora, self._load_adapter, self._unload_adapter)
             self.model = None
         if self.tokenizer:
             self.tokenizer = None
+        if self.bundle:
+            self.bundle.close()
+            self.bundle = None
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
@@ -0,0 +1,33 @@
+from slm_packager.config.loader import ConfigLoader
+from slm_packager.config.models import LlamaCppOptions, ModelConfig, RuntimeConfig, SLMConfig
+from slm_packager.runtime.llama_tuning import PRESETS, effective_options
+
+
+def _config(**llama_cpp):
+    return SLMConfig(
+        model=ModelConfig(name="m", path="m.gguf", format="gguf"),
+        runtime=RuntimeConfig(type="llama_cpp", llama_cpp=LlamaCppOptions(**llama_cpp)),
+    )
+
+
+def test_preset_survives_save_and_reload(tmp_path):
+    path = tmp_path / "slm.yaml"
+    ConfigLoader.save(_config(preset="low-memory"), path)
+    options = effective_options(ConfigLoader.load(path).runtime.llama_cpp)
+    for name, value in PRESETS["low-memory"].items():
+        assert getattr(options, name) == value
+
+
+def test_set_values_override_the_preset(tmp_path):
+    path = tmp_path / "slm.yaml"
+    ConfigLoader.save(_config(preset="low-memory", n_batch=1024), path)
+    options = effective_options(ConfigLoader.load(path).runtime.llama_cpp)
+    assert options.n_batch == 1024
+    assert options.type_k == "q8_0"
+
+
+def test_defaults_without_a_preset():
+    options = effective_options(LlamaCppOptions())
+    assert (options.type_k, options.type_v, options.n_batch, options.n_ubatch, options.flash_attn) == (
+        "f16", "f16", 512, 512, False
+    )
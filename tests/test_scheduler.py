@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from slm_packager.api import scheduler as scheduler_module
+from slm_packager.api.scheduler import RequestScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, "perf_counter", fake)
+    return fake
+
+
+def _admission_order(clock, arrivals, aging=100.0):
+    """
+    Queue `arrivals` of (name, cost, seconds after the first) behind a busy
+    single slot, then release it and return the order they were admitted in.
+    """
+    async def run():
+        scheduler = RequestScheduler(capacity=1, aging=aging)
+        order = []
+        release = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("batch", 1):
+                await release.wait()
+
+        async def request(name, cost):
+            async with scheduler.slot("batch", cost):
+                order.append(name)
+
+        tasks = [asyncio.create_task(blocker())]
+        await asyncio.sleep(0)
+        start = clock.now
+        for name, cost, offset in arrivals:
+            clock.now = start + offset
+            tasks.append(asyncio.create_task(request(name, cost)))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(run())
+
+
+def test_cheaper_request_goes_first_within_the_aging_bound(clock):
+    # 2000 tokens at aging 100/s: passed by newcomers for up to 19s
+    order = _admission_order(clock, [("long-old", 2000, 0.0), ("short-new", 100, 5.0)])
+    assert order == ["short-new", "long-old"]
+
+
+def test_long_request_is_not_starved_past_the_aging_bound(clock):
+    order = _admission_order(clock, [("long-old", 2000, 0.0), ("short-new", 100, 30.0)])
+    assert order == ["long-old", "short-new"]
+
+
+def test_later_arrival_never_passes_an_equal_cost_request(clock):
+    order = _admission_order(clock, [("first", 500, 0.0), ("second", 500, 1.0)])
+    assert order == ["first", "second"]